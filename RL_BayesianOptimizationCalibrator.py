@@ -0,0 +1,282 @@
+#######################################################################
+# Python script for calibrating the parameters (lambda, mu, gravity) by batch Bayesian optimization
+# over their bounds, as a global alternative to the greedy, axis-aligned Q-value steps
+# (see RL_QvalueComputeScriptNEW.py and RL_GeneralRunScriptNEW.py), which stop at the first local optimum:
+#
+# The script needs the following input:
+#   .. the current state's xml inputfile (i.e., the first guess of the parameter values, and the template
+#      of the proposals' xml inputfiles),
+#   .. optionally, the maximum number of simulations (default: BO_MAX_SIMULATIONS),
+#   .. optionally, the number of parallel processes, and the number of proposals per batch
+#      (default: the number of parallel processes),
+#   .. optionally, a JSON file with the parameter bounds, e.g. {"lambda": [50000, 300000], ...}
+#      (default: BO_PARAMETER_BOUNDS; '' for the default; equal bounds keep a parameter fixed, e.g. "gravity": [-9.81, -9.81]),
+#      and the seed of the random numbers (default: 0).
+#
+# The objective is the RMSE-value of the simulation of a parameter set, i.e., the same simulate, extract and
+# compare chain as for the TestActions (simulations are looked up in / stored to the SimResultsCache).
+# After an initial Latin hypercube design (BO_INITIAL_POINTS parameter sets, the first guess included;
+# see TrainingDataSet_CreationScripts/DesignOfExperimentsSampler.py),
+# a Gaussian process on log(RMSE-value) (see RL_SurrogateModel.py, here on the parameters scaled to [0,1])
+# is fitted to all evaluated parameter sets, and batches of proposals are chosen by maximizing the expected
+# improvement: the proposals of a batch are found one after the other, each one added to the Gaussian process
+# with the best log(RMSE-value) so far as (fake) outcome ("constant liar"), such that the batch is spread out.
+# The proposals of a batch are simulated concurrently; failed simulations are given the worst log(RMSE-value) so far.
+#
+# All evaluated parameter sets are recorded in the run history store as action -1 (with their gravity),
+# and the best parameter set after every batch as step (with its gravity, see RL_RunHistoryStore.py).
+#
+# The output is the following:
+#   .. the xml inputfile, updated with the best evaluated parameter set.
+#
+# To run the script, call:
+#   python RL_BayesianOptimizationCalibrator.py <xml-inputfile> [<max-simulations>] [<num-parallel-processes>] [<batch-size>] [<bounds-json-file>] [<seed>]
+#
+# Example:
+#   python RL_BayesianOptimizationCalibrator.py elastScen_Beam_RLalgo_TestInput_SIMDATA.xml 48 4
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-18}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-18"
+
+import sys
+import os
+import json
+import math
+
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_QvalueComputeScriptNEW
+import RL_ReferenceDataStore
+import RL_RMSEvalueComputeScript
+import RL_SimResultsCache
+import RL_SurrogateModel
+import RL_RunTracer
+import RL_RunHistoryStore
+
+# The designs of experiments are shared with the training data set scripts:
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TrainingDataSet_CreationScripts'))
+import DesignOfExperimentsSampler
+
+
+# Parameters (xml tags) and their default bounds:
+BO_PARAMETER_NAMES = ['lambda', 'mu', 'gravity']
+BO_PARAMETER_BOUNDS = {'lambda': [50000.0, 300000.0], 'mu': [20000.0, 150000.0], 'gravity': [-9.81, -1.0]}
+
+BO_MAX_SIMULATIONS = 48
+BO_INITIAL_POINTS = 8
+
+# Maximization of the expected improvement: number of random parameter sets, and number (and std, in [0,1]-scaled
+# parameters) of the perturbations of the best parameter sets so far:
+BO_ACQUISITION_SAMPLES = 2000
+BO_LOCAL_SAMPLES = 1000
+BO_LOCAL_RADIUS = 0.05
+
+# Candidate length scales of the Gaussian process (in [0,1]-scaled parameters):
+BO_LENGTH_SCALES = [0.05, 0.1, 0.2, 0.4, 0.8, 1.6]
+
+
+def bounds_loader(boundsfilename=None):
+
+    # Get the parameter bounds (the default bounds, updated with the ones of the JSON file, if given):
+    bounds = dict(BO_PARAMETER_BOUNDS)
+    if boundsfilename:
+        with open(boundsfilename, 'r') as f:
+            bounds.update(json.load(f))
+    return bounds
+
+
+def expected_improvement(mean, std, best):
+
+    # Expected improvement (for minimization) of the predictions (mean, std) over the best value so far:
+    std = np.maximum(std, 1e-12)
+    z = (best - mean) / std
+    cdf = 0.5 * (1.0 + np.array([math.erf(value / math.sqrt(2.0)) for value in z]))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2.0 * math.pi)
+    return (best - mean) * cdf + std * pdf
+
+
+def batch_proposer(model, batchsize, rng):
+
+    # Choose batchsize proposals (in [0,1]-scaled parameters) by maximizing the expected improvement of the model,
+    # with the best value so far as (fake) outcome of the proposals chosen before ("constant liar"):
+    model = dict(model)
+    best = model['y'].min()
+    dim = model['X'].shape[1]
+    proposals = []
+    for k in range(batchsize):
+        incumbents = model['X'][np.argsort(model['y'])[:5]]
+        samples = np.vstack([rng.uniform(size=(BO_ACQUISITION_SAMPLES, dim)),
+                             incumbents[rng.randint(len(incumbents), size=BO_LOCAL_SAMPLES)] + BO_LOCAL_RADIUS * rng.normal(size=(BO_LOCAL_SAMPLES, dim))])
+        samples = np.clip(samples, 0.0, 1.0)
+        mean, std = RL_SurrogateModel.surrogate_predictor(model, samples, 1.0)
+        proposal = samples[np.argmax(expected_improvement(mean, std, best))]
+        proposals.append(proposal)
+        RL_SurrogateModel.surrogate_point_adder(model, proposal, best)
+    return np.array(proposals)
+
+
+def parameters_scaler(values, bounds):
+
+    # Scale parameter sets (n x dim, in the order of BO_PARAMETER_NAMES) from [0,1] to the bounds:
+    lower = np.array([bounds[name][0] for name in BO_PARAMETER_NAMES])
+    upper = np.array([bounds[name][1] for name in BO_PARAMETER_NAMES])
+    return lower + np.asarray(values) * (upper - lower)
+
+
+def parameters_unscaler(params, bounds):
+
+    # Scale parameter sets (n x dim, in the order of BO_PARAMETER_NAMES) from the bounds to [0,1]:
+    lower = np.array([bounds[name][0] for name in BO_PARAMETER_NAMES])
+    upper = np.array([bounds[name][1] for name in BO_PARAMETER_NAMES])
+    return (np.asarray(params) - lower) / np.where(upper > lower, upper - lower, 1.0)
+
+
+def proposal_setupper(infilenamestring, proposal_number, params, workspace=None):
+
+    # Set up the xml-inputfile of a proposal (parameter set params, in the order of BO_PARAMETER_NAMES), written to
+    # '<infile>_ProposalN.xml'. If a workspace (directory) is given, the simulation output is redirected into it.
+    # Returns the outfilenamestring and the output path-and-prefix of the simulation.
+    tree = ET.parse(infilenamestring)
+    root = tree.getroot()
+    for name, value in zip(BO_PARAMETER_NAMES, params):
+        for param in root.iter(name):
+            param.text = str(value)
+    outputprefix = ''
+    for param_out in root.iter('OutputPathAndPrefix'):
+        if workspace is not None:
+            try:
+                os.makedirs(workspace)
+            except:
+                pass
+            param_out.text = workspace + os.path.basename(param_out.text)
+        outputprefix = param_out.text
+    outfilenamestring = infilenamestring[:-4] + '_Proposal' + str(proposal_number) + '.xml'
+    tree.write(outfilenamestring)
+    return outfilenamestring, outputprefix
+
+
+def proposals_evaluator(infilenamestring, params, batchnum, numworkers=1, cachedir=RL_SimResultsCache.CACHE_DIR, run_id=None):
+
+    # Evaluate the proposals (parameter sets params, n x dim), i.e., look up or simulate them (concurrently)
+    # and compute their RMSE-values, and record them as candidates in the run history store.
+    # Returns the RMSE-values (NaN for failed simulations).
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_current_run()
+    path_and_realdata = RL_QvalueComputeScriptNEW.TESTSIMRESULTS_DIR + RL_QvalueComputeScriptNEW.REALDATA_FILENAME
+    realdata_checksum = RL_ReferenceDataStore.reference_checksum(path_and_realdata)
+    rmse_values = np.nan * np.ones(len(params))
+    candidates = [{'run_id': run_id, 'step': int(batchnum), 'action': RL_QvalueComputeScriptNEW.LINE_SEARCH_ACTION,
+                   'lambda': float(values[0]), 'mu': float(values[1]), 'gravity': float(values[2]), 'realdata_sha1': realdata_checksum} for values in params]
+
+    cachekeys = {}
+    simulator_jobs = []
+    for k, values in enumerate(params):
+        workspace = RL_QvalueComputeScriptNEW.TESTSIMRESULTS_DIR[:-1] + '_Proposal' + str(k) + '/' if numworkers > 1 else None
+        outfilenamestring, outputprefix = proposal_setupper(infilenamestring, k, values, workspace)
+        candidates[k]['config'] = RL_SimResultsCache.simresults_config_key(outfilenamestring, RL_QvalueComputeScriptNEW.SIMDATA_SUFFIX)
+        if cachedir is not None:
+            cachekeys[k] = RL_SimResultsCache.simresults_cache_key(outfilenamestring, RL_QvalueComputeScriptNEW.SIMDATA_SUFFIX)
+            cached = RL_SimResultsCache.simresults_cache_lookup(cachekeys[k], cachedir)
+            if cached is not None and cached[3] == realdata_checksum:
+                rmse_values[k] = cached[1]
+                candidates[k]['cache_hit'] = True
+                continue
+        simulator_jobs.append((k, outfilenamestring, outputprefix, False, str(batchnum), RL_QvalueComputeScriptNEW.TARGET_TIMESTEP))
+
+    simulator_results = RL_QvalueComputeScriptNEW.testaction_simulations_runner(simulator_jobs, numworkers, str(batchnum))
+    for k, defcoords, usage in simulator_results:
+        candidates[k].update(RL_RunHistoryStore.usage_columns(usage))
+        if defcoords is None:
+            print colored("The simulation of Proposal %s in Batch %s failed.\n" % (k, batchnum), 'red')
+            candidates[k]['penalized'] = True
+    simulator_results = [(k, defcoords) for k, defcoords, usage in simulator_results if defcoords is not None]
+    if len(simulator_results) > 0:
+        realcoords = RL_ReferenceDataStore.reference_coords_loader(path_and_realdata)
+        rmse_values_out = RL_RMSEvalueComputeScript.rmsevalues_from_coords_batched(realcoords, np.array([defcoords for k, defcoords in simulator_results]))
+        for (k, defcoords), rmse_value_out in zip(simulator_results, rmse_values_out):
+            rmse_values[k] = rmse_value_out
+            if cachedir is not None:
+                RL_SimResultsCache.simresults_cache_store(cachekeys[k], defcoords, rmse_value_out, path_and_realdata, cachedir, realdata_sha1=realdata_checksum)
+
+    for k in range(len(params)):
+        if rmse_values[k] == rmse_values[k]:
+            candidates[k]['rmse'] = float(rmse_values[k])
+            print colored("The RMSE value in Batch %s for Proposal %s (lambda = %s, mu = %s, gravity = %s) is: %s." % (batchnum, k, params[k][0], params[k][1], params[k][2], rmse_values[k]), 'yellow')
+    RL_RunHistoryStore.history_candidates_recorder(candidates)
+    return rmse_values
+
+
+def bo_calibrator_runner(xmlinputfile, bounds=BO_PARAMETER_BOUNDS, maxsimulations=BO_MAX_SIMULATIONS, numworkers=1, batchsize=None,
+                         run_id=None, cachedir=RL_SimResultsCache.CACHE_DIR, seed=0):
+
+    # Run the Bayesian optimization (see above), and update the xml-inputfile with the best evaluated parameter set.
+    # Returns the best parameter set (in the order of BO_PARAMETER_NAMES), its RMSE-value, and the number of evaluations.
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_run_starter('RL_BayesianOptimizationCalibrator', xmlinputfile)
+    if batchsize is None:
+        batchsize = max(int(numworkers), 1)
+    rng = np.random.RandomState(seed)
+    root = ET.parse(xmlinputfile).getroot()
+    firstguess = [[float(param.text) for param in root.iter(name)][0] for name in BO_PARAMETER_NAMES]
+
+    # 1.) Initial design (the first guess, if within the bounds, and a Latin hypercube design):
+    design = DesignOfExperimentsSampler.latin_hypercube_design(min(BO_INITIAL_POINTS, maxsimulations), len(BO_PARAMETER_NAMES), rng)
+    if ((parameters_unscaler(firstguess, bounds) >= 0.0) & (parameters_unscaler(firstguess, bounds) <= 1.0)).all():
+        design[0] = parameters_unscaler(firstguess, bounds)
+    batchnum = 0
+    X = np.empty((0, len(BO_PARAMETER_NAMES)))
+    rmse_values = np.empty(0)
+    while len(X) < maxsimulations:
+        batchnum += 1
+        with RL_RunTracer.trace_context(step=str(batchnum)), RL_RunTracer.trace_span('bo_batch'):
+            if batchnum == 1:
+                proposals = design
+            else:
+                # 2.) Fit the Gaussian process on log(RMSE-value), with the worst one for the failed simulations:
+                y = np.log(np.maximum(rmse_values, 1e-300))
+                y[rmse_values != rmse_values] = y[rmse_values == rmse_values].max()
+                model = RL_SurrogateModel.surrogate_fitter(X, y, BO_LENGTH_SCALES)
+                proposals = batch_proposer(model, min(batchsize, maxsimulations - len(X)), rng)
+            X = np.vstack([X, proposals])
+            rmse_values = np.append(rmse_values, proposals_evaluator(xmlinputfile, parameters_scaler(proposals, bounds), batchnum, numworkers, cachedir, run_id))
+
+        if (rmse_values != rmse_values).all():
+            raise ValueError('All simulations of the initial design failed.')
+        best = np.nanargmin(rmse_values)
+        best_params = parameters_scaler(X[best], bounds)
+        RL_RunHistoryStore.history_step_recorder(run_id, batchnum, RL_QvalueComputeScriptNEW.LINE_SEARCH_ACTION, best_params[0], best_params[1], gravity=best_params[2])
+        print colored('Batch %s: %s simulations, best RMSE value %s (lambda = %s, mu = %s, gravity = %s).\n' % (batchnum, len(X), rmse_values[best], best_params[0], best_params[1], best_params[2]), 'green')
+
+    # 3.) Update the xml-inputfile with the best evaluated parameter set:
+    tree = ET.parse(xmlinputfile)
+    for name, value in zip(BO_PARAMETER_NAMES, best_params):
+        for param in tree.getroot().iter(name):
+            param.text = str(value)
+    tree.write(xmlinputfile)
+    return best_params, float(rmse_values[best]), len(X)
+
+
+def main(xmlinputfile, maxsimulations=BO_MAX_SIMULATIONS, numworkers=1, batchsize=None, boundsfilename=None, seed=0):
+
+    run_id = RL_RunHistoryStore.history_run_starter('RL_BayesianOptimizationCalibrator', xmlinputfile)
+    best_params, rmse_value, numsimulations = bo_calibrator_runner(xmlinputfile, bounds_loader(boundsfilename), int(maxsimulations), int(numworkers),
+                                                                   int(batchsize) if batchsize else None, run_id, seed=int(seed))
+    print('Best parameter set after %s simulations: lambda = %s, mu = %s, gravity = %s (RMSE value %s).' % (numsimulations, best_params[0], best_params[1], best_params[2], rmse_value))
+    RL_RunHistoryStore.history_summary(run_id)
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('BayesianOptimizationCalibrator STARTED. \n', 'yellow')
+    main(*sys.argv[1:])
+    print('\n')
+    print colored('BayesianOptimizationCalibrator FINISHED. \n', 'yellow')
@@ -0,0 +1,237 @@
+#######################################################################
+# Python script for checking the screening, claim and selection paths of the Q-value steps
+# (see RL_QvalueComputeScriptNEW.py), which are shared by the concurrent calibrations
+# (see RL_MultiStartCalibrator.py) and the coarse-to-fine schedule (see RL_CoarseToFineSchedule.py):
+#
+# The script checks that
+#   .. the multi-fidelity screening never screens out the current state (action 0), also if it keeps
+#      only one TestAction, which is not the current state,
+#   .. a step never chooses a TestAction without full-fidelity RMSE-value, i.e., if all full-fidelity
+#      simulations fail, it keeps the current state (instead of a screened-out TestAction),
+#   .. a parameter set evaluated by concurrent threads (candidate_evaluator) is simulated only once,
+#      and all claims of the cache keys are released afterwards,
+#   .. the claims of a step are released, also if its simulations raise,
+#   .. the best candidate of a run is a full-fidelity one (not a candidate of a coarse schedule level),
+#   .. the surrogate model is fitted only on the candidates of its real data and configuration,
+#      also if loaded by concurrent threads.
+#
+# The checks run in a temporary directory, with the stand-in simulator (see RL_StandInElasticitySimulator.py)
+# on the coarse beam mesh (CHECK_MESH_RESOLUTION).
+#
+# The output is the following:
+#   .. PASSED or FAILED for every check (the exit status is the number of failed checks).
+#
+# To run the script, call:
+#   python RL_CalibrationCheck.py
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-20}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-20"
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_PipelineBenchmark
+import RL_QvalueComputeScriptNEW
+import RL_RunHistoryStore
+import RL_SimResultsCache
+import RL_SimulationRunnerScript
+import RL_StepSizeController
+import RL_SurrogateModel
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECK_MESH_RESOLUTION = 2
+CHECK_SCREENING_CONFIG_FILENAME = os.path.join(SCRIPT_DIR, RL_QvalueComputeScriptNEW.SCREENING_CONFIG_FILENAME)
+
+# First guess far from the optimum (i.e., the current state loses the screening), and the parameter set
+# evaluated by the concurrent threads:
+CHECK_FIRST_GUESS = (160000.0, 56000.0)
+CHECK_PARAMETER_SET = (141000.0, 51000.0)
+CHECK_NUM_THREADS = 3
+
+# Number of candidates of the real data checksums (of one configuration) in the store of the surrogate check:
+CHECK_SURROGATE_NUM_CANDIDATES = {'realdata-a': RL_SurrogateModel.SURROGATE_MIN_POINTS, 'realdata-b': RL_SurrogateModel.SURROGATE_MIN_POINTS + 3}
+
+# (the original runner of the simulations of the TestActions)
+simulations_runner = RL_QvalueComputeScriptNEW.testaction_simulations_runner
+
+
+def check_workdir_setupper(workdir):
+
+    # Set up the working directory with the stand-in simulator, and the first guess (CHECK_FIRST_GUESS):
+    RL_PipelineBenchmark.benchmark_setupper(workdir, CHECK_MESH_RESOLUTION)
+    os.chdir(workdir)
+    RL_StepSizeController.parameters_writer(RL_PipelineBenchmark.SIMDATA_XML_FILENAME, CHECK_FIRST_GUESS[0], CHECK_FIRST_GUESS[1])
+    return RL_PipelineBenchmark.SIMDATA_XML_FILENAME
+
+
+def full_fidelity_failer(jobs, numworkers, stepnum, pool=None):
+
+    # Run the simulations of the TestActions, but let all full-fidelity simulations fail (no deformed coords):
+    results = simulations_runner(jobs, numworkers, stepnum, pool)
+    return [(action_number, None if job[5] == RL_QvalueComputeScriptNEW.TARGET_TIMESTEP else defcoords, usage) for (action_number, defcoords, usage), job in zip(results, jobs)]
+
+
+def simulations_raiser(jobs, numworkers, stepnum, pool=None):
+
+    # Raise instead of running the simulations of the TestActions (e.g. a crashed pool):
+    raise RuntimeError('simulations of Step %s crashed' % stepnum)
+
+
+def screening_checker(workdir):
+
+    # Check that the current state is simulated with full fidelity, although the screening keeps only one
+    # other TestAction. Returns True if passed.
+    xmlinputfile = check_workdir_setupper(workdir)
+    screening = RL_QvalueComputeScriptNEW.screening_config_loader(CHECK_SCREENING_CONFIG_FILENAME)
+    for level in screening['levels']:
+        level['keep'] = 1
+    run_id = RL_RunHistoryStore.history_run_starter('screening check', xmlinputfile)
+    RL_QvalueComputeScriptNEW.qvalue_computer(xmlinputfile, '1', 1, None, run_id=run_id, screening=screening)
+    candidates = RL_RunHistoryStore.history_candidates_loader(run_id)
+    simulated = [int(c['action']) for c in candidates if c['fidelity'] == 0 and not c['penalized'] and c['rmse'] == c['rmse']]
+    print('TestActions simulated with full fidelity: %s.' % simulated)
+    return 0 in simulated and len(simulated) == 2
+
+
+def selection_checker(workdir):
+
+    # Check that the current state is kept, if all full-fidelity simulations fail. Returns True if passed.
+    xmlinputfile = check_workdir_setupper(workdir)
+    screening = RL_QvalueComputeScriptNEW.screening_config_loader(CHECK_SCREENING_CONFIG_FILENAME)
+    run_id = RL_RunHistoryStore.history_run_starter('selection check', xmlinputfile)
+    RL_QvalueComputeScriptNEW.testaction_simulations_runner = full_fidelity_failer
+    try:
+        action_number = RL_QvalueComputeScriptNEW.qvalue_computer(xmlinputfile, '1', 1, None, run_id=run_id, screening=screening)
+    finally:
+        RL_QvalueComputeScriptNEW.testaction_simulations_runner = simulations_runner
+    params = RL_StepSizeController.parameters_reader(xmlinputfile)
+    print('Chosen ActionNumber %s, parameter set %s.' % (action_number, params))
+    return action_number == 0 and tuple(params) == CHECK_FIRST_GUESS
+
+
+def concurrent_claims_checker(workdir):
+
+    # Check that the parameter set evaluated by concurrent threads is simulated only once. Returns True if passed.
+    xmlinputfile = check_workdir_setupper(workdir)
+    run_id = RL_RunHistoryStore.history_run_starter('claims check', xmlinputfile)
+    rmse_values = {}
+    def evaluator(thread_number):
+        # (every thread evaluates its own copy of the xml-inputfile, as the calibrations of RL_MultiStartCalibrator.py)
+        threadxmlfile = xmlinputfile[:-4] + '_Thread%s.xml' % thread_number
+        shutil.copy(xmlinputfile, threadxmlfile)
+        rmse_values[thread_number] = RL_QvalueComputeScriptNEW.candidate_evaluator(threadxmlfile, CHECK_PARAMETER_SET[0], CHECK_PARAMETER_SET[1], 1, run_id=run_id)
+    threads = [threading.Thread(target=evaluator, args=(thread_number,)) for thread_number in range(0,CHECK_NUM_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    candidates = RL_RunHistoryStore.history_candidates_loader(run_id)
+    print('RMSE values %s, cache hits %s, claims left %s.' % (rmse_values, list(candidates['cache_hit']), len(RL_SimResultsCache._claimed_keys)))
+    return (len(set(rmse_values.values())) == 1 and None not in rmse_values.values() and len(candidates) == CHECK_NUM_THREADS
+            and int(candidates['cache_hit'].sum()) == CHECK_NUM_THREADS - 1 and len(RL_SimResultsCache._claimed_keys) == 0)
+
+
+def claims_release_checker(workdir):
+
+    # Check that the claims of a step are released, if its simulations raise. Returns True if passed.
+    xmlinputfile = check_workdir_setupper(workdir)
+    RL_QvalueComputeScriptNEW.testaction_simulations_runner = simulations_raiser
+    try:
+        RL_QvalueComputeScriptNEW.qvalue_computer(xmlinputfile, '1', 1)
+        raised = False
+    except RuntimeError:
+        raised = True
+    finally:
+        RL_QvalueComputeScriptNEW.testaction_simulations_runner = simulations_runner
+    print('Step raised: %s, claims left %s.' % (raised, len(RL_SimResultsCache._claimed_keys)))
+    return raised and len(RL_SimResultsCache._claimed_keys) == 0
+
+
+def best_candidate_checker(workdir):
+
+    # Check that the best candidate of a run is not a (better) candidate of a coarse schedule level. Returns True if passed.
+    dbfile = os.path.join(workdir, RL_RunHistoryStore.HISTORY_DB_FILENAME)
+    run_id = RL_RunHistoryStore.history_run_starter('best candidate check', '', dbfile)
+    RL_RunHistoryStore.history_candidates_recorder([
+        {'run_id': run_id, 'step': 1, 'action': 0, 'lambda': 140000.0, 'mu': 50000.0, 'rmse': 0.1, 'fidelity': RL_RunHistoryStore.coarse_level_fidelity(0)},
+        {'run_id': run_id, 'step': 2, 'action': 0, 'lambda': 145000.0, 'mu': 50000.0, 'rmse': 0.2}], dbfile)
+    best = RL_RunHistoryStore.history_best_candidate(run_id, dbfile)
+    print('Best candidate: %s.' % best)
+    return best is not None and best['fidelity'] == 0 and best['rmse'] == 0.2
+
+
+def surrogate_keys_checker(workdir):
+
+    # Check that the surrogate models of two real data checksums (of the same configuration) are fitted on their own
+    # candidates only, and that there is no model of another configuration. Returns True if passed.
+    dbfile = os.path.join(workdir, RL_RunHistoryStore.HISTORY_DB_FILENAME)
+    run_id = RL_RunHistoryStore.history_run_starter('surrogate check', '', dbfile)
+    candidates = []
+    for realdata_sha1, offset in [('realdata-a', 0.0), ('realdata-b', 1.0)]:
+        for k in range(0,CHECK_SURROGATE_NUM_CANDIDATES[realdata_sha1]):
+            candidates.append({'run_id': run_id, 'step': k, 'action': 0, 'lambda': 100000.0 + 5000.0 * k, 'mu': 50000.0, 'rmse': offset + 0.001 * k,
+                               'realdata_sha1': realdata_sha1, 'config': 'config-a'})
+    RL_RunHistoryStore.history_candidates_recorder(candidates, dbfile)
+    models = {}
+    def loader(realdata_sha1, config):
+        models[(realdata_sha1, config)] = RL_SurrogateModel.surrogate_model_loader(realdata_sha1, config, dbfile)
+    threads = [threading.Thread(target=loader, args=keys) for keys in [('realdata-a', 'config-a'), ('realdata-b', 'config-a'), ('realdata-a', 'config-b')] * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sizes = dict((keys, len(model['X']) if model is not None else None) for keys, model in models.items())
+    print('Surrogate models (real data, configuration): number of candidates %s.' % sizes)
+    return (sizes[('realdata-a', 'config-a')] == CHECK_SURROGATE_NUM_CANDIDATES['realdata-a']
+            and sizes[('realdata-b', 'config-a')] == CHECK_SURROGATE_NUM_CANDIDATES['realdata-b']
+            and sizes[('realdata-a', 'config-b')] is None)
+
+
+def check_reporter(name, passed):
+
+    # Print the result of a check:
+    if passed:
+        print colored('%s: PASSED' % name, 'green')
+    else:
+        print colored('%s: FAILED' % name, 'red')
+    return passed
+
+
+def main():
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='RL_CalibrationCheck_')
+    executable = RL_SimulationRunnerScript.HIFLOW_EXECUTABLE_SEQUENTIAL
+    RL_SimulationRunnerScript.HIFLOW_EXECUTABLE_SEQUENTIAL = 'python %s %s' % (os.path.join(SCRIPT_DIR, 'RL_StandInElasticitySimulator.py'), CHECK_MESH_RESOLUTION)
+    try:
+        results = [check_reporter('screening keeps the current state', screening_checker(os.path.join(workdir, 'screening'))),
+                   check_reporter('selection of full-fidelity TestActions only', selection_checker(os.path.join(workdir, 'selection'))),
+                   check_reporter('concurrent evaluations simulated once', concurrent_claims_checker(os.path.join(workdir, 'claims'))),
+                   check_reporter('claims released on failure', claims_release_checker(os.path.join(workdir, 'release'))),
+                   check_reporter('best candidate of full fidelity', best_candidate_checker(workdir)),
+                   check_reporter('surrogate models per real data and configuration', surrogate_keys_checker(workdir))]
+    finally:
+        os.chdir(cwd)
+        RL_SimulationRunnerScript.HIFLOW_EXECUTABLE_SEQUENTIAL = executable
+        shutil.rmtree(workdir)
+    return results.count(False)
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('CalibrationCheck STARTED. \n', 'yellow')
+    num_failed = main()
+    print('\n')
+    print colored('CalibrationCheck FINISHED. \n', 'yellow')
+    sys.exit(num_failed)
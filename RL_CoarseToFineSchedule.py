@@ -0,0 +1,185 @@
+#######################################################################
+# Python script for running the calibration (Q-value steps, see RL_QvalueComputeScriptNEW.py)
+# as a coarse-to-fine schedule, i.e., first with large manipulation (epsilon) values on a cheap
+# (coarse) configuration (e.g. fewer, larger time steps and a looser CG tolerance), and then, starting
+# from the converged parameter set (lambda, mu), with smaller epsilon values on progressively finer
+# mesh refinement levels:
+#
+# The script needs the following input:
+#   .. the current state's xml inputfile (i.e., the first guess of the parameter values),
+#   .. optionally, the schedule (JSON, default: RL_ScheduleConfig.json), i.e., the list of its levels,
+#      each with:
+#        .. refinement_level: InitialRefLevel of the simulations of this level,
+#        .. overrides (optional): xml tags and their values for the simulations of this level
+#           (as for the screening levels, see RL_QvalueComputeScriptNEW.screening_config_loader),
+#           e.g. a larger DeltaT with fewer time steps (MaxTimeStepIts) up to the same (full load) time,
+#           or a looser CG tolerance; all other levels use the values of the xml inputfile,
+#        .. simulated_timestep (optional): timestep of the simulation results of this level, which is
+#           compared to the real data at the target timestep (i.e., the full load time step of the overrides),
+#           (levels with overrides or a simulated_timestep are coarse levels: their candidates are recorded with
+#           the fidelity of the level, see RL_RunHistoryStore.coarse_level_fidelity, i.e., not as full-fidelity
+#           candidates, and are hence neither best candidates nor data of the surrogate model),
+#        .. epsilon_lam, epsilon_mu: manipulation (epsilon) values of the actions,
+#        .. max_steps: maximum number of Q-value steps,
+#        .. min_improvement: relative improvement of the RMSE-value of the chosen action per step,
+#           below which the level is converged (0.0: converged only if action 0 is chosen),
+#        .. rmse_tolerance (optional): RMSE-value, below which the level is converged,
+#   .. optionally, the number of parallel processes for the TestActions.
+#
+# A level is converged, if action 0 (keep the current parameter set) is chosen, if the RMSE-value does
+# not improve sufficiently any more, or if the RMSE-tolerance or the maximum number of steps is reached;
+# its parameter set is then handed over to the next level (by setting InitialRefLevel and the overrides of the
+# next level in the xml inputfile; the values of the overridden tags are restored after the last level).
+# The simulation results of refinement levels other than the one of the real data are compared to the
+# real data after remapping (see RL_ReferenceDataStore.reference_remap_index).
+#
+# The output is the following:
+#   .. the calibrated xml inputfile (at the refinement level of the last level of the schedule),
+#   .. all steps of all levels as one run in the run history store (see RL_RunHistoryStore.py).
+#
+# To run the script, call:
+#   python RL_CoarseToFineSchedule.py <xml-inputfile> [<schedule-config-file>] [<num-parallel-processes>]
+#
+# Example:
+#   python RL_CoarseToFineSchedule.py elastScen_Beam_RLalgo_TestInput_SIMDATA.xml RL_ScheduleConfig.json 4
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-16}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-16"
+
+import sys
+import json
+
+import xml.etree.ElementTree as ET
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_QvalueComputeScriptNEW
+import RL_RunTracer
+import RL_RunHistoryStore
+
+
+SCHEDULE_CONFIG_FILENAME = 'RL_ScheduleConfig.json'
+
+
+def schedule_config_loader(filename=SCHEDULE_CONFIG_FILENAME):
+
+    # Load the schedule (JSON, see above):
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def refinement_level_setter(xmlinputfile, refinement_level):
+
+    # Set the refinement level (InitialRefLevel) of the mesh in the xml-inputfile:
+    tree = ET.parse(xmlinputfile)
+    for param_ref in tree.getroot().iter('InitialRefLevel'):
+        param_ref.text = str(int(refinement_level))
+    tree.write(xmlinputfile)
+
+
+def overrides_setter(xmlinputfile, overrides):
+
+    # Set the given xml tags (dict tag: value, e.g. the overrides of a level) in the xml-inputfile:
+    tree = ET.parse(xmlinputfile)
+    for tag, value in overrides.items():
+        for elem in tree.getroot().iter(str(tag)):
+            elem.text = str(value)
+    tree.write(xmlinputfile)
+
+
+def level_fidelity(level_number, level):
+
+    # Get the fidelity of the simulations of the level (0 for full fidelity, see above):
+    if 'overrides' in level or 'simulated_timestep' in level:
+        return RL_RunHistoryStore.coarse_level_fidelity(level_number)
+    return 0
+
+
+def chosen_rmse_value(run_id, step, action_number, fidelity=0):
+
+    # Get the RMSE-value of the chosen action in the given step (simulated with the given fidelity)
+    # from the run history store (None if unknown):
+    candidates = RL_RunHistoryStore.history_candidates_loader(run_id, step, action_number)
+    candidates = candidates[candidates['fidelity'] == fidelity]
+    if len(candidates) == 0 or candidates['rmse'][-1] != candidates['rmse'][-1]: # (NaN: no RMSE-value)
+        return None
+    return float(candidates['rmse'][-1])
+
+
+def schedule_runner(xmlinputfile, schedule, numworkers=1, run_id=None, screening=None, surrogate=False):
+
+    # Run the levels of the schedule one after the other, starting from the parameter set of the xml-inputfile.
+    # Returns the list of the results of the levels (dict with level, refinement_level, steps, rmse, reason).
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_run_starter('RL_CoarseToFineSchedule', xmlinputfile)
+
+    # Values of all overridden xml tags in the xml-inputfile (restored after the last level):
+    root = ET.parse(xmlinputfile).getroot()
+    original_values = dict((tag, elem.text.strip()) for level in schedule['levels'] for tag in level.get('overrides', {}) for elem in root.iter(str(tag)))
+
+    results = []
+    step = 0
+    try:
+        for level_number, level in enumerate(schedule['levels']):
+            level_values = dict(original_values)
+            level_values.update(level.get('overrides', {}))
+            overrides_setter(xmlinputfile, level_values)
+            refinement_level_setter(xmlinputfile, level['refinement_level'])
+            simulated_timestep = int(level.get('simulated_timestep', RL_QvalueComputeScriptNEW.TARGET_TIMESTEP))
+            fidelity = level_fidelity(level_number, level)
+            print colored('Schedule level %s: refinement level %s, epsilon_lam = %s, epsilon_mu = %s (at most %s steps), overrides: %s.\n' % (level_number, level['refinement_level'], level['epsilon_lam'], level['epsilon_mu'], level['max_steps'], level.get('overrides', {})), 'green')
+
+            level_steps = 0
+            rmse_value = None
+            reason = 'max_steps'
+            while level_steps < int(level['max_steps']):
+                step += 1
+                level_steps += 1
+                with RL_RunTracer.trace_context(step=str(step), level=level_number), RL_RunTracer.trace_span('qvalue_step'):
+                    action_number_out = RL_QvalueComputeScriptNEW.qvalue_computer(xmlinputfile, str(step), numworkers, run_id=run_id, screening=screening, surrogate=surrogate,
+                                                                                  epsilon_lam=level['epsilon_lam'], epsilon_mu=level['epsilon_mu'], simulated_timestep=simulated_timestep, fidelity=fidelity)
+                previous_rmse_value = rmse_value
+                rmse_value = chosen_rmse_value(run_id, step, action_number_out, fidelity)
+                print colored('The current steps best ActionNumber is %s (RMSE value: %s).\n' % (action_number_out, rmse_value), 'green')
+
+                # Per-level convergence criteria:
+                if action_number_out == 0:
+                    reason = 'no_improving_action'
+                    break
+                if rmse_value is not None and rmse_value <= level.get('rmse_tolerance', 0.0):
+                    reason = 'rmse_tolerance'
+                    break
+                if rmse_value is not None and previous_rmse_value is not None and previous_rmse_value - rmse_value < level.get('min_improvement', 0.0) * previous_rmse_value:
+                    reason = 'min_improvement'
+                    break
+
+            print colored('Schedule level %s converged after %s steps (%s), RMSE value: %s.\n' % (level_number, level_steps, reason, rmse_value), 'green')
+            results.append({'level': level_number, 'refinement_level': level['refinement_level'], 'steps': level_steps, 'rmse': rmse_value, 'reason': reason})
+    finally:
+        overrides_setter(xmlinputfile, original_values)
+
+    return results
+
+
+def main(xmlinputfile, scheduleconfig=SCHEDULE_CONFIG_FILENAME, numworkers=1):
+
+    schedule = schedule_config_loader(scheduleconfig)
+    run_id = RL_RunHistoryStore.history_run_starter('RL_CoarseToFineSchedule', xmlinputfile)
+    results = schedule_runner(xmlinputfile, schedule, int(numworkers), run_id)
+
+    for result in results:
+        print('Level %s (refinement level %s): %s steps, RMSE value %s (%s).' % (result['level'], result['refinement_level'], result['steps'], result['rmse'], result['reason']))
+    RL_RunHistoryStore.history_summary(run_id)
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('CoarseToFineSchedule STARTED. \n', 'yellow')
+    main(*sys.argv[1:])
+    print('\n')
+    print colored('CoarseToFineSchedule FINISHED. \n', 'yellow')
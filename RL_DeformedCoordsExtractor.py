@@ -0,0 +1,71 @@
+#######################################################################
+# Python script for extracting the deformed coordinates of a HiFlow3-based
+# elasticity simulation result directly from its (series of) pvtu file(s),
+# i.e., without the warp/strain/von-Mises-stress pipeline and without writing
+# an '_outVis.vtu' file (see RL_Pvtu2vtuConverterAndVMStressCalculator.py):
+#
+# The script needs the following input:
+#  - a pvtu file (and its vtu piece(s)), which contains 3 scalar-valued arrays
+#    named {'u0', 'u1', 'u2'} as PointData.
+#
+# Using the arrays specified above, the program adds the displacement vector
+# to the given coordinates of the points.
+#
+# The output is the following:
+#  - the deformed coordinates as a numpy-array (num_points x dim), which equal the point 
+#    coordinates of the respective '_outVis.vtu' file of the pvtu2vtu converter 
+#    (up to the single-precision rounding of the vtkWarpScalar filters there).
+#
+# To run the script, call:
+#   python RL_DeformedCoordsExtractor.py <path-to-pvtu-file>
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-10}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-10"
+
+import sys
+
+import vtk
+import numpy as np
+from vtk.util.numpy_support import vtk_to_numpy
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_RunTracer
+
+
+def defcoords_extractor(path_and_pvtu, return_points=False):
+
+    # Get the deformed coords (num_points x dim) of the pvtu file,
+    # and (if return_points) the coords of the undeformed nodes as well.
+    with RL_RunTracer.trace_span('extraction', pvtu=path_and_pvtu) as span:
+        # Read the pvtu file (and its pieces):
+        reader = vtk.vtkXMLPUnstructuredGridReader()
+        reader.SetFileName(path_and_pvtu)
+        reader.Update()
+
+        grid = reader.GetOutput()
+
+        # Get the coordinates of the nodes and the displacement vector (u0,u1,u2) as numpy-arrays:
+        nodes_numpy_array = vtk_to_numpy(grid.GetPoints().GetData())
+        displacement_numpy_array = np.column_stack([vtk_to_numpy(grid.GetPointData().GetArray(u)) for u in ['u0', 'u1', 'u2']])
+
+        span.bytes_read = RL_RunTracer.files_size(RL_RunTracer.pvtu_files(path_and_pvtu))
+
+    # Add the displacement vector to the coordinates of the nodes:
+    if return_points:
+        return nodes_numpy_array + displacement_numpy_array, nodes_numpy_array
+    return nodes_numpy_array + displacement_numpy_array
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('DeformedCoordsExtractor STARTED. \n', 'yellow')
+    defcoords = defcoords_extractor(sys.argv[1])
+    print('Deformed coords of %s: num_points = %s.' % (sys.argv[1], defcoords.shape[0]))
+    print('\n')
+    print colored('DeformedCoordsExtractor FINISHED. \n', 'yellow')
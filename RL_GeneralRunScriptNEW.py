@@ -13,7 +13,27 @@
 #      optimized parameters, for HiFlow3-based elasticity simulation.
 # 
 # To run the script, call:
-#   python RL_GeneralRunScript.py
+#   python RL_GeneralRunScript.py [<num-parallel-processes>] [<screening-config-file>] [<schedule-config-file>] [<surrogate (0|1)>]
+# 
+# With <num-parallel-processes> larger than 1, the TestActions of every step 
+# are simulated concurrently (see RL_QvalueComputeScriptNEW.py).
+# 
+# With <screening-config-file> (e.g. RL_ScreeningConfig.json), the TestActions of every step are screened 
+# by cheap low-fidelity simulations first, and only the best ones are simulated with full fidelity 
+# ('' for no screening).
+# 
+# With <schedule-config-file> (e.g. RL_ScheduleConfig.json), the run is a coarse-to-fine schedule over 
+# decreasing epsilon values and increasing mesh refinement levels (see RL_CoarseToFineSchedule.py) 
+# ('' for no schedule).
+# 
+# With <surrogate> 1, TestActions which confidently lose according to the surrogate model of all past 
+# simulations are not simulated (see RL_SurrogateModel.py).
+# 
+# The run is traced per step, action and stage into RL_trace.jsonl, and summarized 
+# into RL_trace_metrics.json at the end (see RL_RunTracer.py).
+# 
+# Every step (the evaluated TestActions and the chosen action with the produced parameter set) 
+# is recorded as part of one run in the run history store RL_run_history.sqlite (see RL_RunHistoryStore.py).
 # 
 # author = {Nicolai Schoch}
 # date = {2017-08-03}
@@ -24,7 +44,7 @@ __author__ = 'schoch'
 __date__ = "2017-08-04"
 
 #import os
-#import sys
+import sys
 
 import subprocess
 from subprocess import PIPE
@@ -32,16 +52,27 @@ from subprocess import PIPE
 from termcolor import colored # for colored terminal output for better overview.
 
 import RL_QvalueComputeScriptNEW
+import RL_RunTracer
+import RL_RunHistoryStore
+import RL_CoarseToFineSchedule
 
 # NOTE: RUN SIMULATION WITH NP=1 (in order for unique order of coords)!!!
 
-def main():
+def main(numworkers=1, screeningconfig=None, scheduleconfig=None, surrogate=False):
     process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True)
     username = process.communicate()[0]
     print colored(username, 'red') #prints the username of the account you're logged in as
     
     action_number_out = -1
     step = 0
+    screening = RL_QvalueComputeScriptNEW.screening_config_loader(screeningconfig) if screeningconfig else None
+    run_id = RL_RunHistoryStore.history_run_starter('RL_GeneralRunScriptNEW', "elastScen_Beam_RLalgo_TestInput_SIMDATA.xml")
+    
+    # Schedule mode: run the levels of the coarse-to-fine schedule (each with its own convergence criteria) instead:
+    if scheduleconfig:
+        schedule = RL_CoarseToFineSchedule.schedule_config_loader(scheduleconfig)
+        RL_CoarseToFineSchedule.schedule_runner("elastScen_Beam_RLalgo_TestInput_SIMDATA.xml", schedule, numworkers, run_id, screening, surrogate)
+        action_number_out = 0
     
     #for i in range(0,10): # NOTE: replace the "for"-loop with break/raise-condition insed by means of a return-value combined with a tolerance in a "while"-loop.
     while action_number_out != 0:
@@ -54,7 +85,8 @@ def main():
         # In subprocess: store/append the new parameter set to existing param-sets-list:
         #cmdForQvalueComputeScript = 'python RL_QvalueComputeScript.py elastScen_Beam_RLalgo_TestInput_SIMDATA.xml %s' % str(step)
         #process = subprocess.call(cmdForQvalueComputeScript, shell=True)
-        action_number_out = RL_QvalueComputeScriptNEW.qvalue_computer("elastScen_Beam_RLalgo_TestInput_SIMDATA.xml", str(step))
+        with RL_RunTracer.trace_context(step=str(step)), RL_RunTracer.trace_span('qvalue_step'):
+            action_number_out = RL_QvalueComputeScriptNEW.qvalue_computer("elastScen_Beam_RLalgo_TestInput_SIMDATA.xml", str(step), numworkers, run_id=run_id, screening=screening, surrogate=surrogate)
         print('\n')
         print colored('The current steps best ActionNumber is %s.' % str(action_number_out), 'green')
         print('\n')
@@ -62,12 +94,28 @@ def main():
         print colored('========================================== \n', 'green')
         
         # Etc. Repeat!
+    
+    # Aggregate the trace of the run (per step, action and stage) into the metrics summary:
+    if RL_RunTracer.TRACE_FILENAME is not None:
+        RL_RunTracer.trace_metrics_reporter(RL_RunTracer.trace_metrics_aggregator(RL_RunTracer.TRACE_FILENAME))
+    
+    # Summarize the run (best candidate, final parameter set):
+    RL_RunHistoryStore.history_summary(run_id)
 
 
 if __name__ == '__main__':
     print('\n')
     print colored('RLalgo_GeneralRunScript STARTED. \n', 'yellow')
-    main()
+    if len(sys.argv) > 4:
+        main(int(sys.argv[1]), sys.argv[2], sys.argv[3], bool(int(sys.argv[4])))
+    elif len(sys.argv) > 3:
+        main(int(sys.argv[1]), sys.argv[2], sys.argv[3])
+    elif len(sys.argv) > 2:
+        main(int(sys.argv[1]), sys.argv[2])
+    elif len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
     print('\n')
     print colored('RLalgo_GeneralRunScript FINISHED. \n', 'yellow')
 
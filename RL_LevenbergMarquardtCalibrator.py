@@ -0,0 +1,152 @@
+#######################################################################
+# Python script for calibrating the parameters (lambda, mu) by damped least squares
+# (Levenberg-Marquardt) on the deformed coords, instead of the axis-aligned moves
+# of the Q-value steps (see RL_QvalueComputeScriptNEW.py):
+#
+# The script needs the following input:
+#   .. the current state's xml inputfile (i.e., the first guess of the parameter values),
+#   .. optionally, the maximum number of iterations (default: LM_MAX_ITERATIONS).
+#
+# Every iteration uses the same simulations as the TestActions 0, 1 and 3 of a Q-value step,
+# i.e., the current parameter set and its +epsilon manipulations (epsilon_lam, epsilon_mu),
+# and builds the forward-difference Jacobian of the whole deformed-coords field w.r.t. (lambda, mu)
+# from them. The update of all parameters at once solves the damped normal equations
+#   (J^T J + damping * diag(J^T J)) delta = -J^T r,   r = simulated - real deformed coords,
+# and is accepted if the RMSE-value of the updated parameter set (one further simulation) is smaller
+# (then the damping is decreased); otherwise, the damping is increased and the update is recomputed
+# with the same Jacobian (without further simulations for the Jacobian).
+# The calibration is converged, if the relative update of all parameters is below LM_TOLERANCE.
+#
+# All simulations are looked up in / stored to the SimResultsCache, and recorded in the run history
+# store (the first guess as action 0, the +epsilon manipulations as actions 1 and 3, the updated
+# parameter sets as action -1), see RL_RunHistoryStore.py.
+#
+# The output is the following:
+#   .. the calibrated xml inputfile.
+#
+# To run the script, call:
+#   python RL_LevenbergMarquardtCalibrator.py <xml-inputfile> [<max-iterations>]
+#
+# Example:
+#   python RL_LevenbergMarquardtCalibrator.py elastScen_Beam_RLalgo_TestInput_SIMDATA.xml 10
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-17}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-17"
+
+import sys
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_QvalueComputeScriptNEW
+import RL_ReferenceDataStore
+import RL_SimResultsCache
+import RL_RunTracer
+import RL_RunHistoryStore
+import RL_StepSizeController
+
+
+LM_MAX_ITERATIONS = 10
+LM_TOLERANCE = 1e-4
+
+# Damping (relative to the diagonal of J^T J), and its adaptation on accepted/rejected updates:
+LM_INITIAL_DAMPING = 1e-2
+LM_DAMPING_DECREASE = 1.0 / 3.0
+LM_DAMPING_INCREASE = 4.0
+LM_MAX_REJECTIONS = 8
+
+
+def jacobian_assembler(defcoords, defcoords_lam, defcoords_mu, epsilon_lam, epsilon_mu):
+
+    # Forward-difference Jacobian (num_points*dim x 2) of the deformed coords w.r.t. (lambda, mu):
+    return np.column_stack([(np.ravel(defcoords_lam) - np.ravel(defcoords)) / epsilon_lam,
+                            (np.ravel(defcoords_mu) - np.ravel(defcoords)) / epsilon_mu])
+
+
+def lm_update_solver(jacobian, residual, damping):
+
+    # Solve the damped normal equations for the update delta of (lambda, mu):
+    jtj = np.dot(jacobian.T, jacobian)
+    jtr = np.dot(jacobian.T, residual)
+    return np.linalg.solve(jtj + damping * np.diag(np.diag(jtj)), -jtr)
+
+
+def lm_calibrator_runner(xmlinputfile, maxiterations=LM_MAX_ITERATIONS, run_id=None, cachedir=RL_SimResultsCache.CACHE_DIR,
+                         epsilon_lam=RL_QvalueComputeScriptNEW.EPSILON_LAM, epsilon_mu=RL_QvalueComputeScriptNEW.EPSILON_MU):
+
+    # Run the Levenberg-Marquardt iterations (see above), starting from the parameter set of the xml-inputfile,
+    # which is updated after every accepted update. Returns the number of iterations and the final RMSE-value.
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_run_starter('RL_LevenbergMarquardtCalibrator', xmlinputfile)
+    path_and_realdata = RL_QvalueComputeScriptNEW.TESTSIMRESULTS_DIR + RL_QvalueComputeScriptNEW.REALDATA_FILENAME
+    realcoords = np.ravel(RL_ReferenceDataStore.reference_coords_loader(path_and_realdata))
+
+    params = np.array(RL_StepSizeController.parameters_reader(xmlinputfile))
+    damping = LM_INITIAL_DAMPING
+    rmse_value, defcoords = RL_QvalueComputeScriptNEW.candidate_evaluator(xmlinputfile, params[0], params[1], 1, cachedir, run_id, 0, True)
+    if rmse_value is None:
+        raise ValueError('The simulation of the first guess (lambda = %s, mu = %s) failed.' % tuple(params))
+
+    iteration = 0
+    while iteration < maxiterations:
+        iteration += 1
+        step = str(iteration)
+        with RL_RunTracer.trace_context(step=step), RL_RunTracer.trace_span('lm_step'):
+            # 1.) Jacobian from the +epsilon manipulations (i.e., the TestActions 1 and 3):
+            rmse_lam, defcoords_lam = RL_QvalueComputeScriptNEW.candidate_evaluator(xmlinputfile, params[0] + epsilon_lam, params[1], step, cachedir, run_id, 1, True)
+            rmse_mu, defcoords_mu = RL_QvalueComputeScriptNEW.candidate_evaluator(xmlinputfile, params[0], params[1] + epsilon_mu, step, cachedir, run_id, 3, True)
+            if defcoords_lam is None or defcoords_mu is None:
+                print colored('The Jacobian in Iteration %s could not be computed (failed simulation). LM calibration STOPPED.\n' % iteration, 'red')
+                break
+            jacobian = jacobian_assembler(defcoords, defcoords_lam, defcoords_mu, epsilon_lam, epsilon_mu)
+            residual = np.ravel(defcoords) - realcoords
+
+            # 2.) Damped update, (re)computed with increased damping until the RMSE-value decreases:
+            accepted = False
+            for rejection in range(LM_MAX_REJECTIONS):
+                delta = lm_update_solver(jacobian, residual, damping)
+                trial = np.maximum(params + delta, 0.0)
+                rmse_trial, defcoords_trial = RL_QvalueComputeScriptNEW.candidate_evaluator(xmlinputfile, trial[0], trial[1], step, cachedir, run_id, RL_QvalueComputeScriptNEW.LINE_SEARCH_ACTION, True)
+                if rmse_trial is not None and rmse_trial < rmse_value:
+                    accepted = True
+                    damping *= LM_DAMPING_DECREASE
+                    break
+                damping *= LM_DAMPING_INCREASE
+
+            if not accepted:
+                print colored('No decreasing update found in Iteration %s (damping %s). LM calibration converged.\n' % (iteration, damping), 'green')
+                break
+
+            relative_update = np.abs(trial - params) / np.maximum(np.abs(params), 1.0)
+            params, rmse_value, defcoords = trial, rmse_trial, defcoords_trial
+            RL_StepSizeController.parameters_writer(xmlinputfile, params[0], params[1])
+            RL_RunHistoryStore.history_step_recorder(run_id, iteration, RL_QvalueComputeScriptNEW.LINE_SEARCH_ACTION, params[0], params[1])
+            print colored('Iteration %s: lambda = %s, mu = %s, RMSE value: %s (damping %s).\n' % (iteration, params[0], params[1], rmse_value, damping), 'green')
+
+        if relative_update.max() < LM_TOLERANCE:
+            print colored('Relative update below %s in Iteration %s. LM calibration converged.\n' % (LM_TOLERANCE, iteration), 'green')
+            break
+
+    return iteration, rmse_value
+
+
+def main(xmlinputfile, maxiterations=LM_MAX_ITERATIONS):
+
+    run_id = RL_RunHistoryStore.history_run_starter('RL_LevenbergMarquardtCalibrator', xmlinputfile)
+    iteration, rmse_value = lm_calibrator_runner(xmlinputfile, int(maxiterations), run_id)
+    print('Finished after %s iterations with RMSE value %s.' % (iteration, rmse_value))
+    RL_RunHistoryStore.history_summary(run_id)
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('LevenbergMarquardtCalibrator STARTED. \n', 'yellow')
+    main(*sys.argv[1:])
+    print('\n')
+    print colored('LevenbergMarquardtCalibrator FINISHED. \n', 'yellow')
@@ -0,0 +1,127 @@
+#######################################################################
+# Python script providing a managed launcher for external programs,
+# e.g. the HiFlow3-based elasticity simulation ('./elasticity' or
+# 'mpirun -np N elasticity'), with wall-clock and memory limits and
+# with resource accounting:
+#
+# The launcher needs the following input:
+#   .. the command to be executed (run by the shell, in its own process group),
+#   .. optionally, the wall-clock limit (s): if exceeded, the whole process group is
+#      terminated (SIGTERM, and SIGKILL after KILL_GRACE_PERIOD s),
+#   .. optionally, the memory limit (bytes): the address space of every process of the
+#      command (e.g. of every MPI rank) is limited to it (RLIMIT_AS), such that allocations
+#      beyond it fail.
+#
+# The output is the following (as dict):
+#   .. exit_status: exit code of the command, or -N if it was terminated by signal N,
+#   .. timed_out: whether the wall-clock limit was exceeded,
+#   .. wall_time, user_time, sys_time (s), and max_rss (peak resident set size, bytes),
+#      where the CPU times and max_rss include all (waited-for) descendants of the command.
+#
+# To run a command with limits, call:
+#   python RL_ManagedLauncher.py <wall-clock-limit-in-s> <memory-limit-in-bytes> <command>
+#   (with 0 for no limit)
+#
+# Example:
+#   python RL_ManagedLauncher.py 3600 4000000000 "./elasticity elastScen_Beam_RLalgo_TestInput_SIMDATA.xml"
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-12}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-12"
+
+import sys
+import os
+import time
+import signal
+import resource
+import subprocess
+
+from termcolor import colored # for colored terminal output for better overview.
+
+
+# Time (s) between SIGTERM and SIGKILL for commands exceeding their wall-clock limit:
+KILL_GRACE_PERIOD = 10.0
+
+# Maximum interval (s) of polling for the termination of the command:
+POLL_INTERVAL = 0.1
+
+
+def resource_limiter(max_memory):
+
+    # Return the function, which is executed in the child process before the command:
+    # start a new process group (in order to terminate all processes of the command at once),
+    # and limit the address space (if max_memory is given).
+    def preexec():
+        os.setsid()
+        if max_memory:
+            resource.setrlimit(resource.RLIMIT_AS, (int(max_memory), int(max_memory)))
+    return preexec
+
+
+def managed_launcher(cmd, timeout=None, max_memory=None):
+
+    # Run the command with the given wall-clock limit (s) and memory limit (bytes) (None: no limit),
+    # and return the exit status and the resource usage (dict, see above).
+    starttime = time.time()
+    process = subprocess.Popen(cmd, shell=True, preexec_fn=resource_limiter(max_memory))
+
+    timed_out = False
+    killtime = None
+    interval = 0.001
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid != 0:
+            break
+        now = time.time()
+        if timeout and not timed_out and now - starttime > float(timeout):
+            print colored('Wall-clock limit of %s s exceeded, terminating: %s' % (timeout, cmd), 'red')
+            timed_out = True
+            killtime = now + KILL_GRACE_PERIOD
+            process_group_killer(process.pid, signal.SIGTERM)
+        elif killtime is not None and now > killtime:
+            process_group_killer(process.pid, signal.SIGKILL)
+            killtime = None
+        time.sleep(interval)
+        interval = min(2.0 * interval, POLL_INTERVAL)
+    if timed_out:
+        # kill the remaining processes of the command (e.g. MPI ranks ignoring SIGTERM):
+        process_group_killer(process.pid, signal.SIGKILL)
+    if os.WIFSIGNALED(status):
+        exit_status = -os.WTERMSIG(status)
+    else:
+        exit_status = os.WEXITSTATUS(status)
+    process.returncode = exit_status # (the process has already been waited for)
+
+    # ru_maxrss is given in kilobytes on Linux, and in bytes on Mac OS X:
+    max_rss = rusage.ru_maxrss if sys.platform == 'darwin' else 1024 * rusage.ru_maxrss
+
+    return {'exit_status': exit_status, 'timed_out': timed_out, 'wall_time': time.time() - starttime,
+            'user_time': rusage.ru_utime, 'sys_time': rusage.ru_stime, 'max_rss': max_rss,
+            'timeout': timeout, 'max_memory': max_memory}
+
+
+def process_group_killer(pgid, sig):
+
+    # Send the signal to all processes of the process group (which may have terminated already):
+    try:
+        os.killpg(pgid, sig)
+    except OSError:
+        pass
+
+
+def usage_reporter(usage):
+
+    # Print the exit status and the resource usage of a launch:
+    print('Exit status: %s%s; wall time: %.2f s; CPU time: %.2f s user + %.2f s sys; max RSS: %.1f MB.' % (usage['exit_status'], ' (wall-clock limit exceeded)' if usage['timed_out'] else '', usage['wall_time'], usage['user_time'], usage['sys_time'], usage['max_rss'] / 1048576.0))
+
+
+if __name__ == '__main__':
+    timeout = float(sys.argv[1]) or None
+    max_memory = int(sys.argv[2]) or None
+    usage = managed_launcher(' '.join(sys.argv[3:]), timeout, max_memory)
+    usage_reporter(usage)
+    sys.exit(usage['exit_status'] if usage['exit_status'] >= 0 else 128 - usage['exit_status'])
@@ -0,0 +1,123 @@
+#######################################################################
+# Python script for running several calibrations (Q-value steps until action 0, as in RL_GeneralRunScriptNEW.py)
+# from different first guesses concurrently, instead of re-initializing the program by hand with another
+# first guess after every local solution:
+#
+# The script needs the following input:
+#   .. the number of parallel processes (shared by all calibrations),
+#   .. the xml inputfiles of the first guesses (one calibration per xml inputfile, each with its own file name).
+#
+# Every calibration (trajectory) runs in its own thread, and all of them submit their TestActions to one
+# shared process pool; their TestActions are simulated in their own scratch directories (RL_TestSimResults_StartN_...).
+# They share the SimResultsCache: a parameter set, which is being simulated by one trajectory, is not simulated again
+# by another one, but taken from the cache (see RL_SimResultsCache.simresults_cache_claimer), i.e., overlapping
+# neighbourhoods of the trajectories are simulated only once.
+#
+# The output is the following:
+#   .. the calibrated xml inputfiles (i.e., the local solutions of all first guesses),
+#   .. every trajectory as one run in the run history store (see RL_RunHistoryStore.py),
+#   .. the summary of the local solutions, and the best one.
+#
+# To run the script, call:
+#   python RL_MultiStartCalibrator.py <num-parallel-processes> <xml-inputfile> [<xml-inputfile> ...]
+#
+# Example:
+#   python RL_MultiStartCalibrator.py 8 elastScen_Beam_Start0.xml elastScen_Beam_Start1.xml elastScen_Beam_Start2.xml
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-18}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-18"
+
+import sys
+import threading
+import multiprocessing
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_QvalueComputeScriptNEW
+import RL_SimResultsCache
+import RL_RunTracer
+import RL_RunHistoryStore
+import RL_CoarseToFineSchedule
+import RL_StepSizeController
+
+
+MULTISTART_MAX_STEPS = 100
+
+
+def trajectory_runner(xmlinputfile, start_number, pool, numworkers, run_id, results):
+
+    # Run the Q-value steps of one trajectory until action 0 (in a thread), and store its result
+    # (dict with start, xml, run_id, steps, lambda, mu, rmse, error) in results[start_number]:
+    result = {'start': start_number, 'xml': xmlinputfile, 'run_id': run_id, 'steps': 0, 'lambda': None, 'mu': None, 'rmse': None, 'error': None}
+    try:
+        action_number_out = -1
+        while action_number_out != 0 and result['steps'] < MULTISTART_MAX_STEPS:
+            result['steps'] += 1
+            with RL_RunTracer.trace_context(step=str(result['steps']), start=start_number), RL_RunTracer.trace_span('qvalue_step'):
+                action_number_out = RL_QvalueComputeScriptNEW.qvalue_computer(xmlinputfile, str(result['steps']), numworkers, run_id=run_id, pool=pool,
+                                                                              workspace_prefix=RL_QvalueComputeScriptNEW.TESTSIMRESULTS_DIR[:-1] + '_Start' + str(start_number))
+            print colored('Start %s: the best ActionNumber of Step %s is %s.\n' % (start_number, result['steps'], action_number_out), 'green')
+        result['lambda'], result['mu'] = RL_StepSizeController.parameters_reader(xmlinputfile)
+        result['rmse'] = RL_CoarseToFineSchedule.chosen_rmse_value(run_id, result['steps'], action_number_out)
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+        print colored('The trajectory of Start %s (%s) FAILED: %s' % (start_number, xmlinputfile, result['error']), 'red')
+    finally:
+        RL_SimResultsCache.simresults_cache_releaser()
+        results[start_number] = result
+
+
+def multistart_runner(xmlinputfiles, numworkers=1):
+
+    # Run the trajectories of all xml-inputfiles concurrently on one shared process pool.
+    # Returns the list of their results (see trajectory_runner).
+    run_ids = [RL_RunHistoryStore.history_run_starter('RL_MultiStartCalibrator', xmlinputfile) for xmlinputfile in xmlinputfiles]
+    results = [None] * len(xmlinputfiles)
+    print colored('Running %s trajectories on %s shared parallel processes.\n' % (len(xmlinputfiles), numworkers), 'yellow')
+    pool = multiprocessing.Pool(processes=max(1, int(numworkers)))
+    try:
+        threads = [threading.Thread(target=trajectory_runner, args=(xmlinputfile, start_number, pool, numworkers, run_ids[start_number], results))
+                   for start_number, xmlinputfile in enumerate(xmlinputfiles)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def best_result(results):
+
+    # Get the result with the smallest RMSE-value (None if no trajectory succeeded):
+    results = [result for result in results if result['error'] is None and result['rmse'] is not None]
+    if len(results) == 0:
+        return None
+    return min(results, key=lambda result: result['rmse'])
+
+
+def main(numworkers, *xmlinputfiles):
+
+    results = multistart_runner(list(xmlinputfiles), int(numworkers))
+    for result in results:
+        if result['error'] is not None:
+            print('Start %s (%s): FAILED after %s steps (%s).' % (result['start'], result['xml'], result['steps'], result['error']))
+        else:
+            print('Start %s (%s): %s steps, lambda = %s, mu = %s, RMSE value %s.' % (result['start'], result['xml'], result['steps'], result['lambda'], result['mu'], result['rmse']))
+    best = best_result(results)
+    if best is not None:
+        print colored('Best local solution: Start %s (%s), lambda = %s, mu = %s, RMSE value %s.' % (best['start'], best['xml'], best['lambda'], best['mu'], best['rmse']), 'green')
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('MultiStartCalibrator STARTED. \n', 'yellow')
+    main(*sys.argv[1:])
+    print('\n')
+    print colored('MultiStartCalibrator FINISHED. \n', 'yellow')
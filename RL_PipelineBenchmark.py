@@ -0,0 +1,322 @@
+#######################################################################
+# Python script for benchmarking the calibration pipeline end-to-end,
+# i.e., RL_GeneralRunScriptNEW.main-style loops of Q-value steps, using the
+# deterministic stand-in simulator (RL_StandInElasticitySimulator.py) instead
+# of the HiFlow3 'elasticity' binary:
+#
+# The script needs the following input:
+#   .. the mesh resolutions of the stand-in beam mesh to be benchmarked (e.g. '2,4,6'),
+#   .. the (maximum) number of Q-value steps per mesh resolution,
+#   .. the number of parallel processes for the TestActions (see RL_QvalueComputeScriptNEW.py),
+#   .. optionally, the results-file of a previous benchmark run (baseline; '' for none),
+#   .. optionally, the configuration of the multi-fidelity screening (e.g. RL_ScreeningConfig.json).
+#
+# For every mesh resolution, the script sets up a scratch directory 'RL_Benchmark/MeshResN/' with
+# the SIMDATA xml-inputfile (first guess) and the REALDATA (stand-in simulation with the
+# REALDATA parameters, for all visualized timesteps), and runs the Q-value steps there (without SimResultsCache, such that
+# every candidate is simulated).
+#
+# The output is the following:
+#   .. the wall time per pipeline stage (xml setup, simulation, extraction of the deformed coords,
+#      pvtu2vtu conversion, reference data, RMSE computation, logging, other) per mesh resolution,
+#      (in parallel mode, the stages running in the worker processes are accounted as 'other'),
+#   .. the throughput in candidates (simulated TestActions) per minute,
+#   .. the scaling of the time per candidate with the number of cells (log-log slope), and the
+#      regressions w.r.t. the baseline (stages slower by more than REGRESSION_TOLERANCE),
+#   .. the results-file 'RL_Benchmark/RL_benchmark_results.json'.
+#
+# To run the script, call:
+#   python RL_PipelineBenchmark.py [<mesh-resolutions>] [<num-steps>] [<num-parallel-processes>] [<baseline-results-file>] [<screening-config-file>]
+#
+# Example:
+#   python RL_PipelineBenchmark.py 2,4,6 3 1 RL_Benchmark/RL_benchmark_results_previous.json
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-11}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-11"
+
+import sys
+import os
+import time
+import json
+import shutil
+
+import xml.etree.ElementTree as ET
+
+import vtk
+import numpy as np
+from vtk.util.numpy_support import numpy_to_vtk
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_QvalueComputeScriptNEW
+import RL_SimulationRunnerScript
+import RL_Pvtu2vtuConverterAndVMStressCalculator
+import RL_RMSEvalueComputeScript
+import RL_ReferenceDataStore
+import RL_DeformedCoordsExtractor
+import RL_StandInElasticitySimulator
+import RL_RunHistoryStore
+
+
+BENCHMARK_DIR = 'RL_Benchmark/'
+BENCHMARK_RESULTS_FILENAME = 'RL_benchmark_results.json'
+BENCHMARK_MESH_RESOLUTIONS = [2, 4, 6]
+BENCHMARK_NUM_STEPS = 3
+
+# xml-inputfiles providing the first guess (SIMDATA) and the REALDATA parameters:
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMDATA_XML_TEMPLATE = os.path.join(SCRIPT_DIR, 'HiFlow3_ElastSim_Corot', 'elastScen_Beam_RLalgo_TestInput_SIMDATA.xml')
+REALDATA_XML_TEMPLATE = os.path.join(SCRIPT_DIR, 'Test_RLSimInput', '00_elastScen_Beam_RLalgo_TestInput_REALDATA.xml')
+SIMDATA_XML_FILENAME = 'elastScen_Beam_RLalgo_TestInput_SIMDATA.xml'
+
+# Pipeline stages, and the functions (module, name) accounted to them:
+BENCHMARK_STAGES = ['xml_setup', 'simulation', 'extraction', 'conversion', 'reference_data', 'rmse', 'logging', 'other']
+BENCHMARK_STAGE_FUNCTIONS = [
+    ('xml_setup', RL_QvalueComputeScriptNEW, 'testaction_setupper'),
+    ('simulation', RL_SimulationRunnerScript, 'simulation_runner'),
+    ('extraction', RL_DeformedCoordsExtractor, 'defcoords_extractor'),
+    ('conversion', RL_Pvtu2vtuConverterAndVMStressCalculator, 'pvtu2vtu_converter'),
+    ('reference_data', RL_ReferenceDataStore, 'reference_coords_loader'),
+    ('rmse', RL_RMSEvalueComputeScript, 'rmsevalues_from_coords_batched'),
+    ('logging', RL_RunHistoryStore, 'history_candidates_recorder'),
+    ('logging', RL_RunHistoryStore, 'history_step_recorder'),
+]
+
+# Relative slowdown (per stage and per candidate) w.r.t. the baseline, which is reported as regression
+# (slowdowns of less than REGRESSION_MIN_SECONDS per candidate are considered as noise):
+REGRESSION_TOLERANCE = 0.2
+REGRESSION_MIN_SECONDS = 0.01
+
+
+def benchmark_setupper(workdir, resolution):
+
+    # Set up the scratch directory for the given mesh resolution: the SIMDATA xml-inputfile (first guess),
+    # and the REALDATA as '_outVis.vtu' files (i.e., with the deformed coords as points) in RL_TestSimResults/
+    # (for all visualized timesteps, such that the screening levels can compare truncated simulations).
+    try:
+        shutil.rmtree(workdir)
+    except:
+        pass
+    os.makedirs(workdir)
+
+    shutil.copy(SIMDATA_XML_TEMPLATE, os.path.join(workdir, SIMDATA_XML_FILENAME))
+
+    tree = ET.parse(REALDATA_XML_TEMPLATE)
+    for param_out in tree.getroot().iter('OutputPathAndPrefix'):
+        param_out.text = RL_QvalueComputeScriptNEW.TESTSIMRESULTS_DIR + 'Beam_REALDATA'
+    realdata_xml = os.path.join(workdir, os.path.basename(REALDATA_XML_TEMPLATE))
+    tree.write(realdata_xml)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        pvtufilenames = RL_StandInElasticitySimulator.standin_simulator(os.path.basename(realdata_xml), resolution)
+        for path_and_pvtu in pvtufilenames:
+            timestep = int(path_and_pvtu[-9:-5])
+            realdata_outvis_writer(path_and_pvtu, RL_QvalueComputeScriptNEW.TESTSIMRESULTS_DIR + RL_QvalueComputeScriptNEW.REALDATA_FILENAME_TEMPLATE % timestep)
+    finally:
+        os.chdir(cwd)
+
+
+def realdata_outvis_writer(path_and_pvtu, outputfilename):
+
+    # Write the simulation results of the given pvtu file as '_outVis.vtu' file,
+    # i.e., with the deformed coords (coords + (u0,u1,u2)) as points:
+    reader = vtk.vtkXMLPUnstructuredGridReader()
+    reader.SetFileName(path_and_pvtu)
+    reader.Update()
+    grid = reader.GetOutput()
+
+    points = vtk.vtkPoints()
+    points.SetData(numpy_to_vtk(np.ascontiguousarray(RL_DeformedCoordsExtractor.defcoords_extractor(path_and_pvtu)), deep=1))
+    grid.SetPoints(points)
+
+    writer = vtk.vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(outputfilename)
+    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+        writer.SetInputData(grid)
+    else:
+        writer.SetInput(grid)
+    writer.Write()
+
+
+def stage_timer(stage, function, stage_times, stage_calls, active):
+
+    # Wrap the given function, such that its wall time is accounted to the given stage
+    # (nested calls of timed functions are only accounted to the outermost stage):
+    def timed_function(*args, **kwargs):
+        if active:
+            return function(*args, **kwargs)
+        active.append(stage)
+        starttime = time.time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stage_times[stage] += time.time() - starttime
+            stage_calls[stage] += 1
+            active.pop()
+    return timed_function
+
+
+def benchmark_runner(resolution, numsteps=BENCHMARK_NUM_STEPS, numworkers=1, write_outvis=True, benchmarkdir=BENCHMARK_DIR, screening=None):
+
+    # Run (at most) numsteps Q-value steps with the stand-in simulator for the given mesh resolution
+    # (with the multi-fidelity screening, if its configuration is given).
+    # Returns the benchmark results (dict) of this mesh resolution.
+    workdir = os.path.join(benchmarkdir, 'MeshRes%s' % resolution)
+    benchmark_setupper(workdir, resolution)
+
+    points, num_cells = RL_StandInElasticitySimulator.standin_mesh_generator(resolution)
+
+    stage_times = dict((stage, 0.0) for stage in BENCHMARK_STAGES)
+    stage_calls = dict((stage, 0) for stage in BENCHMARK_STAGES)
+    active = []
+    candidates = []
+
+    # Count the candidates on the side of the calling process (every set-up TestAction is simulated, since there is no cache):
+    testaction_setupper = RL_QvalueComputeScriptNEW.testaction_setupper
+    def counting_testaction_setupper(*args, **kwargs):
+        outfilenamestring, outputprefix = testaction_setupper(*args, **kwargs)
+        if outfilenamestring is not None:
+            candidates.append(outfilenamestring)
+        return outfilenamestring, outputprefix
+
+    originals = []
+    for stage, module, name in BENCHMARK_STAGE_FUNCTIONS:
+        originals.append((module, name, getattr(module, name)))
+        function = counting_testaction_setupper if name == 'testaction_setupper' else getattr(module, name)
+        setattr(module, name, stage_timer(stage, function, stage_times, stage_calls, active))
+    executable = RL_SimulationRunnerScript.HIFLOW_EXECUTABLE_SEQUENTIAL
+    RL_SimulationRunnerScript.HIFLOW_EXECUTABLE_SEQUENTIAL = 'python %s %s' % (os.path.join(SCRIPT_DIR, 'RL_StandInElasticitySimulator.py'), resolution)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        # RL_GeneralRunScriptNEW.main-style loop (with at most numsteps steps):
+        starttime = time.time()
+        run_id = RL_RunHistoryStore.history_run_starter('benchmark', 'resolution %s, %s workers' % (resolution, numworkers))
+        step = 0
+        action_number_out = -1
+        while action_number_out != 0 and step < numsteps:
+            step += 1
+            action_number_out = RL_QvalueComputeScriptNEW.qvalue_computer(SIMDATA_XML_FILENAME, str(step), numworkers, None, write_outvis, run_id, screening)
+        total_time = time.time() - starttime
+    finally:
+        os.chdir(cwd)
+        RL_SimulationRunnerScript.HIFLOW_EXECUTABLE_SEQUENTIAL = executable
+        for module, name, function in originals:
+            setattr(module, name, function)
+
+    stage_times['other'] = max(total_time - sum(stage_times.values()), 0.0)
+    num_candidates = len(candidates)
+
+    return {'resolution': resolution, 'num_cells': num_cells, 'num_points': points.shape[0],
+            'num_steps': step, 'num_candidates': num_candidates, 'num_workers': numworkers,
+            'total_time': total_time, 'stage_times': stage_times, 'stage_calls': stage_calls,
+            'time_per_candidate': total_time / max(num_candidates, 1),
+            'candidates_per_minute': 60.0 * num_candidates / total_time if total_time > 0.0 else 0.0}
+
+
+def scaling_exponent(results, stage=None):
+
+    # Compute the log-log slope of the time per candidate (of the given stage, or in total)
+    # over the number of cells, i.e., time ~ num_cells^slope (None for less than 2 mesh resolutions):
+    cells, times = [], []
+    for result in results:
+        if stage is None:
+            t = result['time_per_candidate']
+        else:
+            t = result['stage_times'][stage] / max(result['num_candidates'], 1)
+        if t > 0.0:
+            cells.append(result['num_cells'])
+            times.append(t)
+    if len(cells) < 2:
+        return None
+    return float(np.polyfit(np.log(cells), np.log(times), 1)[0])
+
+
+def regression_finder(results, baseline_results, tolerance=REGRESSION_TOLERANCE):
+
+    # Compare the times per candidate (per stage and in total) with the baseline results of the same mesh resolution
+    # and the same number of parallel processes. Returns the list of regressions (resolution, stage, baseline time, time) slower by more than the tolerance.
+    regressions = []
+    baseline = dict((result['resolution'], result) for result in baseline_results)
+    for result in results:
+        if result['resolution'] not in baseline or baseline[result['resolution']]['num_workers'] != result['num_workers']:
+            continue
+        base = baseline[result['resolution']]
+        comparisons = [('total', base['time_per_candidate'], result['time_per_candidate'])]
+        for stage in BENCHMARK_STAGES:
+            comparisons.append((stage, base['stage_times'][stage] / max(base['num_candidates'], 1), result['stage_times'][stage] / max(result['num_candidates'], 1)))
+        for stage, base_time, new_time in comparisons:
+            if new_time > (1.0 + tolerance) * base_time and new_time - base_time > REGRESSION_MIN_SECONDS:
+                regressions.append((result['resolution'], stage, base_time, new_time))
+    return regressions
+
+
+def benchmark_reporter(results, regressions=None):
+
+    # Print the per-stage wall times, the throughput and the scaling over the mesh resolutions:
+    print colored('Benchmark results (wall time per stage in s):', 'green')
+    print('%-16s' % 'resolution' + ''.join(['%12s' % result['resolution'] for result in results]))
+    print('%-16s' % 'num_cells' + ''.join(['%12s' % result['num_cells'] for result in results]))
+    print('%-16s' % 'num_candidates' + ''.join(['%12s' % result['num_candidates'] for result in results]))
+    for stage in BENCHMARK_STAGES:
+        print('%-16s' % stage + ''.join(['%12.3f' % result['stage_times'][stage] for result in results]))
+    print('%-16s' % 'total' + ''.join(['%12.3f' % result['total_time'] for result in results]))
+    print('%-16s' % 'cand./minute' + ''.join(['%12.1f' % result['candidates_per_minute'] for result in results]))
+
+    slope = scaling_exponent(results)
+    if slope is not None:
+        print('\nScaling of the time per candidate with the number of cells: ~ num_cells^%.2f' % slope)
+        for stage in BENCHMARK_STAGES:
+            slope = scaling_exponent(results, stage)
+            if slope is not None:
+                print('  %-16s ~ num_cells^%.2f' % (stage, slope))
+
+    if regressions is not None:
+        if len(regressions) == 0:
+            print colored('\nNo regressions w.r.t. the baseline.', 'green')
+        for resolution, stage, base_time, new_time in regressions:
+            print colored('REGRESSION: resolution %s, stage %s: %.4f s -> %.4f s per candidate.' % (resolution, stage, base_time, new_time), 'red')
+
+
+def benchmark_suite(resolutions=BENCHMARK_MESH_RESOLUTIONS, numsteps=BENCHMARK_NUM_STEPS, numworkers=1, baselinefile=None, benchmarkdir=BENCHMARK_DIR, screening=None):
+
+    # Run the benchmark for all given mesh resolutions, report and store the results.
+    # Returns the results and the regressions w.r.t. the baseline (None without baseline).
+    results = [benchmark_runner(resolution, numsteps, numworkers, True, benchmarkdir, screening) for resolution in resolutions]
+
+    regressions = None
+    if baselinefile:
+        with open(baselinefile, 'r') as f:
+            regressions = regression_finder(results, json.load(f)['results'])
+
+    benchmark_reporter(results, regressions)
+
+    resultsfile = os.path.join(benchmarkdir, BENCHMARK_RESULTS_FILENAME)
+    with open(resultsfile, 'w') as f:
+        json.dump({'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}, f, indent=1, sort_keys=True)
+    print('\nBenchmark results written to %s.' % resultsfile)
+
+    return results, regressions
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('PipelineBenchmark STARTED. \n', 'yellow')
+    resolutions = [int(r) for r in sys.argv[1].split(',')] if len(sys.argv) > 1 else BENCHMARK_MESH_RESOLUTIONS
+    numsteps = int(sys.argv[2]) if len(sys.argv) > 2 else BENCHMARK_NUM_STEPS
+    numworkers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    baselinefile = sys.argv[4] if len(sys.argv) > 4 else None
+    screening = RL_QvalueComputeScriptNEW.screening_config_loader(sys.argv[5]) if len(sys.argv) > 5 else None
+    results, regressions = benchmark_suite(resolutions, numsteps, numworkers, baselinefile, BENCHMARK_DIR, screening)
+    print('\n')
+    print colored('PipelineBenchmark FINISHED. \n', 'yellow')
+    if regressions:
+        sys.exit(1)
@@ -12,6 +12,8 @@
 # displacement vector, the strain tensor and the von Mises stress 
 # for material parameters \lambda={28466-40666-56933} and \mu={700-1000-1400}, 
 # which corresponds to mitral valve leaflets tissue (according to [Mansi-2012]).
+# The von Mises stress is computed with numpy (see RL_VonMisesStressCalculator.py), 
+# for one or several (comma-separated) pairs of material parameters at once.
 # Furthermore, the displacement vector will be added to the given 
 # coordinates of the points.
 # 
@@ -21,11 +23,25 @@
 #    displacement vector as additional PointData and the strain tensor 
 #    along with the von Mises stress distribution as additional CellData.
 # 
+# The encoding of the output vtu file(s) can be selected by an optional argument:
+#  - 'binary' (default): appended raw binary data,
+#  - 'zlib' or 'lz4': appended zlib- or lz4-compressed binary data (lz4 requires VTK >= 8.1),
+#  - 'ascii': human-readable, for debugging only (several times larger and slower to write and read).
+# 
 # To run the script, call:
-#   python vMStress.py <path_to_(series_of)_inputfile(s)> <lambda> <mu>
+#   python vMStress.py <path_to_(series_of)_inputfile(s)> <lambda> <mu> [<output-encoding>] [<timestep(s)>]
+# 
+# If <timestep(s)> is given (e.g. '10' or '0,5,10'), only the pvtu files of these timesteps 
+# ('*_Tstep.0010.pvtu', ...) are processed, instead of all pvtu files in the given directory.
+# 
+# or, from within python (without starting a new interpreter):
+#   RL_Pvtu2vtuConverterAndVMStressCalculator.pvtu2vtu_converter(<path>, <lambda>, <mu>, <output-encoding>, <timestep(s)>)
 # 
 # Example with pvtu:
 # python Pvtu2vtuConverterAndVMStressCalculator.py SimResults/ 28466 700
+# python Pvtu2vtuConverterAndVMStressCalculator.py SimResults/ 28466 700 ascii
+# python Pvtu2vtuConverterAndVMStressCalculator.py SimResults/ 28466 700 binary 10
+# python Pvtu2vtuConverterAndVMStressCalculator.py SimResults/ 28466,40666,56933 700,1000,1400
 # 
 # author = {Nicolai Schoch}
 # date = {2017-07-21}
@@ -38,198 +54,244 @@ __date__ = "2017-07-21"
 import sys
 import vtk
 import glob
+import numpy as np
+from vtk.util.numpy_support import vtk_to_numpy, numpy_to_vtk
+
+import RL_VonMisesStressCalculator
+import RL_RunTracer
+
+
+# Available encodings of the output vtu file(s):
+OUTPUT_ENCODINGS = ['binary', 'zlib', 'lz4', 'ascii']
+
+
+def pvtu2vtu_converter(path, params_lambda, params_mu, output_encoding='binary', timesteps='all'):
+
+    # Convert the pvtu files in the directory 'path' (only the given timesteps, e.g. 10 or [0,5,10], or 'all'),
+    # and compute the von Mises stress for the given material parameter set(s) (scalars, or lists/comma-separated strings).
+    # Returns the list of the names of the written '_outVis.vtu' files.
+    print('==========================')
+    print('Pvtu2vtuConverter started. \n')
+
+    # Get path/directory of simulation results, and set path combined with datatype:
+    path_and_datatype = path + '*.pvtu'
+
+    # Get set of files to be processed by vMStress-Evaluator-Script:
+    files_to_be_iterated_over = glob.glob(path_and_datatype)
+
+    # filter out the '_deformedSolution_' files from this list:
+    files_to_be_really_iterated_over  = [ i for i in files_to_be_iterated_over if (i.find("_deformedSolution_") == -1 and i.find("_initial_mesh_") == -1 and i.find("_REALDATA_") == -1) ]
+
+    # Get timestep(s) to be processed (e.g. '10' or '0,5,10'; default: 'all'),
+    # and filter out the files of all other timesteps from this list:
+    if timesteps is not None and str(timesteps) != 'all':
+        if not isinstance(timesteps, (list, tuple)):
+            timesteps = str(timesteps).split(',')
+        timesteps_to_be_processed = [int(ts) for ts in timesteps]
+        files_to_be_really_iterated_over  = [ i for i in files_to_be_really_iterated_over if any(i.endswith('_Tstep.%04d.pvtu' % ts) for ts in timesteps_to_be_processed) ]
+
+    print('The following file list will be iterated over and processed by the pvtu2vtu converter:')
+    #print files_to_be_iterated_over
+    #print('\n VS. \n')
+    print files_to_be_really_iterated_over 
+
+    # Get material parameters (one parameter set, or comma-separated lists of parameter sets):
+    if not isinstance(params_lambda, (list, tuple)):
+        params_lambda = str(params_lambda).split(',')
+    if not isinstance(params_mu, (list, tuple)):
+        params_mu = str(params_mu).split(',')
+    matParamMVtissue_Lambda_strings = [str(lam) for lam in params_lambda]
+    matParamMVtissue_Lambda = [float(lam) for lam in matParamMVtissue_Lambda_strings]
+    matParamMVtissue_Mu_strings = [str(mu) for mu in params_mu]
+    matParamMVtissue_Mu = [float(mu) for mu in matParamMVtissue_Mu_strings]
+    if len(matParamMVtissue_Lambda) != len(matParamMVtissue_Mu):
+        raise ValueError('ERROR: THE NUMBER OF LAMBDA AND MU VALUES MUST BE EQUAL!')
+
+    # Check output encoding:
+    if output_encoding not in OUTPUT_ENCODINGS:
+        raise ValueError('ERROR: UNKNOWN OUTPUT ENCODING %s! PLEASE PROVIDE ONE OF %s.' % (output_encoding, OUTPUT_ENCODINGS))
+    if output_encoding == 'lz4' and not hasattr(vtk, 'vtkLZ4DataCompressor'):
+        raise ValueError('ERROR: OUTPUT ENCODING lz4 REQUIRES VTK >= 8.1! PLEASE USE zlib INSTEAD.')
+
+    #if sys.argv[2] != 'NONE':
+    #  matParamMVtissue_Lambda_string = sys.argv[2]
+    #  matParamMVtissue_Lambda = float(matParamMVtissue_Lambda_string)
+    #else:
+    #  matParamMVtissue_Lambda = 28466
+    #
+    #if sys.argv[3] != 'NONE':
+    #  matParamMVtissue_Mu_string = sys.argv[3]
+    #  matParamMVtissue_Mu = float(matParamMVtissue_Mu_string)
+    #else:
+    #  matParamMVtissue_Mu = 700
+
+
+    # Iterate over all pvtu-files in SimResults-directory and evaluate vonMises-Stress:
+    with RL_RunTracer.trace_span('conversion', path=path, num_files=len(files_to_be_really_iterated_over), num_paramsets=len(matParamMVtissue_Lambda)) as span:
+        
+        outputfilenames = []
+        for i in range(0,len(files_to_be_really_iterated_over )):
+    
+            # Get path and name of inputfile:
+            inputfilename = files_to_be_really_iterated_over [i]
+    
+            # Get path and name of outputfile:
+            if inputfilename[-4] == 'p':
+              outputfilename = inputfilename[:-5] + '_outVis.vtu'
+            else:
+              #outputfilename = 'outVis_' + inputfilename
+              print ('ERROR: THIS CASE IS NOT ALLOWED! PLEASE PROVIDE PVTU-FILES.')
+    
+            print ('current outputfilename: ', outputfilename)
+    
+            # Read (p)vtu file
+            if inputfilename[-4] == 'p':
+              reader = vtk.vtkXMLPUnstructuredGridReader()
+              reader.SetFileName(inputfilename)
+              reader.Update()
+            else:
+              print ('ERROR: THIS CASE IS NOT ALLOWED! PLEASE PROVIDE PVTU-FILES.')
+              reader = vtk.vtkXMLUnstructuredGridReader()
+              reader.SetFileName(inputfilename)
+              reader.Update()
+    
+            grid = reader.GetOutput()
+    
+    
+            # Get point data arrays u0, u1 and u2
+            u0 = grid.GetPointData().GetArray('u0')
+            u1 = grid.GetPointData().GetArray('u1')
+            u2 = grid.GetPointData().GetArray('u2')
+    
+            # Set scalars
+            grid.GetPointData().SetScalars(u0)
+    
+            # Warp by scalar u0
+            warpScalar = vtk.vtkWarpScalar()
+            if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+              warpScalar.SetInputData(grid)
+            else:
+              warpScalar.SetInput(grid)
+            warpScalar.SetNormal(1.0,0.0,0.0)
+            warpScalar.SetScaleFactor(1.0)
+            warpScalar.SetUseNormal(1)
+            warpScalar.Update()
+    
+            # Get output and set scalars
+            grid = warpScalar.GetOutput()
+            grid.GetPointData().SetScalars(u1)
+    
+            # Warp by scalar u1
+            warpScalar = vtk.vtkWarpScalar()
+            if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+              warpScalar.SetInputData(grid)
+            else:
+              warpScalar.SetInput(grid)
+            warpScalar.SetNormal(0.0,1.0,0.0)
+            warpScalar.SetScaleFactor(1.0)
+            warpScalar.SetUseNormal(1)
+            warpScalar.Update()
+    
+            # Get output and set scalars
+            grid = warpScalar.GetOutput()
+            grid.GetPointData().SetScalars(u2)
+    
+            # Warp by scalar u2
+            warpScalar = vtk.vtkWarpScalar()
+            if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+              warpScalar.SetInputData(grid)
+            else:
+              warpScalar.SetInput(grid)
+            warpScalar.SetNormal(0.0,0.0,1.0)
+            warpScalar.SetScaleFactor(1.0)
+            warpScalar.SetUseNormal(1)
+            warpScalar.Update()
+    
+            # Get ouput and add point data arrays that were deleted before
+            grid = warpScalar.GetOutput()
+            grid.GetPointData().AddArray(u0)
+            grid.GetPointData().AddArray(u1)
+            grid.GetPointData().AddArray(u2)
+    
+    
+            # Compute displacement vector
+            calc = vtk.vtkArrayCalculator()
+            if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+              calc.SetInputData(grid)
+            else:
+              calc.SetInput(grid)
+            calc.SetAttributeModeToUsePointData()
+            calc.AddScalarVariable('x', 'u0', 0)
+            calc.AddScalarVariable('y', 'u1', 0)
+            calc.AddScalarVariable('z', 'u2', 0)
+            calc.SetFunction('x*iHat+y*jHat+z*kHat')
+            calc.SetResultArrayName('DisplacementSolutionVector')
+            calc.Update()
+    
+    
+            # Compute strain tensor
+            derivative = vtk.vtkCellDerivatives()
+            if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+              derivative.SetInputData(calc.GetOutput())
+            else:
+              derivative.SetInput(calc.GetOutput())
+            derivative.SetTensorModeToComputeStrain()
+            derivative.Update()
+    
+    
+            # Compute von Mises stress (with numpy, for all material parameter sets in one pass over the strain field)
+            grid = derivative.GetOutput()
+            strain_numpy_array = vtk_to_numpy(grid.GetCellData().GetArray('Strain'))
+            vMstress_numpy_array = RL_VonMisesStressCalculator.vonmises_stress_batched(strain_numpy_array, matParamMVtissue_Lambda, matParamMVtissue_Mu)
+    
+            for k in range(0,len(matParamMVtissue_Lambda_strings)):
+              #calc.SetResultArrayName('vonMisesStress_forMV_mu1400_lambda56933') # DEPRECATED.
+              vMstressArrayName_string = 'vonMisesStress_forMV_lambda' + matParamMVtissue_Lambda_strings[k] + '_mu' + matParamMVtissue_Mu_strings[k]
+              vMstress_vtk_array = numpy_to_vtk(np.ascontiguousarray(vMstress_numpy_array[:,k]), deep=1)
+              vMstress_vtk_array.SetName(vMstressArrayName_string)
+              grid.GetCellData().AddArray(vMstress_vtk_array)
+    
+    
+            # Write output to vtu
+            writer = vtk.vtkXMLUnstructuredGridWriter()
+            if output_encoding == 'ascii':
+              writer.SetDataModeToAscii()
+            else:
+              # appended data, written as raw binary (not base64-encoded):
+              writer.SetDataModeToAppended()
+              writer.EncodeAppendedDataOff()
+              if output_encoding == 'zlib':
+                writer.SetCompressor(vtk.vtkZLibDataCompressor())
+              elif output_encoding == 'lz4':
+                writer.SetCompressor(vtk.vtkLZ4DataCompressor())
+              else:
+                writer.SetCompressor(None)
+            writer.SetFileName(outputfilename)
+            if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+              writer.SetInputData(grid)
+            else:
+              writer.SetInput(grid)
+            writer.Write()
+            outputfilenames.append(outputfilename)
+    
+            # ----------------------------------------------------------------------
+        
+        span.bytes_read = RL_RunTracer.files_size([f for inputfilename in files_to_be_really_iterated_over for f in RL_RunTracer.pvtu_files(inputfilename)])
+        span.bytes_written = RL_RunTracer.files_size(outputfilenames)
+
+    print('All files successfully processed.')
+    print('Pvtu2vtuConverter successfully finished.')
+
+    return outputfilenames
 
 
-print('==========================')
-print('Pvtu2vtuConverter started. \n')
-
-# Get path/directory of simulation results, and set path combined with datatype:
-path = sys.argv[1]
-path_and_datatype = path + '*.pvtu'
-
-# Get set of files to be processed by vMStress-Evaluator-Script:
-files_to_be_iterated_over = glob.glob(path_and_datatype)
-
-# filter out the '_deformedSolution_' files from this list:
-files_to_be_really_iterated_over  = [ i for i in files_to_be_iterated_over if (i.find("_deformedSolution_") == -1 and i.find("_initial_mesh_") == -1 and i.find("_REALDATA_") == -1) ]
-
-print('The following file list will be iterated over and processed by the pvtu2vtu converter:')
-#print files_to_be_iterated_over
-#print('\n VS. \n')
-print files_to_be_really_iterated_over 
-
-# Get material parameters:
-matParamMVtissue_Lambda_string = sys.argv[2]
-matParamMVtissue_Lambda = float(matParamMVtissue_Lambda_string)
-matParamMVtissue_Mu_string = sys.argv[3]
-matParamMVtissue_Mu = float(matParamMVtissue_Mu_string)
-
-#if sys.argv[2] != 'NONE':
-#  matParamMVtissue_Lambda_string = sys.argv[2]
-#  matParamMVtissue_Lambda = float(matParamMVtissue_Lambda_string)
-#else:
-#  matParamMVtissue_Lambda = 28466
-#
-#if sys.argv[3] != 'NONE':
-#  matParamMVtissue_Mu_string = sys.argv[3]
-#  matParamMVtissue_Mu = float(matParamMVtissue_Mu_string)
-#else:
-#  matParamMVtissue_Mu = 700
-
-
-# Iterate over all pvtu-files in SimResults-directory and evaluate vonMises-Stress:
-for i in range(0,len(files_to_be_really_iterated_over )):
-    
-    # Get path and name of inputfile:
-    inputfilename = files_to_be_really_iterated_over [i]
-    
-    # Get path and name of outputfile:
-    if inputfilename[-4] == 'p':
-      outputfilename = inputfilename[:-5] + '_outVis.vtu'
-    else:
-      #outputfilename = 'outVis_' + inputfilename
-      print ('ERROR: THIS CASE IS NOT ALLOWED! PLEASE PROVIDE PVTU-FILES.')
-    
-    print ('current outputfilename: ', outputfilename)
-    
-    # Read (p)vtu file
-    if inputfilename[-4] == 'p':
-      reader = vtk.vtkXMLPUnstructuredGridReader()
-      reader.SetFileName(inputfilename)
-      reader.Update()
-    else:
-      print ('ERROR: THIS CASE IS NOT ALLOWED! PLEASE PROVIDE PVTU-FILES.')
-      reader = vtk.vtkXMLUnstructuredGridReader()
-      reader.SetFileName(inputfilename)
-      reader.Update()
-    
-    grid = reader.GetOutput()
-    
-    
-    # Get point data arrays u0, u1 and u2
-    u0 = grid.GetPointData().GetArray('u0')
-    u1 = grid.GetPointData().GetArray('u1')
-    u2 = grid.GetPointData().GetArray('u2')
-    
-    # Set scalars
-    grid.GetPointData().SetScalars(u0)
-    
-    # Warp by scalar u0
-    warpScalar = vtk.vtkWarpScalar()
-    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
-      warpScalar.SetInputData(grid)
-    else:
-      warpScalar.SetInput(grid)
-    warpScalar.SetNormal(1.0,0.0,0.0)
-    warpScalar.SetScaleFactor(1.0)
-    warpScalar.SetUseNormal(1)
-    warpScalar.Update()
-    
-    # Get output and set scalars
-    grid = warpScalar.GetOutput()
-    grid.GetPointData().SetScalars(u1)
-    
-    # Warp by scalar u1
-    warpScalar = vtk.vtkWarpScalar()
-    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
-      warpScalar.SetInputData(grid)
-    else:
-      warpScalar.SetInput(grid)
-    warpScalar.SetNormal(0.0,1.0,0.0)
-    warpScalar.SetScaleFactor(1.0)
-    warpScalar.SetUseNormal(1)
-    warpScalar.Update()
-    
-    # Get output and set scalars
-    grid = warpScalar.GetOutput()
-    grid.GetPointData().SetScalars(u2)
-    
-    # Warp by scalar u2
-    warpScalar = vtk.vtkWarpScalar()
-    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
-      warpScalar.SetInputData(grid)
-    else:
-      warpScalar.SetInput(grid)
-    warpScalar.SetNormal(0.0,0.0,1.0)
-    warpScalar.SetScaleFactor(1.0)
-    warpScalar.SetUseNormal(1)
-    warpScalar.Update()
-    
-    # Get ouput and add point data arrays that were deleted before
-    grid = warpScalar.GetOutput()
-    grid.GetPointData().AddArray(u0)
-    grid.GetPointData().AddArray(u1)
-    grid.GetPointData().AddArray(u2)
-    
-    
-    # Compute displacement vector
-    calc = vtk.vtkArrayCalculator()
-    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
-      calc.SetInputData(grid)
-    else:
-      calc.SetInput(grid)
-    calc.SetAttributeModeToUsePointData()
-    calc.AddScalarVariable('x', 'u0', 0)
-    calc.AddScalarVariable('y', 'u1', 0)
-    calc.AddScalarVariable('z', 'u2', 0)
-    calc.SetFunction('x*iHat+y*jHat+z*kHat')
-    calc.SetResultArrayName('DisplacementSolutionVector')
-    calc.Update()
-    
-    
-    # Compute strain tensor
-    derivative = vtk.vtkCellDerivatives()
-    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
-      derivative.SetInputData(calc.GetOutput())
-    else:
-      derivative.SetInput(calc.GetOutput())
-    derivative.SetTensorModeToComputeStrain()
-    derivative.Update()
-    
-    
-    # Compute von Mises stress
-    calc = vtk.vtkArrayCalculator()
-    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
-      calc.SetInputData(derivative.GetOutput())
-    else:
-      calc.SetInput(derivative.GetOutput())
-    calc.SetAttributeModeToUseCellData()
-    calc.AddScalarVariable('Strain_0', 'Strain', 0)
-    calc.AddScalarVariable('Strain_1', 'Strain', 1)
-    calc.AddScalarVariable('Strain_2', 'Strain', 2)
-    calc.AddScalarVariable('Strain_3', 'Strain', 3)
-    calc.AddScalarVariable('Strain_4', 'Strain', 4)
-    calc.AddScalarVariable('Strain_5', 'Strain', 5)
-    calc.AddScalarVariable('Strain_6', 'Strain', 6)
-    calc.AddScalarVariable('Strain_7', 'Strain', 7)
-    calc.AddScalarVariable('Strain_8', 'Strain', 8)
-    
-    #calc.SetFunction('sqrt( (2*1400*Strain_0 + 56933*(Strain_0+Strain_4+Strain_8))^2 + (2*1400*Strain_4 + 56933*(Strain_0+Strain_4+Strain_8))^2 + (2*1400*Strain_8 + 56933*(Strain_0+Strain_4+Strain_8))^2 - ( (2*1400*Strain_0 + 56933*(Strain_0+Strain_4+Strain_8))*(2*1400*Strain_4 + 56933*(Strain_0+Strain_4+Strain_8)) ) - ( (2*1400*Strain_0 + 56933*(Strain_0+Strain_4+Strain_8))*(2*1400*Strain_8 + 56933*(Strain_0+Strain_4+Strain_8)) ) - ( (2*1400*Strain_4 + 56933*(Strain_0+Strain_4+Strain_8))*(2*1400*Strain_8 + 56933*(Strain_0+Strain_4+Strain_8)) ) + 3 * ((2*1400*Strain_3)^2 + (2*1400*Strain_6)^2 + (2*1400*Strain_7)^2) )') # DEPRECATED.
-    vMstressFunction_string = 'sqrt( (2*' + matParamMVtissue_Mu_string + '*Strain_0 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8))^2 + (2*' + matParamMVtissue_Mu_string + '*Strain_4 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8))^2 + (2*' + matParamMVtissue_Mu_string + '*Strain_8 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8))^2 - ( (2*' + matParamMVtissue_Mu_string + '*Strain_0 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8))*(2*' + matParamMVtissue_Mu_string + '*Strain_4 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8)) ) - ( (2*' + matParamMVtissue_Mu_string + '*Strain_0 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8))*(2*' + matParamMVtissue_Mu_string + '*Strain_8 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8)) ) - ( (2*' + matParamMVtissue_Mu_string + '*Strain_4 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8))*(2*' + matParamMVtissue_Mu_string + '*Strain_8 + ' + matParamMVtissue_Lambda_string + '*(Strain_0+Strain_4+Strain_8)) ) + 3 * ((2*' + matParamMVtissue_Mu_string + '*Strain_3)^2 + (2*' + matParamMVtissue_Mu_string + '*Strain_6)^2 + (2*' + matParamMVtissue_Mu_string + '*Strain_7)^2) )'
-    calc.SetFunction(vMstressFunction_string)
-    
-    #calc.SetResultArrayName('vonMisesStress_forMV_mu1400_lambda56933') # DEPRECATED.
-    vMstressArrayName_string = 'vonMisesStress_forMV_lambda' + matParamMVtissue_Lambda_string + '_mu' + matParamMVtissue_Mu_string
-    calc.SetResultArrayName(vMstressArrayName_string)
-    
-    calc.Update()
-    
-    grid = calc.GetOutput()
-    
-    
-    # Write output to vtu
-    writer = vtk.vtkXMLUnstructuredGridWriter()
-    writer.SetDataModeToAscii()
-    writer.SetFileName(outputfilename)
-    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
-      writer.SetInputData(grid)
-    else:
-      writer.SetInput(grid)
-    writer.Write()
-    
-    # ----------------------------------------------------------------------
-
-print('All files successfully processed.')
-print('Pvtu2vtuConverter successfully finished.')
+if __name__ == '__main__':
+    output_encoding = sys.argv[4] if len(sys.argv) > 4 else 'binary'
+    timesteps = sys.argv[5] if len(sys.argv) > 5 else 'all'
+    try:
+        pvtu2vtu_converter(sys.argv[1], sys.argv[2], sys.argv[3], output_encoding, timesteps)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
 
 # ----------------------------------------------------------------------
@@ -0,0 +1,259 @@
+#######################################################################
+# Python script providing a persistent tabular Q-function over the (discretized) parameter states,
+# which is learned from the Q-value steps (see RL_QvalueComputeScriptNEW.py) and shared across
+# calibration runs, for running the calibration with learned action values:
+#
+# The states are the cells of the grid of the parameter sets (lambda, mu) with the spacings of the
+# manipulation (epsilon) values, i.e., every action moves to the neighbouring cell (or stays, action 0).
+# The reward of an action is the improvement of the RMSE-value w.r.t. the current state (action 0 ends
+# the episode with reward 0), and the action values are updated by Q-learning, i.e.,
+#   Q(s,a) <- Q(s,a) + QTABLE_LEARNING_RATE * (reward + QTABLE_DISCOUNT * max_a' Q(s',a') - Q(s,a)),
+# for all (simulated) TestActions of a Q-value step at once.
+#
+# A step from a state follows the learned greedy action without any simulations, unless it explores,
+# i.e., runs the Q-value step with all TestActions (and updates the table). A step explores with
+# probability QTABLE_EXPLORATION_START * QTABLE_EXPLORATION_DECAY^(visits of the state) (but at least
+# QTABLE_MIN_EXPLORATION), and always, if the greedy action is 0 or does not improve (i.e., the end of the
+# calibration is always confirmed by simulations), or if the state was already visited in this calibration.
+#
+# The table is stored in RL_qtable.json (cell spacings, and the action values and visits of every state)
+# after every exploring step, such that it is shared by all later calibrations (e.g. of similar specimens).
+# The file holds one table per real data (sha1-checksum) and gravity of the xml inputfile, since the action values
+# of a cell only hold for the RMSE-values w.r.t. the same real data and gravity (tables of former versions of the file,
+# without these keys, are kept, but not used). Concurrent calibrations share the file: every update of a table is
+# applied to the table as currently stored (load, update and write under an exclusive lock of RL_qtable.json.lock),
+# such that no update of another calibration is lost, and every step starts from the table as currently stored.
+#
+# The script needs the following input:
+#   .. the current state's xml inputfile (i.e., the first guess of the parameter values),
+#   .. optionally, the number of parallel processes for the TestActions,
+#   .. optionally, the table file (default: RL_qtable.json), and the seed of the exploration (default: 0).
+#
+# The output is the following:
+#   .. the calibrated xml inputfile,
+#   .. the updated table file,
+#   .. all (explored and followed) steps as one run in the run history store (see RL_RunHistoryStore.py).
+#
+# To run the script, call:
+#   python RL_QTableStore.py <xml-inputfile> [<num-parallel-processes>] [<qtable-file>] [<seed>]
+#
+# Example:
+#   python RL_QTableStore.py elastScen_Beam_RLalgo_TestInput_SIMDATA.xml 4 RL_qtable.json
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-18}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-18"
+
+import sys
+import os
+import json
+import fcntl
+
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_QvalueComputeScriptNEW
+import RL_ReferenceDataStore
+import RL_RunTracer
+import RL_RunHistoryStore
+import RL_StepSizeController
+
+
+QTABLE_FILENAME = 'RL_qtable.json'
+QTABLE_NUM_ACTIONS = 5
+QTABLE_MAX_STEPS = 100
+
+# Q-learning:
+QTABLE_LEARNING_RATE = 0.5
+QTABLE_DISCOUNT = 0.9
+
+# Exploration schedule (per visit of the state):
+QTABLE_EXPLORATION_START = 1.0
+QTABLE_EXPLORATION_DECAY = 0.5
+QTABLE_MIN_EXPLORATION = 0.05
+
+
+# Key of the table of former versions of the table file (unknown real data and gravity):
+QTABLE_LEGACY_KEY = ''
+
+
+def qtable_key(xmlinputfile):
+
+    # Get the key of the table of the xml-inputfile, i.e., the sha1-checksum of the real data and the gravity:
+    path_and_realdata = RL_QvalueComputeScriptNEW.TESTSIMRESULTS_DIR + RL_QvalueComputeScriptNEW.REALDATA_FILENAME
+    gravity = [float(param.text) for param in ET.parse(xmlinputfile).getroot().iter('gravity')]
+    return '%s,%s' % (RL_ReferenceDataStore.reference_checksum(path_and_realdata), repr(gravity[0]) if len(gravity) > 0 else '')
+
+
+def qtables_loader(filename=QTABLE_FILENAME):
+
+    # Load all tables of the table file (dict key: table; tables of former versions of the file get the QTABLE_LEGACY_KEY):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        qtables = json.load(f)
+    if 'states' in qtables:
+        return {QTABLE_LEGACY_KEY: qtables}
+    return qtables['tables']
+
+
+def qtable_loader(filename=QTABLE_FILENAME, key=QTABLE_LEGACY_KEY):
+
+    # Load the table of the key (a new, empty one with the cell spacings of the default epsilon values, if there is none yet):
+    qtables = qtables_loader(filename)
+    if key not in qtables:
+        return {'cell_lam': RL_QvalueComputeScriptNEW.EPSILON_LAM, 'cell_mu': RL_QvalueComputeScriptNEW.EPSILON_MU, 'episodes': 0, 'states': {}}
+    return qtables[key]
+
+
+def qtables_writer(qtables, filename=QTABLE_FILENAME):
+
+    # Store the tables (via a temporary file, such that the table file is never incomplete):
+    with open(filename + '.tmp', 'w') as f:
+        json.dump({'tables': qtables}, f, indent=1, sort_keys=True)
+    os.rename(filename + '.tmp', filename)
+
+
+def qtable_update_writer(update, filename=QTABLE_FILENAME, key=QTABLE_LEGACY_KEY):
+
+    # Apply the update (function of the table) to the table of the key as currently stored, and store it;
+    # (exclusive lock: the load, update and write of several processes sharing the table file are serialized)
+    # Returns the updated table.
+    with open(filename + '.lock', 'a') as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        try:
+            qtables = qtables_loader(filename)
+            qtables[key] = qtable_loader(filename, key)
+            update(qtables[key])
+            qtables_writer(qtables, filename)
+        finally:
+            fcntl.flock(lockfile, fcntl.LOCK_UN)
+    return qtables[key]
+
+
+def qtable_state(qtable, param_lambda, param_mu):
+
+    # Get the entry (action values and visits) of the state (cell) of the parameter set (a new one, if not yet visited):
+    key = '%d,%d' % (int(round(param_lambda / qtable['cell_lam'])), int(round(param_mu / qtable['cell_mu'])))
+    if key not in qtable['states']:
+        qtable['states'][key] = {'q': [0.0] * QTABLE_NUM_ACTIONS, 'visits': 0}
+    return qtable['states'][key]
+
+
+def qtable_updater(qtable, candidate_params, rmse_values, learning_rate=QTABLE_LEARNING_RATE, discount=QTABLE_DISCOUNT):
+
+    # Q-learning update of the action values of the state of candidate_params[0] from the RMSE-values of the TestActions
+    # (dicts action_number: (lambda, mu) and action_number: RMSE-value; TestActions without RMSE-value are not updated):
+    if 0 not in rmse_values:
+        return
+    state = qtable_state(qtable, candidate_params[0][0], candidate_params[0][1])
+    for action_number in rmse_values:
+        if action_number == 0:
+            target = 0.0 # (end of the episode)
+        else:
+            reward = rmse_values[0] - rmse_values[action_number]
+            target = reward + discount * max(qtable_state(qtable, candidate_params[action_number][0], candidate_params[action_number][1])['q'])
+        state['q'][action_number] += learning_rate * (target - state['q'][action_number])
+    state['visits'] += 1
+
+
+def qtable_episode_counter(qtable):
+
+    # Count the finished calibration (episode) in the table:
+    qtable['episodes'] += 1
+
+
+def exploration_rate(visits):
+
+    # Probability of exploring a state with the given number of visits:
+    return max(QTABLE_EXPLORATION_START * QTABLE_EXPLORATION_DECAY ** visits, QTABLE_MIN_EXPLORATION)
+
+
+def qtable_action_chooser(qtable, param_lambda, param_mu, rng):
+
+    # Choose the learned greedy action of the state of the parameter set, or None if the step explores (see above):
+    state = qtable_state(qtable, param_lambda, param_mu)
+    if rng.uniform() < exploration_rate(state['visits']):
+        return None
+    action_number = int(np.argmax(state['q']))
+    if action_number == 0 or state['q'][action_number] <= 0.0:
+        return None
+    return action_number
+
+
+def qtable_step_runner(xmlinputfile, stepnum, qtable, rng, numworkers=1, run_id=None, visited=None,
+                       epsilon_lam=RL_QvalueComputeScriptNEW.EPSILON_LAM, epsilon_mu=RL_QvalueComputeScriptNEW.EPSILON_MU, qtablefile=None, key=QTABLE_LEGACY_KEY):
+
+    # Run one step from the state of the xml-inputfile: follow the learned greedy action (without simulations),
+    # or explore, i.e., run the Q-value step and update the table (and, if qtablefile is given, the table of the key in the file).
+    # Returns the action_number and whether the step explored.
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_current_run()
+    param_lambda, param_mu = RL_StepSizeController.parameters_reader(xmlinputfile)
+    candidate_params = {0: (param_lambda, param_mu), 1: (param_lambda + epsilon_lam, param_mu), 2: (param_lambda - epsilon_lam, param_mu),
+                        3: (param_lambda, param_mu + epsilon_mu), 4: (param_lambda, param_mu - epsilon_mu)}
+
+    action_number = qtable_action_chooser(qtable, param_lambda, param_mu, rng)
+    if visited is not None:
+        if (param_lambda, param_mu) in visited:
+            action_number = None
+        visited.add((param_lambda, param_mu))
+    if action_number is not None and min(candidate_params[action_number]) >= 0.0:
+        RL_StepSizeController.parameters_writer(xmlinputfile, candidate_params[action_number][0], candidate_params[action_number][1])
+        RL_RunHistoryStore.history_step_recorder(run_id, stepnum, action_number, candidate_params[action_number][0], candidate_params[action_number][1])
+        print colored('Step %s follows the learned ActionNumber %s (Q-value %s) without simulations.\n' % (stepnum, action_number, qtable_state(qtable, param_lambda, param_mu)['q'][action_number]), 'green')
+        return action_number, False
+
+    action_number = RL_QvalueComputeScriptNEW.qvalue_computer(xmlinputfile, str(stepnum), numworkers, run_id=run_id, epsilon_lam=epsilon_lam, epsilon_mu=epsilon_mu)
+    candidates = RL_RunHistoryStore.history_candidates_loader(run_id, stepnum)
+    rmse_values = dict((int(c['action']), float(c['rmse'])) for c in candidates if c['fidelity'] == 0 and not c['penalized'] and c['rmse'] == c['rmse'])
+    qtable_updater(qtable, candidate_params, rmse_values)
+    if qtablefile is not None:
+        qtable_update_writer(lambda stored_qtable: qtable_updater(stored_qtable, candidate_params, rmse_values), qtablefile, key)
+    return action_number, True
+
+
+def qtable_calibrator_runner(xmlinputfile, numworkers=1, qtablefile=QTABLE_FILENAME, run_id=None, seed=0, maxsteps=QTABLE_MAX_STEPS):
+
+    # Run the steps (see above) until action 0 is chosen by an exploring step, and store the table after every exploring step.
+    # Returns the number of steps and the number of exploring steps.
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_run_starter('RL_QTableStore', xmlinputfile)
+    key = qtable_key(xmlinputfile)
+    rng = np.random.RandomState(seed)
+    visited = set()
+    step = 0
+    explored_steps = 0
+    action_number = -1
+    while action_number != 0 and step < maxsteps:
+        step += 1
+        qtable = qtable_loader(qtablefile, key) # (incl. the updates of concurrent calibrations)
+        with RL_RunTracer.trace_context(step=str(step)), RL_RunTracer.trace_span('qtable_step'):
+            action_number, explored = qtable_step_runner(xmlinputfile, step, qtable, rng, numworkers, run_id, visited,
+                                                         qtable['cell_lam'], qtable['cell_mu'], qtablefile, key)
+        explored_steps += int(explored)
+    qtable_update_writer(qtable_episode_counter, qtablefile, key)
+    return step, explored_steps
+
+
+def main(xmlinputfile, numworkers=1, qtablefile=QTABLE_FILENAME, seed=0):
+
+    run_id = RL_RunHistoryStore.history_run_starter('RL_QTableStore', xmlinputfile)
+    steps, explored_steps = qtable_calibrator_runner(xmlinputfile, int(numworkers), qtablefile, run_id, int(seed))
+    print('Finished after %s steps (%s with simulations, %s following learned values).' % (steps, explored_steps, steps - explored_steps))
+    RL_RunHistoryStore.history_summary(run_id)
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('QTableStore STARTED. \n', 'yellow')
+    main(*sys.argv[1:])
+    print('\n')
+    print colored('QTableStore FINISHED. \n', 'yellow')
@@ -15,7 +15,43 @@
 #   .. the following scenario's xml-file with the newly specified/manipulated parameters.
 # 
 # To run the script, call:
-#   python RL_QvalueComputeScript.py <previous-xml-inputfile> <step-number>
+#   python RL_QvalueComputeScript.py <previous-xml-inputfile> <step-number> [<num-parallel-processes>]
+# 
+# If <num-parallel-processes> is larger than 1, the TestActions are simulated concurrently 
+# on a bounded process pool, each of them in its own scratch directory 
+# 'RL_TestSimResults_TestActionN/' (with its own output prefix).
+# 
+# The simulations are run with wall-clock and memory limits (see RL_SimulationRunnerScript.py); 
+# TestActions whose simulation fails or exceeds these limits are penalized like non-permitted ones.
+# 
+# The deformed coords of the TestActions are extracted in-process from the simulation results; 
+# the '_outVis.vtu' files (incl. strain and von Mises stress) are only written on request (write_outvis).
+# 
+# All evaluated TestActions (parameters, RMSE-value, cache hit, penalization, resource usage) and the 
+# chosen action with the produced parameter set are appended to the run history store 
+# (RL_run_history.sqlite, see RL_RunHistoryStore.py), which replaces RL_rmse_value_list.txt and RL_state_list.txt.
+# 
+# Optionally (screening, see RL_ScreeningConfig.json), the TestActions are first screened by cheap low-fidelity 
+# simulations (e.g. truncated time integration, looser solver tolerance), and only the best ones are simulated 
+# with full fidelity; screened-out TestActions get the Q-value SCREENED_OUT_QVALUE, and are recorded in the run 
+# history store with their low-fidelity RMSE-value and fidelity level (fidelity > 0).
+# 
+# Optionally (surrogate), TestActions which confidently lose according to the surrogate model of all past 
+# simulations of the same real data and simulation configuration (see RL_SurrogateModel.py) are skipped, 
+# and recorded with their predicted RMSE-value (fidelity -1).
+# 
+# The current state (action 0) is never screened out or skipped, and only TestActions with a full-fidelity 
+# RMSE-value (simulated or cached) are chosen, i.e., if none of the other TestActions has been simulated 
+# successfully with full fidelity, the current state is kept.
+# 
+# The simulations run at the refinement level (InitialRefLevel) of the xml inputfile; results of refinement 
+# levels other than the one of the real data are remapped onto the nodes of the real data by nearest 
+# neighbours (see RL_CoarseToFineSchedule.py for calibrating across refinement levels).
+# 
+# Concurrent calibrations in threads of one process (see RL_MultiStartCalibrator.py) share one process pool 
+# for the simulations (pool), and claim the cache keys they simulate (the TestActions as well as the single 
+# parameter sets of candidate_evaluator), such that each parameter set is simulated only once 
+# (see RL_SimResultsCache.simresults_cache_claimer).
 # 
 # Example:
 #   python ActionSelectorAndSimSetupper.py elastScen_Beam_RLalgo_TestInput_SIMDATA.xml numX
@@ -30,25 +66,326 @@ __date__ = "2017-08-04"
 
 import sys
 import os
+import time
+import json
 
-import subprocess
-from subprocess import PIPE  # NOTE: probably not needed anymore.
+import multiprocessing
 
 from termcolor import colored # for colored terminal output for better overview.
 
 import xml.etree.ElementTree as ET
 
+import numpy as np
+
 import RL_RMSEvalueComputeScript
+import RL_SimulationRunnerScript
+import RL_Pvtu2vtuConverterAndVMStressCalculator
+import RL_ReferenceDataStore
+import RL_DeformedCoordsExtractor
+import RL_SimResultsCache
+import RL_RunTracer
+import RL_RunHistoryStore
+import RL_SurrogateModel
 
 print('============================')
 print('QvalueComputeScript started. \n')
 
 
-def qvalue_computer(arg1, arg2):
+# Directory containing the real data and (in sequential mode) the TestAction simulation results,
+# and the timestep-specific names of the real data and the simulated data (as pvtu2vtu-converted vtu 
+# and as pvtu written by HiFlow3; the deformed coords are extracted from the latter directly):
+TESTSIMRESULTS_DIR = 'RL_TestSimResults/'
+# (only the target timestep is used, all other timesteps are not needed for the comparison)
+TARGET_TIMESTEP = 10
+REALDATA_FILENAME_TEMPLATE = 'Beam_REALDATA_solution_np1_RefLvl0_Tstep.%04d_outVis.vtu'
+SIMDATA_PVTU_SUFFIX_TEMPLATE = '_solution_np1_RefLvl%d_Tstep.%04d.pvtu' # (refinement level, timestep)
+REALDATA_FILENAME = REALDATA_FILENAME_TEMPLATE % TARGET_TIMESTEP
+SIMDATA_SUFFIX_TEMPLATE = '_solution_np1_RefLvl0_Tstep.%04d_outVis.vtu' # (timestep)
+SIMDATA_SUFFIX = SIMDATA_SUFFIX_TEMPLATE % TARGET_TIMESTEP
+SIMDATA_PVTU_SUFFIX = SIMDATA_PVTU_SUFFIX_TEMPLATE % (0, TARGET_TIMESTEP)
+
+# Refinement level (InitialRefLevel) of the real data; simulation results of other refinement levels 
+# are remapped onto the nodes of the real data (see RL_ReferenceDataStore.reference_remap_index):
+REALDATA_REFINEMENT_LEVEL = 0
+
+# Default manipulation (epsilon) values of the actions:
+EPSILON_LAM = 5000.0
+EPSILON_MU = 3000.0
+
+# Action number of the single parameter sets evaluated by candidate_evaluator (e.g. the points of a line search):
+LINE_SEARCH_ACTION = -1
+
+# Encoding of the pvtu2vtu-converted simulated data ('binary', 'zlib', 'lz4' or 'ascii'):
+OUTPUT_ENCODING = 'binary'
+
+# Configuration of the multi-fidelity screening (see screening_config_loader), and the Q-value of TestActions, 
+# which are screened out (i.e., not simulated with full fidelity; below the penalty of non-permitted TestActions,
+# but never chosen, see qvalue_computer):
+SCREENING_CONFIG_FILENAME = 'RL_ScreeningConfig.json'
+SCREENED_OUT_QVALUE = 5000.0
+
+
+def refinement_level_reader(xmlinputfile):
+    
+    # Get the refinement level (InitialRefLevel) of the mesh of the xml-inputfile (0 if not given):
+    for param_ref in ET.parse(xmlinputfile).getroot().iter('InitialRefLevel'):
+        return int(param_ref.text)
+    return 0
+
+
+def testaction_setupper(infilenamestring, action_number, epsilon_lam, epsilon_mu, workspace=None):
+    
+    # Set up the TestAction-xml-inputfile for the given action_number, i.e., manipulate the parameters 
+    # of the current state's xml-inputfile accordingly, and write it to '<infile>_TestActionN.xml'.
+    # If a workspace (directory) is given, the simulation output is redirected into this workspace.
+    # Returns the outfilenamestring and the output path-and-prefix of the simulation, 
+    # or (None, None) if the action leads to non-permitted (negative) parameter values.
+    with RL_RunTracer.trace_span('xml_setup', action=action_number) as span:
+        tree = ET.parse(infilenamestring)
+        root = tree.getroot()
+    
+        # For LAMBDA: if action_number == 1 or action_number == 2:
+        for param_lam in root.iter('lambda'):
+            prev_param_lam = float(param_lam.text)
+            if action_number == 1:
+                param_lam.text = str(prev_param_lam + epsilon_lam)
+            if action_number == 2:
+                new_lam = prev_param_lam - epsilon_lam
+                if new_lam < 0.0:
+                    # negative lambda-values are not permitted.
+                    return None, None
+                param_lam.text = str(new_lam)
+    
+        # For MU: if action_number == 3 or action_number == 4:
+        for param_mu in root.iter('mu'):
+            prev_param_mu = float(param_mu.text)
+            if action_number == 3:
+                param_mu.text = str(prev_param_mu + epsilon_mu)
+            if action_number == 4:
+                new_mu = prev_param_mu - epsilon_mu
+                if new_mu < 0.0:
+                    # negative mu-values are not permitted.
+                    return None, None
+                param_mu.text = str(new_mu)
+    
+        # Redirect the simulation output into the workspace (if any):
+        outputprefix = ''
+        for param_out in root.iter('OutputPathAndPrefix'):
+            if workspace is not None:
+                try:
+                    os.makedirs(workspace)
+                except:
+                    pass
+                param_out.text = workspace + os.path.basename(param_out.text)
+            outputprefix = param_out.text
+    
+        outfilenamestring = infilenamestring[:-4] + '_TestAction' + str(action_number) + '.xml'
+        print("The outfilenamestring for Action %s is: %s.\n" % (action_number, outfilenamestring))
+        tree.write(outfilenamestring)
+        span.bytes_written = RL_RunTracer.files_size([outfilenamestring])
+    
+    return outfilenamestring, outputprefix
+
+
+def testaction_simulator_worker(testaction_job):
+    
+    # Simulate one TestAction and extract the deformed coords of its results at the given (target) timestep
+    # (may run in a worker process of the process pool). Returns (action_number, defcoords, usage),
+    # where defcoords is None if the simulation failed or exceeded its wall-clock or memory limit.
+    action_number, outfilenamestring, outputprefix, write_outvis, stepnum, timestep = testaction_job
+    
+    with RL_RunTracer.trace_context(step=stepnum, action=action_number):
+    
+        # 1.) Run Simulation-App with np=1 and with newly-defined TestAction-XML-Inputfile:
+        exit_status, usage = RL_SimulationRunnerScript.simulation_runner(1, outfilenamestring, RL_SimulationRunnerScript.SIMULATION_TIMEOUT, RL_SimulationRunnerScript.SIMULATION_MAX_MEMORY, return_usage=True)
+        print('\n')
+        if exit_status != 0:
+            print colored('SimulationRunner FAILED for ActionNumber %s (exit status %s).' % (action_number, exit_status), 'red')
+            print colored('======================================= \n', 'red')
+            return action_number, None, usage
+        print colored('SimulationRunner successfully finished for ActionNumber %s.' % action_number, 'green')
+        print colored('======================================= \n', 'green')
+    
+        # 2.) Extract the deformed coords directly from the obtained TestAction simulation results (pvtu),
+        # i.e., "nodes_numpy_array_simdata" = coords + (u0,u1,u2):
+        # (results of another refinement level than the real data are remapped onto the nodes of the real data)
+        refinement_level = refinement_level_reader(outfilenamestring)
+        path_and_pvtu = outputprefix + SIMDATA_PVTU_SUFFIX_TEMPLATE % (refinement_level, timestep)
+        if refinement_level != REALDATA_REFINEMENT_LEVEL:
+            defcoords, simpoints = RL_DeformedCoordsExtractor.defcoords_extractor(path_and_pvtu, return_points=True)
+            defcoords = defcoords[RL_ReferenceDataStore.reference_remap_index(TESTSIMRESULTS_DIR + REALDATA_FILENAME_TEMPLATE % timestep, simpoints, refinement_level)]
+        else:
+            defcoords = RL_DeformedCoordsExtractor.defcoords_extractor(path_and_pvtu)
+    
+        # Optionally (not needed for the RMSE-value): run Pvtu2vtu-Converter with obtained TestAction simulation results, 
+        # in order to additionally obtain the strain tensor and von Mises stress in an '_outVis.vtu' file:
+        if write_outvis:
+            RL_Pvtu2vtuConverterAndVMStressCalculator.pvtu2vtu_converter(os.path.join(os.path.dirname(outputprefix), ''), 140000, 50000, OUTPUT_ENCODING, timestep)
+            # note the lambda and mu parameters are not relevant/effective here, but needed for the function call.
+            print('\n')
+            print colored('Pvtu2vtuConverter successfully finished for ActionNumber %s.' % action_number, 'green')
+            print colored('======================================== \n', 'green')
+    
+    return action_number, defcoords, usage
+
+
+def testaction_simulations_runner(simulator_jobs, numworkers, stepnum, pool=None):
+    
+    # Run testaction_simulator_worker for all jobs, on a bounded process pool (if numworkers > 1, or on the given 
+    # shared pool), and report their resource usage. Returns the list of (action_number, defcoords, usage).
+    if pool is not None:
+        simulator_results = pool.map(testaction_simulator_worker, simulator_jobs) if len(simulator_jobs) > 0 else []
+    elif numworkers > 1 and len(simulator_jobs) > 1:
+        print colored("Running the simulations of %s TestActions in Step %s on %s parallel processes.\n" % (len(simulator_jobs), stepnum, min(numworkers, len(simulator_jobs))), 'yellow')
+        pool = multiprocessing.Pool(processes=min(numworkers, len(simulator_jobs)))
+        try:
+            simulator_results = pool.map(testaction_simulator_worker, simulator_jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        simulator_results = [testaction_simulator_worker(simulator_job) for simulator_job in simulator_jobs]
+    
+    # Report the resource usage of the simulations (e.g. for sizing the process pool):
+    usages = [usage for action_number, defcoords, usage in simulator_results if usage is not None]
+    if len(usages) > 0:
+        print colored("Resource usage of the %s simulations in Step %s: max. wall time %.1f s, total CPU time %.1f s, max. RSS %.1f MB.\n" % (len(usages), stepnum, max(usage['wall_time'] for usage in usages), sum(usage['user_time'] + usage['sys_time'] for usage in usages), max(usage['max_rss'] for usage in usages) / 1048576.0), 'yellow')
+    
+    return simulator_results
+
+
+def screening_config_loader(filename=SCREENING_CONFIG_FILENAME):
+    
+    # Load the configuration of the multi-fidelity screening (JSON), i.e., the list of the screening (low-fidelity) 
+    # levels in the order of increasing fidelity, each with:
+    #   .. overrides: xml tags and their values (e.g. fewer time steps, looser CG tolerance),
+    #   .. target_timestep: timestep, at which the simulated data is compared to the real data,
+    #   .. keep: number of TestActions (with the smallest RMSE-values) promoted to the next level.
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def screening_testaction_setupper(outfilenamestring, outputprefix, level_number, level):
+    
+    # Set up the low-fidelity variant '<TestAction-xml>_ScreeningN.xml' of the TestAction-xml-inputfile 
+    # for the given screening level (with the output prefix '<outputprefix>_ScreeningN').
+    # Returns the xml-inputfile name and the output prefix.
+    tree = ET.parse(outfilenamestring)
+    root = tree.getroot()
+    for tag, value in level['overrides'].items():
+        for elem in root.iter(str(tag)):
+            elem.text = str(value)
+    screeningprefix = outputprefix + '_Screening' + str(level_number)
+    for param_out in root.iter('OutputPathAndPrefix'):
+        param_out.text = screeningprefix
+    screeningfilename = outfilenamestring[:-4] + '_Screening' + str(level_number) + '.xml'
+    tree.write(screeningfilename)
+    return screeningfilename, screeningprefix
+
+
+def cached_outcome_loader(cachekey, cachedir, path_and_realdata, realdata_checksum):
+    
+    # Look up the simulation outcome of the cache key in the SimResultsCache, or claim the key for its simulation by the current thread 
+    # (if it is claimed by a concurrent calibration in another thread, wait for its simulation and look it up again; 
+    # the claims are released by RL_SimResultsCache.simresults_cache_releaser). 
+    # Returns (defcoords, rmse_value), or None if the key is to be simulated by the current thread; if the cached outcome was 
+    # compared to other (or since replaced) real data, the RMSE-value is recomputed from the cached deformed coords.
+    cached = RL_SimResultsCache.simresults_cache_lookup(cachekey, cachedir)
+    while cached is None and not RL_SimResultsCache.simresults_cache_claimer(cachekey):
+        # (simulated by a concurrent calibration in the meantime)
+        cached = RL_SimResultsCache.simresults_cache_lookup(cachekey, cachedir)
+    if cached is None:
+        return None
+    
+    defcoords, rmse_value_out, realdata, realdata_sha1 = cached
+    if realdata_sha1 != realdata_checksum:
+        realcoords = RL_ReferenceDataStore.reference_coords_loader(path_and_realdata)
+        rmse_value_out = RL_RMSEvalueComputeScript.rmsevalue_from_coords(realcoords, defcoords)
+        RL_SimResultsCache.simresults_cache_store(cachekey, defcoords, rmse_value_out, path_and_realdata, cachedir, realdata_sha1=realdata_checksum)
+    return defcoords, rmse_value_out
+
+
+def candidate_evaluator(infilenamestring, param_lambda, param_mu, stepnum, cachedir=RL_SimResultsCache.CACHE_DIR, run_id=None, action_number=LINE_SEARCH_ACTION, return_defcoords=False):
+    
+    # Evaluate a single parameter set (lambda, mu) of the xml-inputfile (written to '<infile>_LineSearch.xml'), i.e., 
+    # look up or simulate it and compute its RMSE-value, and record it as candidate in the run history store.
+    # Returns the RMSE-value, or None if the parameter set is not permitted or its simulation failed
+    # (and, if return_defcoords, the deformed coords of its simulation results as well, or None).
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_current_run()
+    path_and_realdata = TESTSIMRESULTS_DIR + REALDATA_FILENAME
+    candidate = {'run_id': run_id, 'step': int(stepnum), 'action': action_number, 'lambda': param_lambda, 'mu': param_mu, 
+                 'realdata_sha1': RL_ReferenceDataStore.reference_checksum(path_and_realdata), 'config': RL_SimResultsCache.simresults_config_key(infilenamestring, SIMDATA_SUFFIX)}
+    if param_lambda < 0.0 or param_mu < 0.0:
+        # negative lambda- or mu-values are not permitted.
+        candidate['penalized'] = True
+        RL_RunHistoryStore.history_candidates_recorder([candidate])
+        return (None, None) if return_defcoords else None
+    
+    tree = ET.parse(infilenamestring)
+    root = tree.getroot()
+    for para_lam in root.iter('lambda'):
+        para_lam.text = str(param_lambda)
+    for para_mu in root.iter('mu'):
+        para_mu.text = str(param_mu)
+    outputprefix = [param_out.text for param_out in root.iter('OutputPathAndPrefix')][0]
+    outfilenamestring = infilenamestring[:-4] + '_LineSearch.xml'
+    tree.write(outfilenamestring)
+    
+    # (the cache key claimed for the simulation is released in any case, see qvalue_computer)
+    try:
+        cached = None
+        if cachedir is not None:
+            cachekey = RL_SimResultsCache.simresults_cache_key(outfilenamestring, SIMDATA_SUFFIX)
+            cached = cached_outcome_loader(cachekey, cachedir, path_and_realdata, candidate['realdata_sha1'])
+        
+        if cached is not None:
+            defcoords, rmse_value_out = cached
+            candidate['cache_hit'] = True
+        else:
+            action_number, defcoords, usage = testaction_simulator_worker((action_number, outfilenamestring, outputprefix, False, stepnum, TARGET_TIMESTEP))
+            candidate.update(RL_RunHistoryStore.usage_columns(usage))
+            if defcoords is None:
+                print colored("The simulation of the parameter set (lambda = %s, mu = %s) in Step %s failed.\n" % (param_lambda, param_mu, stepnum), 'red')
+                candidate['penalized'] = True
+                RL_RunHistoryStore.history_candidates_recorder([candidate])
+                return (None, None) if return_defcoords else None
+            realcoords = RL_ReferenceDataStore.reference_coords_loader(path_and_realdata)
+            rmse_value_out = RL_RMSEvalueComputeScript.rmsevalue_from_coords(realcoords, defcoords)
+            if cachedir is not None:
+                RL_SimResultsCache.simresults_cache_store(cachekey, defcoords, rmse_value_out, path_and_realdata, cachedir, realdata_sha1=candidate['realdata_sha1'])
+    finally:
+        RL_SimResultsCache.simresults_cache_releaser()
+    
+    candidate['rmse'] = float(rmse_value_out)
+    RL_RunHistoryStore.history_candidates_recorder([candidate])
+    print colored("The RMSE value in Step %s for the parameter set (lambda = %s, mu = %s) is: %s." % (stepnum, param_lambda, param_mu, rmse_value_out), 'yellow')
+    if return_defcoords:
+        return float(rmse_value_out), defcoords
+    return float(rmse_value_out)
+
+
+def qvalue_computer(arg1, arg2, numworkers=1, cachedir=RL_SimResultsCache.CACHE_DIR, write_outvis=False, run_id=None, screening=None, epsilon_lam=EPSILON_LAM, epsilon_mu=EPSILON_MU, surrogate=False, pool=None, workspace_prefix=None, simulated_timestep=TARGET_TIMESTEP, fidelity=0):
     
     # Read in arguments (xml-file and step-number):
     infilenamestring = arg1 #sys.argv[1] # e.g. 'elastScen_Beam_RLalgo_TestInput.xml'.
     stepnum = arg2 #sys.argv[2] # just counting the steps until sufficient approximation is achieved.
+    numworkers = int(numworkers) # number of TestActions simulated concurrently (1: sequential mode).
+    # cachedir: directory of the SimResultsCache, which is consulted before any simulation launch (None: no caching).
+    # write_outvis: additionally write the '_outVis.vtu' files (incl. strain and von Mises stress) of all TestActions.
+    # run_id: run of the run history store, the step is recorded to (None: the current run of this process).
+    # screening: configuration of the multi-fidelity screening (see screening_config_loader; None: no screening).
+    # epsilon_lam, epsilon_mu: manipulation (epsilon) values of the actions (e.g. set by the coarse-to-fine schedule).
+    # surrogate: skip the TestActions, which confidently lose according to the surrogate model (see RL_SurrogateModel.py).
+    # pool: process pool shared with concurrent calibrations in other threads (None: own pool, if numworkers > 1).
+    # workspace_prefix: prefix of the scratch directories of the TestActions (None: TESTSIMRESULTS_DIR).
+    # simulated_timestep: timestep of the simulation results, which is compared to the real data at TARGET_TIMESTEP
+    # (e.g. the last timestep of a cheaper time integration with a larger DeltaT, see RL_CoarseToFineSchedule.py).
+    # fidelity: fidelity of the simulations of this step, recorded with the simulated and cached TestActions 
+    # (0: full fidelity; e.g. RL_RunHistoryStore.coarse_level_fidelity for the coarse levels of a schedule).
+    if run_id is None:
+        run_id = RL_RunHistoryStore.history_current_run()
+    starttime = time.time()
     
     # Declare the parameters:
     parLambda = 0.0
@@ -56,382 +393,167 @@ def qvalue_computer(arg1, arg2):
     #parGrav = 0.0
     
     # Set manipulation (epsilon) values:
-    epsilon_lam = 5000.0
-    epsilon_mu = 3000.0
+    epsilon_lam = float(epsilon_lam)
+    epsilon_mu = float(epsilon_mu)
     #epsilon_grav = 0.5
     
     # Declare the Q-value-Vector (which gets updated for each learning step):
     qValueVec = [0.0, 0.0, 0.0, 0.0, 0.0] #, 0.0, 0.0]
     
-    # Loop over all actions [0,1,2,3,4,(5,6)] and compute the Q-value:
+    # Parameters of the current state, and the records of all TestActions (candidates) for the run history store:
+    tree = ET.parse(infilenamestring)
+    state_lambda = [float(param.text) for param in tree.getroot().iter('lambda')][0]
+    state_mu = [float(param.text) for param in tree.getroot().iter('mu')][0]
+    candidate_params = {0: (state_lambda, state_mu), 1: (state_lambda + epsilon_lam, state_mu), 2: (state_lambda - epsilon_lam, state_mu), 
+                        3: (state_lambda, state_mu + epsilon_mu), 4: (state_lambda, state_mu - epsilon_mu)}
+    # (the candidates are recorded with the keys of their RMSE-value surface, i.e., the sha1-checksum of the real data
+    # and the hash of the simulation configuration without lambda and mu, see RL_SurrogateModel.py)
+    path_and_realdata = TESTSIMRESULTS_DIR + REALDATA_FILENAME
+    realdata_checksum = RL_ReferenceDataStore.reference_checksum(path_and_realdata)
+    config_key = RL_SimResultsCache.simresults_config_key(infilenamestring, SIMDATA_SUFFIX_TEMPLATE % simulated_timestep)
+    candidates = dict((action_number, {'run_id': run_id, 'step': int(stepnum), 'action': action_number, 'lambda': candidate_params[action_number][0], 'mu': candidate_params[action_number][1], 
+                                       'realdata_sha1': realdata_checksum, 'config': config_key}) for action_number in range(0,5))
+    
+    # Set up the TestAction-xml-inputfiles for all actions [0,1,2,3,4,(5,6)]:
+    # (in parallel mode, every TestAction gets its own scratch directory and output prefix)
+    testaction_jobs = []
     for action_number in range(0,5):
         
         print colored("Going to update component %s (= action-number) of the Q-value-vector in Step %s.\n" % (action_number, stepnum), 'yellow')
         
-        # According to the above selected action-number, conduct an action in the tree below:
-        tree = ET.parse(infilenamestring)
-        root = tree.getroot()
-        
-        # ========================================================
-        # For CURRENT SIM SETUP: if action_number == 0, i.e., no parameter manipulation:
-        if action_number == 0:
-            
-            # Set up the respective TestAction-xml-inputfile for Action 0:
-            outfilenamestring = infilenamestring[:-4] + '_TestAction' + str(action_number) + '.xml'
-            print("The outfilenamestring for Action %s is: %s.\n" % (action_number, outfilenamestring))
-            tree.write(outfilenamestring)
-            
-            # Subprocess Function Calls:
-            process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True) # NOTE: probably not needed anymore.
-            
-            # 1.) Run Simulation-App with np=1 and with newly-defined TestAction-XML-Inputfile:
-            cmdForSimulationRunner = "python RL_SimulationRunnerScript.py 1 " + outfilenamestring
-            #print("CONTROL OUTPUT: The cmdForSimulationRunnerScript is: %s" % cmdForSimulationRunner)
-            process = subprocess.call(cmdForSimulationRunner, shell=True)
-            print('\n')
-            print colored('SimulationRunner successfully finished.', 'green')
-            print colored('======================================= \n', 'green')
-            
-            # 2.) Run Pvtu2vtu-Converter with obtained TestAction simulation results:
-            cmdForPvtu2vtuConverter = 'python RL_Pvtu2vtuConverterAndVMStressCalculator.py RL_TestSimResults/ 140000 50000' 
-            # note the lambda and mu parameters are not relevant/effective here, but needed for the function call.
-            process = subprocess.call(cmdForPvtu2vtuConverter, shell=True)
-            print('\n')
-            print colored('Pvtu2vtuConverter successfully finished.', 'green')
-            print colored('======================================== \n', 'green')
-            
-            # 3.) Run RMSE-value-Compute-Script, in order to compute the RMSE-value 
-            # for the respective TestAction-deformedCoords obtained from the Pvtu2vtu-Converter, ...
-            # Therefore, read the vtk-xml-tree of the deformedCoords and extract the coords list, i.e. "nodes_numpy_array_simdata", 
-            # in order to append it to a stored nodes_numpy_array_simdata-list.
-            # Then compare the 'simulation results' with the 'real data' and compute the RMSE value, 
-            # and return the RMSE-value (and additionally append/store the RMSE-value to a stored RMSE-values-list):
-            #cmdForRMSEvalueComputeScript = 'python RL_RMSEvalueComputeScriptOLD.py RL_TestSimResults/ Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu %s' % str(stepnum)
-            #process = subprocess.call(cmdForRMSEvalueComputeScript, shell=True)
-            #rmse_value_out = subprocess.check_output([sys.executable, cmdForRMSEvalueComputeScript])
-            rmse_value_out = RL_RMSEvalueComputeScript.rmsevalue_computer("RL_TestSimResults/", "Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", "TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", str(stepnum), str(action_number))
-            print('\n')
-            print colored("The RMSE value in Step %s for ActionNumber %s is: %s." % (stepnum, action_number, rmse_value_out), 'yellow') #... return value
-            print('\n')
-            print colored('RMSEvalueComputeScript successfully finished.', 'green')
-            print colored('============================================= \n', 'green')
-            
-            # Transfer RMSE-value into (the respective component = action_number of) the Q-value-Vector:
-            qValueVec[action_number] = rmse_value_out
-        
+        if numworkers > 1 or pool is not None:
+            workspace = (TESTSIMRESULTS_DIR[:-1] if workspace_prefix is None else workspace_prefix) + '_TestAction' + str(action_number) + '/'
+        else:
+            workspace = None
         
-        # ========================================================
-        # For LAMBDA: if action_number == 1 or action_number == 2:
-        if action_number == 1:
-            for param_lam in root.iter('lambda'):
-                prev_param_lam = float(param_lam.text)
-                new_lam = prev_param_lam + epsilon_lam
-                parLambda = new_lam
-                param_lam.text = str(new_lam)
-                
-                # Set up the respective TestAction-xml-inputfile for Action 1:
-                outfilenamestring = infilenamestring[:-4] + '_TestAction' + str(action_number) + '.xml'
-                print("The outfilenamestring for Action %s is: %s.\n" % (action_number, outfilenamestring))
-                tree.write(outfilenamestring)
-                
-    #            parameter_set = [parLambda, parMu] #, parGrav]
-    #            
-    #            # Return or Store the action number in a list, or/and 
-    #            # alternatively/additionally store the resulting parameter set:
-    #            filename = 'state_list.txt'
-    #            
-    #            if os.path.exists(filename):
-    #                append_write = 'a' # append if already exists
-    #            else:
-    #                append_write = 'w' # make a new file if not
-    #            
-    #            state_list_file = open(filename,append_write)
-    #            #state_list_file.write("ActionNumber in Step " + str(stepnum) + ": " + str(action_number) + '\n')
-    #            #state_list_file.write("ParameterSet in Step " + str(stepnum) + ": " + str(parameter_set) + '\n')
-    #            state_list_file.close()
-                
-                # Subprocess Function Calls:
-                process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True) # NOTE: probably not needed anymore.
-                
-                # 1.) Run Simulation-App with np=1 and with newly-defined TestAction-XML-Inputfile:
-                cmdForSimulationRunner = "python RL_SimulationRunnerScript.py 1 " + outfilenamestring
-                #print("CONTROL OUTPUT: The cmdForSimulationRunnerScript is: %s" % cmdForSimulationRunner)
-                process = subprocess.call(cmdForSimulationRunner, shell=True)
-                print('\n')
-                print colored('SimulationRunner successfully finished.', 'green')
-                print colored('======================================= \n', 'green')
-                
-                # 2.) Run Pvtu2vtu-Converter with obtained TestAction simulation results:
-                cmdForPvtu2vtuConverter = 'python RL_Pvtu2vtuConverterAndVMStressCalculator.py RL_TestSimResults/ 140000 50000' 
-                # note the lambda and mu parameters are not relevant/effective here, but needed for the function call.
-                process = subprocess.call(cmdForPvtu2vtuConverter, shell=True)
-                print('\n')
-                print colored('Pvtu2vtuConverter successfully finished.', 'green')
-                print colored('======================================== \n', 'green')
-                
-                # 3.) Run RMSE-value-Compute-Script, in order to compute the RMSE-value 
-                # for the respective TestAction-deformedCoords obtained from the Pvtu2vtu-Converter, ...
-                # Therefore, read the vtk-xml-tree of the deformedCoords and extract the coords list, i.e. "nodes_numpy_array_simdata", 
-                # in order to append it to a stored nodes_numpy_array_simdata-list.
-                # Then compare the 'simulation results' with the 'real data' and compute the RMSE value, 
-                # and return the RMSE-value (and additionally append/store the RMSE-value to a stored RMSE-values-list):
-                #cmdForRMSEvalueComputeScript = 'python RL_RMSEvalueComputeScriptOLD.py RL_TestSimResults/ Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu %s' % str(stepnum)
-                #process = subprocess.call(cmdForRMSEvalueComputeScript, shell=True)
-                #rmse_value_out = subprocess.check_output([sys.executable, cmdForRMSEvalueComputeScript])
-                rmse_value_out = RL_RMSEvalueComputeScript.rmsevalue_computer("RL_TestSimResults/", "Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", "TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", str(stepnum), str(action_number))
-                print('\n')
-                print colored("The RMSE value in Step %s for ActionNumber %s is: %s." % (stepnum, action_number, rmse_value_out), 'yellow') #... return value
-                print('\n')
-                print colored('RMSEvalueComputeScript successfully finished.', 'green')
-                print colored('============================================= \n', 'green')
-                
-                # Transfer RMSE-value into (the respective component = action_number of) the Q-value-Vector:
-                qValueVec[action_number] = rmse_value_out
+        outfilenamestring, outputprefix = testaction_setupper(infilenamestring, action_number, epsilon_lam, epsilon_mu, workspace)
         
+        if outfilenamestring is None:
+            # negative lambda- or mu-values are not permitted, hence penalize the Action and set a very bad Q-value:
+            qValueVec[action_number] = 10000.0
+            candidates[action_number]['penalized'] = True
+            continue
         
-        if action_number == 2:
-            for param_lam in root.iter('lambda'):
-                prev_param_lam = float(param_lam.text)
-                new_lam = prev_param_lam - epsilon_lam
-                
-                if new_lam >= 0.0:
-                    # positive lambda-values are permitted, proceed as above in Action 1:
-                    parLambda = new_lam
-                    param_lam.text = str(new_lam)
-                    
-                    # Set up the respective TestAction-xml-inputfile for Action 2:
-                    outfilenamestring = infilenamestring[:-4] + '_TestAction' + str(action_number) + '.xml'
-                    print("The outfilenamestring for Action %s is: %s.\n" % (action_number, outfilenamestring))
-                    tree.write(outfilenamestring)
-                    
-    #            parameter_set = [parLambda, parMu] #, parGrav]
-    #            
-    #            # Return or Store the action number in a list, or/and 
-    #            # alternatively/additionally store the resulting parameter set:
-    #            filename = 'state_list.txt'
-    #            
-    #            if os.path.exists(filename):
-    #                append_write = 'a' # append if already exists
-    #            else:
-    #                append_write = 'w' # make a new file if not
-    #            
-    #            state_list_file = open(filename,append_write)
-    #            #state_list_file.write("ActionNumber in Step " + str(stepnum) + ": " + str(action_number) + '\n')
-    #            #state_list_file.write("ParameterSet in Step " + str(stepnum) + ": " + str(parameter_set) + '\n')
-    #            state_list_file.close()
-                    
-                    # Subprocess Function Calls:
-                    process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True) # NOTE: probably not needed anymore.
-                    
-                    # 1.) Run Simulation-App with np=1 and with newly-defined TestAction-XML-Inputfile:
-                    cmdForSimulationRunner = "python RL_SimulationRunnerScript.py 1 " + outfilenamestring
-                    #print("CONTROL OUTPUT: The cmdForSimulationRunnerScript is: %s" % cmdForSimulationRunner)
-                    process = subprocess.call(cmdForSimulationRunner, shell=True)
-                    print('\n')
-                    print colored('SimulationRunner successfully finished.', 'green')
-                    print colored('======================================= \n', 'green')
-                    
-                    # 2.) Run Pvtu2vtu-Converter with obtained TestAction simulation results:
-                    cmdForPvtu2vtuConverter = 'python RL_Pvtu2vtuConverterAndVMStressCalculator.py RL_TestSimResults/ 140000 50000' 
-                    # note the lambda and mu parameters are not relevant/effective here, but needed for the function call.
-                    process = subprocess.call(cmdForPvtu2vtuConverter, shell=True)
-                    print('\n')
-                    print colored('Pvtu2vtuConverter successfully finished.', 'green')
-                    print colored('======================================== \n', 'green')
-                    
-                    # 3.) Run RMSE-value-Compute-Script, in order to compute the RMSE-value 
-                    # for the respective TestAction-deformedCoords obtained from the Pvtu2vtu-Converter, ...
-                    # Therefore, read the vtk-xml-tree of the deformedCoords and extract the coords list, i.e. "nodes_numpy_array_simdata", 
-                    # in order to append it to a stored nodes_numpy_array_simdata-list.
-                    # Then compare the 'simulation results' with the 'real data' and compute the RMSE value, 
-                    # and return the RMSE-value (and additionally append/store the RMSE-value to a stored RMSE-values-list):
-                    #cmdForRMSEvalueComputeScript = 'python RL_RMSEvalueComputeScriptOLD.py RL_TestSimResults/ Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu %s' % str(stepnum)
-                    #process = subprocess.call(cmdForRMSEvalueComputeScript, shell=True)
-                    #rmse_value_out = subprocess.check_output([sys.executable, cmdForRMSEvalueComputeScript])
-                    rmse_value_out = RL_RMSEvalueComputeScript.rmsevalue_computer("RL_TestSimResults/", "Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", "TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", str(stepnum), str(action_number))
-                    print('\n')
-                    print colored("The RMSE value in Step %s for ActionNumber %s is: %s." % (stepnum, action_number, rmse_value_out), 'yellow') #... return value
-                    print('\n')
-                    print colored('RMSEvalueComputeScript successfully finished.', 'green')
-                    print colored('============================================= \n', 'green')
-                    
-                    # Transfer RMSE-value into (the respective component = action_number of) the Q-value-Vector:
-                    qValueVec[action_number] = rmse_value_out
+        testaction_jobs.append((action_number, outfilenamestring, outputprefix))
+    
+    # Consult the SimResultsCache: TestActions with already known simulation outcome 
+    # (e.g. the current state, or the state of the previous step) are not simulated again:
+    # (a cached RMSE-value is only valid for the current contents of the real data file, i.e., its sha1-checksum)
+    cachekeys = {}
+    cached_rmse_values = {}
+    # (the cache keys claimed for the simulations of this step are released in any case, also if a simulation raises,
+    # such that concurrent calibrations waiting for them do not block forever)
+    try:
+        if cachedir is not None:
+            with RL_RunTracer.trace_span('cache', step=stepnum, num_candidates=len(testaction_jobs)) as span:
+                uncached_testaction_jobs = []
+                for action_number, outfilenamestring, outputprefix in testaction_jobs:
+                    cachekeys[action_number] = RL_SimResultsCache.simresults_cache_key(outfilenamestring, SIMDATA_SUFFIX_TEMPLATE % simulated_timestep)
+                for action_number, outfilenamestring, outputprefix in sorted(testaction_jobs, key=lambda testaction_job: cachekeys[testaction_job[0]]):
+                    cached = cached_outcome_loader(cachekeys[action_number], cachedir, path_and_realdata, realdata_checksum)
+                    if cached is None:
+                        uncached_testaction_jobs.append((action_number, outfilenamestring, outputprefix))
+                        continue
+                    cached_rmse_values[action_number] = cached[1]
+                testaction_jobs = [testaction_job for testaction_job in testaction_jobs if testaction_job in uncached_testaction_jobs]
+                span.bytes_read = RL_RunTracer.files_size([os.path.join(cachedir, cachekeys[action_number] + '.npz') for action_number in cached_rmse_values])
+    
+        # Surrogate pre-screening: skip the (not cached) TestActions, whose predicted RMSE-value confidently loses 
+        # against the cached ones and against the other TestActions:
+        if surrogate and len(testaction_jobs) > 1:
+            with RL_RunTracer.trace_span('surrogate', step=stepnum, num_candidates=len(testaction_jobs)):
+                model = RL_SurrogateModel.surrogate_model_loader(realdata_checksum, config_key)
+                if model is not None:
+                    skipped, predicted_rmse_values = RL_SurrogateModel.surrogate_screener(model, dict((action_number, candidate_params[action_number]) for action_number, outfilenamestring, outputprefix in testaction_jobs), cached_rmse_values.values())
+                    skipped = [action_number for action_number in skipped if action_number != 0] # (the current state is always simulated)
+                    for action_number in skipped:
+                        print colored("ActionNumber %s in Step %s is skipped by the surrogate model (predicted RMSE value: %s).\n" % (action_number, stepnum, predicted_rmse_values[action_number]), 'yellow')
+                        qValueVec[action_number] = SCREENED_OUT_QVALUE
+                        candidates[action_number].update({'fidelity': -1, 'rmse': predicted_rmse_values[action_number]})
+                    testaction_jobs = [testaction_job for testaction_job in testaction_jobs if testaction_job[0] not in skipped]
+    
+        # Multi-fidelity screening: score the (not cached) TestActions with cheap low-fidelity simulations first, 
+        # and simulate only the best ones (w.r.t. the ranking of their low-fidelity RMSE-values) with full fidelity:
+        if screening is not None:
+            for level_number, level in enumerate(screening['levels']):
+                if len(testaction_jobs) <= level['keep']:
+                    break
+                with RL_RunTracer.trace_span('screening', step=stepnum, level=level_number, num_candidates=len(testaction_jobs)):
+                    screening_jobs = []
+                    for action_number, outfilenamestring, outputprefix in testaction_jobs:
+                        screeningfilename, screeningprefix = screening_testaction_setupper(outfilenamestring, outputprefix, level_number, level)
+                        screening_jobs.append((action_number, screeningfilename, screeningprefix, False, stepnum, level['target_timestep']))
+                    screening_results = testaction_simulations_runner(screening_jobs, numworkers, stepnum, pool)
                 
-                elif new_lam < 0.0:
-                    # negative lambda-values are not permitted, hence reverse the above action, and give it a penalized Q-value.
-                    new_lam = new_lam + epsilon_lam
-                    parLambda = new_lam
-                    param_lam.text = str(new_lam)
-                    
-                    # Penalize the Action and set a very bad Q-value:
-                    qValueVec[action_number] = 10000.0
+                    screening_rmse_values = dict((action_number, float('inf')) for action_number, outfilenamestring, outputprefix in testaction_jobs)
+                    screening_results = [(action_number, defcoords) for action_number, defcoords, usage in screening_results if defcoords is not None]
+                    if len(screening_results) > 0:
+                        realcoords = RL_ReferenceDataStore.reference_coords_loader(TESTSIMRESULTS_DIR + REALDATA_FILENAME_TEMPLATE % level['target_timestep'])
+                        rmse_values_out = RL_RMSEvalueComputeScript.rmsevalues_from_coords_batched(realcoords, np.array([defcoords for action_number, defcoords in screening_results]))
+                        for k, (action_number, defcoords) in enumerate(screening_results):
+                            screening_rmse_values[action_number] = float(rmse_values_out[k])
+            
+                promoted = sorted(screening_rmse_values, key=lambda action_number: screening_rmse_values[action_number])[:level['keep']]
+                if 0 in screening_rmse_values and 0 not in promoted:
+                    # (the current state is always simulated with full fidelity, in addition to the best ones)
+                    promoted.append(0)
+                for action_number in screening_rmse_values:
+                    if action_number not in promoted:
+                        print colored("ActionNumber %s in Step %s is screened out at screening level %s (low-fidelity RMSE value: %s).\n" % (action_number, stepnum, level_number, screening_rmse_values[action_number]), 'yellow')
+                        qValueVec[action_number] = SCREENED_OUT_QVALUE
+                        if screening_rmse_values[action_number] == float('inf'):
+                            # the low-fidelity simulation failed: penalize the Action (cf. below).
+                            qValueVec[action_number] = 10000.0
+                            candidates[action_number].update({'fidelity': level_number + 1, 'penalized': True})
+                        else:
+                            candidates[action_number].update({'fidelity': level_number + 1, 'rmse': screening_rmse_values[action_number]})
+                testaction_jobs = [testaction_job for testaction_job in testaction_jobs if testaction_job[0] in promoted]
+    
+        # 1.) + 2.) Run Simulation-App and extract the deformed coords for all (not cached, not screened out) TestActions, 
+        # and penalize the TestActions, whose simulation failed or exceeded its wall-clock or memory limit (e.g. pathological parameter sets):
+        simulator_jobs = [(action_number, outfilenamestring, outputprefix, write_outvis, stepnum, simulated_timestep) for action_number, outfilenamestring, outputprefix in testaction_jobs]
+        simulator_results = testaction_simulations_runner(simulator_jobs, numworkers, stepnum, pool)
+        for action_number, defcoords, usage in simulator_results:
+            candidates[action_number].update(RL_RunHistoryStore.usage_columns(usage))
+            if defcoords is None:
+                print colored("The simulation of ActionNumber %s in Step %s failed, hence the Action is penalized.\n" % (action_number, stepnum), 'red')
+                qValueVec[action_number] = 10000.0
+                candidates[action_number]['penalized'] = True
+        simulator_results = [(action_number, defcoords) for action_number, defcoords, usage in simulator_results if defcoords is not None]
+    
+        # 3.) Compute the RMSE-values of all simulated TestActions in one (batched) array operation, 
+        # i.e., compare the 'simulation results' with the 'real data':
+        simulated_rmse_values = {}
+        if len(simulator_results) > 0:
+            with RL_RunTracer.trace_span('rmse', step=stepnum, num_candidates=len(simulator_results)):
+                realcoords = RL_ReferenceDataStore.reference_coords_loader(path_and_realdata)
+                simcoords_stack = np.array([defcoords for action_number, defcoords in simulator_results])
+                rmse_values_out = RL_RMSEvalueComputeScript.rmsevalues_from_coords_batched(realcoords, simcoords_stack)
         
+            for k, (action_number, defcoords) in enumerate(simulator_results):
+                simulated_rmse_values[action_number] = rmse_values_out[k]
+                if cachedir is not None:
+                    RL_SimResultsCache.simresults_cache_store(cachekeys[action_number], defcoords, rmse_values_out[k], path_and_realdata, cachedir, realdata_sha1=realdata_checksum)
+    finally:
+        RL_SimResultsCache.simresults_cache_releaser()
+    
+    # Transfer the RMSE-values into (the respective component = action_number of) the Q-value-Vector, 
+    # and append/store them (as candidates of this step) to the run history store (in one transaction, see below):
+    for action_number in range(0,5):
         
-        # ========================================================
-        # For MU: if action_number == 3 or action_number == 4:
-        if action_number == 3:
-            for param_mu in root.iter('mu'):
-                prev_param_mu = float(param_mu.text)
-                new_mu = prev_param_mu + epsilon_mu
-                parMu = new_mu
-                param_mu.text = str(new_mu)
-                
-                # Set up the respective TestAction-xml-inputfile for Action 3:
-                outfilenamestring = infilenamestring[:-4] + '_TestAction' + str(action_number) + '.xml'
-                print("The outfilenamestring for Action %s is: %s.\n" % (action_number, outfilenamestring))
-                tree.write(outfilenamestring)
-                
-    #            parameter_set = [parLambda, parMu] #, parGrav]
-    #            
-    #            # Return or Store the action number in a list, or/and 
-    #            # alternatively/additionally store the resulting parameter set:
-    #            filename = 'state_list.txt'
-    #            
-    #            if os.path.exists(filename):
-    #                append_write = 'a' # append if already exists
-    #            else:
-    #                append_write = 'w' # make a new file if not
-    #            
-    #            state_list_file = open(filename,append_write)
-    #            #state_list_file.write("ActionNumber in Step " + str(stepnum) + ": " + str(action_number) + '\n')
-    #            #state_list_file.write("ParameterSet in Step " + str(stepnum) + ": " + str(parameter_set) + '\n')
-    #            state_list_file.close()
-                
-                # Subprocess Function Calls:
-                process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True) # NOTE: probably not needed anymore.
-                
-                # 1.) Run Simulation-App with np=1 and with newly-defined TestAction-XML-Inputfile:
-                cmdForSimulationRunner = "python RL_SimulationRunnerScript.py 1 " + outfilenamestring
-                #print("CONTROL OUTPUT: The cmdForSimulationRunnerScript is: %s" % cmdForSimulationRunner)
-                process = subprocess.call(cmdForSimulationRunner, shell=True)
-                print('\n')
-                print colored('SimulationRunner successfully finished.', 'green')
-                print colored('======================================= \n', 'green')
-                
-                # 2.) Run Pvtu2vtu-Converter with obtained TestAction simulation results:
-                cmdForPvtu2vtuConverter = 'python RL_Pvtu2vtuConverterAndVMStressCalculator.py RL_TestSimResults/ 140000 50000' 
-                # note the lambda and mu parameters are not relevant/effective here, but needed for the function call.
-                process = subprocess.call(cmdForPvtu2vtuConverter, shell=True)
-                print('\n')
-                print colored('Pvtu2vtuConverter successfully finished.', 'green')
-                print colored('======================================== \n', 'green')
-                
-                # 3.) Run RMSE-value-Compute-Script, in order to compute the RMSE-value 
-                # for the respective TestAction-deformedCoords obtained from the Pvtu2vtu-Converter, ...
-                # Therefore, read the vtk-xml-tree of the deformedCoords and extract the coords list, i.e. "nodes_numpy_array_simdata", 
-                # in order to append it to a stored nodes_numpy_array_simdata-list.
-                # Then compare the 'simulation results' with the 'real data' and compute the RMSE value, 
-                # and return the RMSE-value (and additionally append/store the RMSE-value to a stored RMSE-values-list):
-                #cmdForRMSEvalueComputeScript = 'python RL_RMSEvalueComputeScriptOLD.py RL_TestSimResults/ Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu %s' % str(stepnum)
-                #process = subprocess.call(cmdForRMSEvalueComputeScript, shell=True)
-                #rmse_value_out = subprocess.check_output([sys.executable, cmdForRMSEvalueComputeScript])
-                rmse_value_out = RL_RMSEvalueComputeScript.rmsevalue_computer("RL_TestSimResults/", "Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", "TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", str(stepnum), str(action_number))
-                print('\n')
-                print colored("The RMSE value in Step %s for ActionNumber %s is: %s." % (stepnum, action_number, rmse_value_out), 'yellow') #... return value
-                print('\n')
-                print colored('RMSEvalueComputeScript successfully finished.', 'green')
-                print colored('============================================= \n', 'green')
-                
-                # Transfer RMSE-value into (the respective component = action_number of) the Q-value-Vector:
-                qValueVec[action_number] = rmse_value_out
-                
-                
-        if action_number == 4:
-            for param_mu in root.iter('mu'):
-                prev_param_mu = float(param_mu.text)
-                new_mu = prev_param_mu - epsilon_mu
-                
-                if new_mu >= 0.0:
-                    # positive mu-values are permitted, proceed as above in Action 1:
-                    parMu = new_mu
-                    param_mu.text = str(new_mu)
-                    
-                    # Set up the respective TestAction-xml-inputfile for Action 4:
-                    outfilenamestring = infilenamestring[:-4] + '_TestAction' + str(action_number) + '.xml'
-                    print("The outfilenamestring for Action %s is: %s.\n" % (action_number, outfilenamestring))
-                    tree.write(outfilenamestring)
-                    
-    #            parameter_set = [parLambda, parMu] #, parGrav]
-    #            
-    #            # Return or Store the action number in a list, or/and 
-    #            # alternatively/additionally store the resulting parameter set:
-    #            filename = 'state_list.txt'
-    #            
-    #            if os.path.exists(filename):
-    #                append_write = 'a' # append if already exists
-    #            else:
-    #                append_write = 'w' # make a new file if not
-    #            
-    #            state_list_file = open(filename,append_write)
-    #            #state_list_file.write("ActionNumber in Step " + str(stepnum) + ": " + str(action_number) + '\n')
-    #            #state_list_file.write("ParameterSet in Step " + str(stepnum) + ": " + str(parameter_set) + '\n')
-    #            state_list_file.close()
-                    
-                    # Subprocess Function Calls:
-                    process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True) # NOTE: probably not needed anymore.
-                    
-                    # 1.) Run Simulation-App with np=1 and with newly-defined TestAction-XML-Inputfile:
-                    cmdForSimulationRunner = "python RL_SimulationRunnerScript.py 1 " + outfilenamestring
-                    #print("CONTROL OUTPUT: The cmdForSimulationRunnerScript is: %s" % cmdForSimulationRunner)
-                    process = subprocess.call(cmdForSimulationRunner, shell=True)
-                    print('\n')
-                    print colored('SimulationRunner successfully finished.', 'green')
-                    print colored('======================================= \n', 'green')
-                    
-                    # 2.) Run Pvtu2vtu-Converter with obtained TestAction simulation results:
-                    cmdForPvtu2vtuConverter = 'python RL_Pvtu2vtuConverterAndVMStressCalculator.py RL_TestSimResults/ 140000 50000' 
-                    # note the lambda and mu parameters are not relevant/effective here, but needed for the function call.
-                    process = subprocess.call(cmdForPvtu2vtuConverter, shell=True)
-                    print('\n')
-                    print colored('Pvtu2vtuConverter successfully finished.', 'green')
-                    print colored('======================================== \n', 'green')
-                    
-                    # 3.) Run RMSE-value-Compute-Script, in order to compute the RMSE-value 
-                    # for the respective TestAction-deformedCoords obtained from the Pvtu2vtu-Converter, ...
-                    # Therefore, read the vtk-xml-tree of the deformedCoords and extract the coords list, i.e. "nodes_numpy_array_simdata", 
-                    # in order to append it to a stored nodes_numpy_array_simdata-list.
-                    # Then compare the 'simulation results' with the 'real data' and compute the RMSE value, 
-                    # and return the RMSE-value (and additionally append/store the RMSE-value to a stored RMSE-values-list):
-                    #cmdForRMSEvalueComputeScript = 'python RL_RMSEvalueComputeScriptOLD.py RL_TestSimResults/ Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu %s' % str(stepnum)
-                    #process = subprocess.call(cmdForRMSEvalueComputeScript, shell=True)
-                    #rmse_value_out = subprocess.check_output([sys.executable, cmdForRMSEvalueComputeScript])
-                    rmse_value_out = RL_RMSEvalueComputeScript.rmsevalue_computer("RL_TestSimResults/", "Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", "TestRL_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu", str(stepnum), str(action_number))
-                    print('\n')
-                    print colored("The RMSE value in Step %s for ActionNumber %s is: %s." % (stepnum, action_number, rmse_value_out), 'yellow') #... return value
-                    print('\n')
-                    print colored('RMSEvalueComputeScript successfully finished.', 'green')
-                    print colored('============================================= \n', 'green')
-                    
-                    # Transfer RMSE-value into (the respective component = action_number of) the Q-value-Vector:
-                    qValueVec[action_number] = rmse_value_out
-                
-                elif new_mu < 0.0:
-                    # negative mu-values are not permitted, hence reverse the above action, and give it a penalized Q-value.
-                    new_mu = new_mu + epsilon_mu
-                    parMu = new_mu
-                    param_mu.text = str(new_mu)
-                    
-                    # Penalize the Action and set a very bad Q-value:
-                    qValueVec[action_number] = 10000.0
+        if action_number in cached_rmse_values:
+            rmse_value_out = cached_rmse_values[action_number]
+            rmse_value_source = ' (taken from SimResultsCache)'
+        elif action_number in simulated_rmse_values:
+            rmse_value_out = simulated_rmse_values[action_number]
+            rmse_value_source = ''
+        else:
+            continue # penalized action.
         
+        candidates[action_number].update({'rmse': float(rmse_value_out), 'cache_hit': action_number in cached_rmse_values, 'fidelity': fidelity})
+        print colored("The RMSE value in Step %s for ActionNumber %s is: %s%s." % (stepnum, action_number, rmse_value_out, rmse_value_source), 'yellow') #... return value
         
-    # ======================================================
-    # For GRAV: if action_number == 5 or action_number == 6:
-    #for param_grav in root.iter('gravity'):
-    #    prev_param_grav = float(param_grav.text)
-    #    parGrav = prev_param_grav
-    #    if action_number == 5:
-    #        new_grav = prev_param_grav + epsilon_grav
-    #        if new_grav > 0.0: # positive gravity is not permitted, hence reverse the above action, and then go to "if action_number == 6:" ...
-    #            new_grav = new_grav - epsilon_grav
-    #            action_number = 6
-    #        parGrav = new_grav
-    #        param_grav.text = str(new_grav)
-    #    if action_number == 6:
-    #        new_grav = prev_param_grav - epsilon_grav
-    #        parGrav = new_grav
-    #        param_grav.text = str(new_grav)
+        qValueVec[action_number] = rmse_value_out
         
         print("ActionSpace for Step %s further simulated/computed, i.e., Q-value vector further updated." % stepnum)
         print("Q-value Vector (in Step %s):\n ===> [%s,%s,%s,%s,%s]. \n\n" % (stepnum, qValueVec[0],qValueVec[1],qValueVec[2],qValueVec[3],qValueVec[4]))
@@ -439,15 +561,20 @@ def qvalue_computer(arg1, arg2):
     
     print colored("ActionSpace for Step %s entirely computed/simulated, i.e., Q-value vector fully updated.\n" % stepnum, 'yellow')
     
+    with RL_RunTracer.trace_span('logging', step=stepnum, num_candidates=len(candidates)):
+        RL_RunHistoryStore.history_candidates_recorder([candidates[action_number] for action_number in range(0,5)])
+    
     
     # Analyze Q-value-vector, choose the best Q-value, and perform the respective action 
     # (i.e., fill the respective newly defined parameter into the xml-inputfile):
     
-    # 1.) Analyze Q-value-vector: find the component (action_number) with the smallest RMSE-value:
-    q_min_index = 100
+    # 1.) Analyze Q-value-vector: find the component (action_number) with the smallest RMSE-value,
+    # among the TestActions with a full-fidelity RMSE-value (i.e., never a screened-out or skipped TestAction; 
+    # if there is none, the current state is kept):
+    q_min_index = 0
     q_min = 100000.0
     for ind,val in enumerate(qValueVec):
-        if val < q_min:
+        if (ind in cached_rmse_values or ind in simulated_rmse_values) and val < q_min:
             q_min = val
             q_min_index = ind
     print colored("The Q-value Vector has been analyzed, and the best Action was found to be: action_number = %s. \n" % q_min_index, 'yellow')
@@ -540,19 +667,12 @@ def qvalue_computer(arg1, arg2):
     # Store parameter-set development and action_number development in a separate list file:
     parameter_set = [parLambda, parMu] #, parGrav]
     
-    # Return or Store the action number in a list, or/and 
-    # alternatively/additionally store the resulting parameter set:
-    filename = 'RL_state_list.txt'
-    
-    if os.path.exists(filename):
-        append_write = 'a' # append if already exists
-    else:
-        append_write = 'w' # make a new file if not
-    
-    state_list_file = open(filename,append_write)
-    state_list_file.write("Chosen ActionNumber in Step " + str(stepnum) + "   :  " + str(q_min_index) + '\n')
-    state_list_file.write("Produced ParameterSet in Step " + str(stepnum) + " :  " + str(parameter_set) + '\n')
-    state_list_file.close()
+    # Store the action number and the resulting parameter set in the run history store 
+    # (for action 0, the parameter set remains the current state's one):
+    if q_min_index == 0:
+        parameter_set = [state_lambda, state_mu]
+    with RL_RunTracer.trace_span('logging', step=stepnum, action=q_min_index):
+        RL_RunHistoryStore.history_step_recorder(run_id, stepnum, q_min_index, parameter_set[0], parameter_set[1], time.time() - starttime)
     
     print('QvalueComputeScript successfully finished in Step %s.' % stepnum)
     
@@ -563,6 +683,9 @@ def qvalue_computer(arg1, arg2):
 if __name__ == '__main__':
     print('\n')
     print colored('QvalueComputeFunction STARTED. \n', 'yellow')
-    qvalue_computer(sys.argv[1],sys.argv[2])
+    if len(sys.argv) > 3:
+        qvalue_computer(sys.argv[1],sys.argv[2],sys.argv[3])
+    else:
+        qvalue_computer(sys.argv[1],sys.argv[2])
     print('\n')
     print colored('QvalueComputeFunction FINISHED. \n', 'yellow')
@@ -12,6 +12,14 @@
 # The output is the following:
 #   .. RMSE-value: a scalar value as a comparison measure for the two input meshes.
 # 
+# The vtu files may be written in any encoding of the vtk xml format (ascii, appended raw binary, 
+# zlib- or lz4-compressed binary), since the vtkXMLUnstructuredGridReader detects the encoding itself.
+# 
+# For scoring several candidates at once, rmsevalues_from_coords_batched() computes the 
+# RMSE-values of a stack of K candidate coords arrays w.r.t. one reference coords array.
+# 
+# The RMSE-values are appended to the run history store (RL_run_history.sqlite, see RL_RunHistoryStore.py).
+# 
 # To run the script, call:
 #   python SimResultsComparisonOperator.py <path-to-files> <realdata-name> <simdata-name>
 # 
@@ -36,8 +44,53 @@ from vtk.util.numpy_support import vtk_to_numpy
 #import glob
 from termcolor import colored # for colored terminal output for better overview.
 
+import RL_ReferenceDataStore
+import RL_RunTracer
+import RL_RunHistoryStore
+
+
+def defcoords_reader(path_and_file):
+    
+    # Read a vtu file and return the coordinates of the nodes in the mesh as a numpy-array (num_points x dim):
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(path_and_file)
+    reader.Update()
+    
+    return vtk_to_numpy(reader.GetOutput().GetPoints().GetData())
+
+
+def squared_error_computer(realcoords, simcoords):
+    
+    # Compute the sum of squared errors over all nodes (and all dims) of two coords arrays (num_points x dim):
+    coords_diff = np.asarray(realcoords, dtype=np.float64) - np.asarray(simcoords, dtype=np.float64)
+    return np.einsum('ij,ij->', coords_diff, coords_diff)
+
+
+def rmsevalue_from_coords(realcoords, simcoords):
+    
+    # Compute the RMSE-value of two coords arrays (num_points x dim):
+    return np.sqrt(squared_error_computer(realcoords, simcoords) / realcoords.shape[0])
+
 
-def rmsevalue_computer(arg1, arg2, arg3, arg4, arg5):
+def rmsevalues_from_coords_batched(realcoords, simcoords_stack):
+    
+    # Compute the RMSE-values of K candidate coords arrays (stacked into K x num_points x dim) 
+    # w.r.t. one reference coords array (num_points x dim) in one array operation.
+    # Returns the numpy-array of the K RMSE-values.
+    coords_diff = np.asarray(simcoords_stack, dtype=np.float64) - np.asarray(realcoords, dtype=np.float64)[np.newaxis, :, :]
+    return np.sqrt(np.einsum('kij,kij->k', coords_diff, coords_diff) / realcoords.shape[0])
+
+
+def rmsevalue_logger(stepnum, action_number, rmse_value, **candidate):
+    
+    # Store/Append the RMSE-value (and further columns of the candidate, e.g. lambda, mu, cache_hit)
+    # in/to the run history store (see RL_RunHistoryStore.py), as part of the current run:
+    with RL_RunTracer.trace_span('logging', step=stepnum, action=action_number):
+        candidate.update({'run_id': candidate.get('run_id', RL_RunHistoryStore.history_current_run()), 'step': int(stepnum), 'action': int(action_number), 'rmse': float(rmse_value)})
+        RL_RunHistoryStore.history_candidates_recorder([candidate])
+
+
+def rmsevalue_computer(arg1, arg2, arg3, arg4, arg5, return_simcoords=False):
     
     print('=====================================')
     print('SimResultsComparisonOperator started. \n')
@@ -56,65 +109,47 @@ def rmsevalue_computer(arg1, arg2, arg3, arg4, arg5):
     print('Control Output: Path to real data:      ', path_and_realdata)
     print('Control Output: Path to simulated data: ', path_and_simdata)
     
-    # ------------------------------------------------
-    # Read first vtu file (representing the real data)
-    reader = vtk.vtkXMLUnstructuredGridReader()
-    reader.SetFileName(path_and_realdata)
-    reader.Update()
+    with RL_RunTracer.trace_context(step=stepnum, action=action_number), RL_RunTracer.trace_span('rmse', simdata=path_and_simdata) as span:
+        
+        # ------------------------------------------------
+        # Get first vtu file (representing the real data) from the ReferenceDataStore,
+        # i.e., the vtu file is only parsed on first use (or if it has changed):
+        nodes_numpy_array_realdata = RL_ReferenceDataStore.reference_coords_loader(path_and_realdata)
     
-    # Get the coordinates of nodes in the mesh
-    nodes_vtk_array_realdata = reader.GetOutput().GetPoints().GetData()
+        # ------------------------------------------------
+        # Read second vtu file (representing the simulated data)
+        readerTwo = vtk.vtkXMLUnstructuredGridReader()
+        readerTwo.SetFileName(path_and_simdata)
+        readerTwo.Update()
     
-    # ------------------------------------------------
-    # Read second vtu file (representing the simulated data)
-    readerTwo = vtk.vtkXMLUnstructuredGridReader()
-    readerTwo.SetFileName(path_and_simdata)
-    readerTwo.Update()
+        # Get the coordinates of nodes in the mesh
+        nodes_vtk_array_simdata = readerTwo.GetOutput().GetPoints().GetData()
     
-    # Get the coordinates of nodes in the mesh
-    nodes_vtk_array_simdata = readerTwo.GetOutput().GetPoints().GetData()
+        # ------------------------------------------------
+        #Get the coordinates of the nodes of the simulated-data-mesh as a numpy-array:
+        nodes_numpy_array_simdata = vtk_to_numpy(nodes_vtk_array_simdata)
     
-    # ------------------------------------------------
-    #Get the coordinates of the nodes of the real-data-mesh as a numpy-array:
-    nodes_numpy_array_realdata = vtk_to_numpy(nodes_vtk_array_realdata)
-    x_rd,y_rd,z_rd = nodes_numpy_array_realdata[:,0] , nodes_numpy_array_realdata[:,1] , nodes_numpy_array_realdata[:,2]
-    #Get the coordinates of the nodes of the simulated-data-mesh as a numpy-array:
-    nodes_numpy_array_simdata = vtk_to_numpy(nodes_vtk_array_simdata)
-    x_sd,y_sd,z_sd = nodes_numpy_array_simdata[:,0] , nodes_numpy_array_simdata[:,1] , nodes_numpy_array_simdata[:,2]
+        print('Control Output: nodes_numpy_array_simdata.shape = ', nodes_numpy_array_simdata.shape) # num_points x dim
+        print('Control Output: num_points = nodes_numpy_array_realdata.size/3 = ', nodes_numpy_array_realdata.size/3)
     
-    print('Control Output: nodes_numpy_array_simdata.shape = ', nodes_numpy_array_simdata.shape) # num_points x dim
+        # Compute the RMSE (which represents the sample standard deviation of the differences 
+        # between the simulated/predicted values and real/observed values:
     
-    # Compute real_coords{0,1,2} - sim_coords{0,1,2}
-    x_diff = x_rd - x_sd
-    y_diff = y_rd - y_sd
-    z_diff = z_rd - z_sd
+        # Compute the sum over all nodes of the squared length of the diff vector real_coords{0,1,2} - sim_coords{0,1,2}
+        # (squared in order to stronger account for large errors):
+        error_scaler = squared_error_computer(nodes_numpy_array_realdata, nodes_numpy_array_simdata)
+        num_points = nodes_numpy_array_realdata.shape[0]
     
-    #print(x_diff.shape) # num_points x 1
-    print('Control Output: num_points = nodes_numpy_array_realdata.size/3 = ', nodes_numpy_array_realdata.size/3)
+        print('The error_scaler in Step %s is: %s.' % (stepnum, error_scaler))
     
-    # Compute the RMSE (which represents the sample standard deviation of the differences 
-    # between the simulated/predicted values and real/observed values:
+        # Compute the mean of squared errors, i.e., divide by the number of mesh points:
+        error_scaler = error_scaler/num_points
     
-    error_scaler = 0.0
-    num_points = nodes_numpy_array_realdata.size/3
-    #total_error = 0.0
-    
-    for i in range(0,num_points):
-    	
-    	# compute the length of the diff vector for every node in the mesh:
-    	#error_scaler += np.sqrt( (x_diff[i])**2 + (y_diff[i])**2 + (z_diff[i])**2 )
-    	# square the length in order to stronger account for large errors:
-    	error_scaler += (x_diff[i])**2 + (y_diff[i])**2 + (z_diff[i])**2
-    	# ...
-    
-    print('The error_scaler in Step %s is: %s.' % (stepnum, error_scaler))
-    
-    # Compute the mean of squared errors, i.e., divide by the number of mesh points:
-    error_scaler = error_scaler/num_points
-    
-    # Compute the root of the mean of squared errors, i.e., the RMSE:
-    rmse_value = np.sqrt(error_scaler)
-    print('The RMSE in Step %s is: %s.' % (stepnum, rmse_value))
+        # Compute the root of the mean of squared errors, i.e., the RMSE:
+        rmse_value = np.sqrt(error_scaler)
+        print('The RMSE in Step %s is: %s.' % (stepnum, rmse_value))
+        
+        span.bytes_read = RL_RunTracer.files_size([path_and_realdata, path_and_simdata])
     
     
     # Return the RMSE-value: --> rather: Append it to an existing list of RMSE-values:
@@ -124,16 +159,7 @@ def rmsevalue_computer(arg1, arg2, arg3, arg4, arg5):
     
     
     # Store/Append the RMSE-value in/to a list:
-    rmsefilename = 'RL_rmse_value_list.txt'
-    
-    if os.path.exists(rmsefilename):
-        append_write = 'a' # append if already exists
-    else:
-        append_write = 'w' # make a new file if not
-    
-    rmse_value_list_file = open(rmsefilename,append_write)
-    rmse_value_list_file.write("RMSE-Value in Step " + str(stepnum) + " Action Number " + str(action_number) + ": " + str(rmse_value) + '\n')
-    rmse_value_list_file.close()
+    rmsevalue_logger(stepnum, action_number, rmse_value)
     
     
 #    # Store/Append the obtained simulation-results deformed coords 'nodes_numpy_array_simdata' in/to a list:
@@ -176,6 +202,10 @@ def rmsevalue_computer(arg1, arg2, arg3, arg4, arg5):
     
     print('SimResultsComparisonOperator successfully finished.')
     
+    # Optionally also return the simulated deformed coords (e.g. for storing them in the SimResultsCache):
+    if return_simcoords:
+        return rmse_value, nodes_numpy_array_simdata
+    
     return rmse_value
 
 
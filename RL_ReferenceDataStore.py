@@ -0,0 +1,223 @@
+#######################################################################
+# Python script providing a store of preloaded reference (real) data,
+# such that the REALDATA vtu files are parsed only once per calibration campaign:
+#
+# The script needs the following input:
+#   .. a REALDATA vtu file (e.g. Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu).
+#
+# On first use, the coordinates of the nodes of the REALDATA mesh are converted
+# into a compact binary numpy-array file (.npy) in the store directory, together with
+# a sidecar file (.json) holding the sha1-checksum, size and mtime of the source vtu file.
+# Later on, the .npy file is memory-mapped, as long as the source vtu file is unchanged
+# (checked by size and mtime first, and by the sha1-checksum if these differ).
+#
+# For simulation results on another (e.g. finer) refinement level than the REALDATA, the store also holds
+# the remapping of the REALDATA nodes onto the simulated nodes (nearest neighbour w.r.t. the undeformed
+# coords, i.e., the REALDATA coords minus the displacement (u0,u1,u2)), one .npy file per refinement level
+# and sha1-checksum of the source vtu file (i.e., a changed REALDATA file is remapped again).
+#
+# The output is the following:
+#   .. the (read-only, memory-mapped) numpy-array of the REALDATA coords (num_points x dim),
+#   .. (on request) the remap index (num_points) of the REALDATA nodes into the simulated nodes,
+#   .. (on request) the sha1-checksum of the REALDATA file (e.g. for validating cached RMSE-values).
+#
+# To convert/check a REALDATA vtu file, call:
+#   python RL_ReferenceDataStore.py <path-to-realdata-vtu> [<store-dir>]
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-09}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-09"
+
+import sys
+import os
+import json
+import hashlib
+import tempfile
+
+import vtk
+import numpy as np
+from vtk.util.numpy_support import vtk_to_numpy, numpy_to_vtk
+
+from termcolor import colored # for colored terminal output for better overview.
+
+
+REFERENCE_STORE_DIR = 'RL_ReferenceDataStore/'
+
+# Memory-mapped reference coords and remap indices, which have already been loaded in this process:
+_loaded_reference_coords = {}
+_loaded_reference_checksums = {}
+_loaded_remap_indices = {}
+
+
+def reference_store_filenames(path_and_realdata, storedir=REFERENCE_STORE_DIR):
+
+    # Get the names of the .npy file and of the .json sidecar file for the given REALDATA vtu file
+    # (the absolute path of the source is hashed into the names, in order to distinguish equally named files):
+    abspath = os.path.abspath(path_and_realdata)
+    basename = os.path.basename(abspath) + '_' + hashlib.sha1(abspath.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(storedir, basename + '.npy'), os.path.join(storedir, basename + '.json')
+
+
+def source_checksum(filename):
+
+    # Compute the sha1-checksum of the contents of the source file:
+    checksum = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def reference_coords_converter(path_and_realdata, storedir=REFERENCE_STORE_DIR):
+
+    # Read the REALDATA vtu file (once), and store the coords of its nodes
+    # as .npy file along with the .json sidecar file:
+    print('Converting reference data %s into the ReferenceDataStore.' % path_and_realdata)
+    try:
+        os.makedirs(storedir)
+    except:
+        pass
+
+    stat = os.stat(path_and_realdata)
+    checksum = source_checksum(path_and_realdata)
+
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(path_and_realdata)
+    reader.Update()
+    realcoords = np.ascontiguousarray(vtk_to_numpy(reader.GetOutput().GetPoints().GetData()), dtype=np.float64)
+
+    npyfilename, jsonfilename = reference_store_filenames(path_and_realdata, storedir)
+
+    # Write to temporary files first and then rename, such that concurrent readers never see incomplete files:
+    tmpfd, tmpfilename = tempfile.mkstemp(suffix='.tmp', dir=storedir)
+    with os.fdopen(tmpfd, 'wb') as f:
+        np.save(f, realcoords)
+    os.rename(tmpfilename, npyfilename)
+
+    sidecar = {'source': os.path.abspath(path_and_realdata), 'sha1': checksum, 'size': stat.st_size, 'mtime': stat.st_mtime, 'shape': list(realcoords.shape)}
+    tmpfd, tmpfilename = tempfile.mkstemp(suffix='.tmp', dir=storedir)
+    with os.fdopen(tmpfd, 'w') as f:
+        json.dump(sidecar, f)
+    os.rename(tmpfilename, jsonfilename)
+
+    return npyfilename
+
+
+def reference_coords_loader(path_and_realdata, storedir=REFERENCE_STORE_DIR):
+
+    # Get the coords of the nodes of the REALDATA mesh as a (read-only, memory-mapped) numpy-array,
+    # converting the REALDATA vtu file only if it has not been converted before or if it has changed.
+    stat = os.stat(path_and_realdata)
+    signature = (os.path.abspath(path_and_realdata), stat.st_size, stat.st_mtime, os.path.abspath(storedir))
+    if signature in _loaded_reference_coords:
+        return _loaded_reference_coords[signature]
+
+    npyfilename, jsonfilename = reference_store_filenames(path_and_realdata, storedir)
+
+    up_to_date = False
+    if os.path.exists(npyfilename) and os.path.exists(jsonfilename):
+        with open(jsonfilename, 'r') as f:
+            sidecar = json.load(f)
+        if sidecar['size'] == stat.st_size and sidecar['mtime'] == stat.st_mtime:
+            up_to_date = True
+        elif sidecar['size'] == stat.st_size and sidecar['sha1'] == source_checksum(path_and_realdata):
+            # e.g. touched or copied, but unchanged source file: update the sidecar file's mtime.
+            up_to_date = True
+            sidecar['mtime'] = stat.st_mtime
+            tmpfd, tmpfilename = tempfile.mkstemp(suffix='.tmp', dir=storedir)
+            with os.fdopen(tmpfd, 'w') as f:
+                json.dump(sidecar, f)
+            os.rename(tmpfilename, jsonfilename)
+
+    if not up_to_date:
+        reference_coords_converter(path_and_realdata, storedir)
+
+    realcoords = np.load(npyfilename, mmap_mode='r')
+    _loaded_reference_coords[signature] = realcoords
+
+    return realcoords
+
+
+def reference_checksum(path_and_realdata, storedir=REFERENCE_STORE_DIR):
+
+    # Get the sha1-checksum of the REALDATA vtu file (from the sidecar file, which is kept up to date by reference_coords_loader),
+    # e.g. for telling whether an RMSE-value was computed against the current contents of the file:
+    stat = os.stat(path_and_realdata)
+    signature = (os.path.abspath(path_and_realdata), stat.st_size, stat.st_mtime, os.path.abspath(storedir))
+    if signature not in _loaded_reference_checksums:
+        reference_coords_loader(path_and_realdata, storedir)
+        npyfilename, jsonfilename = reference_store_filenames(path_and_realdata, storedir)
+        with open(jsonfilename, 'r') as f:
+            _loaded_reference_checksums[signature] = str(json.load(f)['sha1'])
+    return _loaded_reference_checksums[signature]
+
+
+def reference_undeformed_points(path_and_realdata):
+
+    # Get the undeformed coords of the nodes of the REALDATA mesh, i.e., its (deformed) coords minus (u0,u1,u2):
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(path_and_realdata)
+    reader.Update()
+    grid = reader.GetOutput()
+    displacement = np.column_stack([vtk_to_numpy(grid.GetPointData().GetArray(u)) for u in ['u0', 'u1', 'u2']])
+    return vtk_to_numpy(grid.GetPoints().GetData()) - displacement
+
+
+def reference_remap_index(path_and_realdata, simpoints, refinement_level, storedir=REFERENCE_STORE_DIR):
+
+    # Get the index (num_points of the REALDATA) of the nearest simulated node (w.r.t. the undeformed coords simpoints)
+    # of every REALDATA node, i.e., simcoords[index] are the simulated coords remapped onto the REALDATA mesh.
+    # The index is computed once per REALDATA file (contents, i.e., size and mtime, or sha1-checksum, as for
+    # reference_coords_loader) and refinement level (and number of simulated nodes).
+    stat = os.stat(path_and_realdata)
+    signature = (os.path.abspath(path_and_realdata), stat.st_size, stat.st_mtime, int(refinement_level), len(simpoints), os.path.abspath(storedir))
+    if signature in _loaded_remap_indices:
+        return _loaded_remap_indices[signature]
+
+    checksum = reference_checksum(path_and_realdata, storedir)
+    npyfilename, jsonfilename = reference_store_filenames(path_and_realdata, storedir)
+    npyfilename = npyfilename[:-4] + '_RefLvl%d_%d_%s.npy' % (int(refinement_level), len(simpoints), checksum[:12])
+    if not os.path.exists(npyfilename):
+        print('Remapping reference data %s onto the nodes of refinement level %s.' % (path_and_realdata, refinement_level))
+        try:
+            os.makedirs(storedir)
+        except:
+            pass
+        points = vtk.vtkPoints()
+        points.SetData(numpy_to_vtk(np.ascontiguousarray(simpoints, dtype=np.float64), deep=1))
+        polydata = vtk.vtkPolyData()
+        polydata.SetPoints(points)
+        locator = vtk.vtkPointLocator()
+        locator.SetDataSet(polydata)
+        locator.BuildLocator()
+        realpoints = reference_undeformed_points(path_and_realdata)
+        remap_index = np.array([locator.FindClosestPoint(point) for point in realpoints], dtype=np.int64)
+        distance = np.sqrt(((np.asarray(simpoints)[remap_index] - realpoints) ** 2).sum(axis=1)).max()
+        if distance > 0.0:
+            print colored('Remapping of the reference data: max. distance of the nearest simulated nodes = %s.' % distance, 'red')
+
+        tmpfd, tmpfilename = tempfile.mkstemp(suffix='.tmp', dir=storedir)
+        with os.fdopen(tmpfd, 'wb') as f:
+            np.save(f, remap_index)
+        os.rename(tmpfilename, npyfilename)
+
+    remap_index = np.load(npyfilename)
+    _loaded_remap_indices[signature] = remap_index
+
+    return remap_index
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('ReferenceDataStore STARTED. \n', 'yellow')
+    if len(sys.argv) > 2:
+        realcoords = reference_coords_loader(sys.argv[1], sys.argv[2])
+    else:
+        realcoords = reference_coords_loader(sys.argv[1])
+    print('Reference data %s: num_points = %s, stored in %s.' % (sys.argv[1], realcoords.shape[0], realcoords.filename))
+    print('\n')
+    print colored('ReferenceDataStore FINISHED. \n', 'yellow')
@@ -0,0 +1,364 @@
+#######################################################################
+# Python script providing a typed, append-only store of the history of
+# calibration runs (SQLite), replacing the free-text lists RL_state_list.txt
+# and RL_rmse_value_list.txt:
+#
+# The store (RL_run_history.sqlite) holds the following tables:
+#   .. runs:       run_id, started (unix time), label, source (e.g. the migrated file),
+#   .. candidates: run_id, step, action, lambda, mu, rmse, cache_hit, penalized,
+#                  exit_status, sim_wall_time, sim_cpu_time, sim_max_rss, fidelity, gravity, realdata_sha1, config, recorded,
+#                  i.e., one row per evaluated TestAction (candidate) of a Q-value step
+#                  (fidelity: 0 for full-fidelity simulations, N for candidates screened out at screening level N-1,
+#                  -1 for candidates skipped by the surrogate model (with their predicted rmse), see RL_SurrogateModel.py,
+#                  COARSE_LEVEL_FIDELITY - N for the (cheaper) simulations of the coarse level N of a coarse-to-fine schedule,
+#                  see RL_CoarseToFineSchedule.py; only full-fidelity candidates are considered as best candidates;
+#                  action -1: single parameter sets, e.g. the points of a line search, see RL_StepSizeController.py,
+#                  or the trial points of the Levenberg-Marquardt updates, see RL_LevenbergMarquardtCalibrator.py,
+#                  or the proposals of the Bayesian optimization, see RL_BayesianOptimizationCalibrator.py;
+#                  gravity: NULL, unless the gravity of the xml-inputfile was varied as well;
+#                  realdata_sha1, config: the sha1-checksum of the real data, which the RMSE-value was computed against,
+#                  and the hash of the simulation configuration, see RL_SimResultsCache.simresults_config_key,
+#                  i.e., candidates with equal keys lie on the same (lambda, mu) -> RMSE-value surface; NULL if unknown),
+#   .. steps:      run_id, step, chosen_action, lambda, mu, step_time, gravity, recorded,
+#                  i.e., one row per Q-value step with the chosen action and the produced parameter set
+#                  (chosen_action -1: the parameter set produced by a line search or a Levenberg-Marquardt update,
+#                  or the best parameter set after a batch of the Bayesian optimization; gravity: NULL, unless varied as well).
+# Rows are only ever inserted (never updated), the tables are indexed by (run_id, step, action),
+# by rmse and by (lambda, mu), and the candidates can be loaded column-wise as numpy arrays.
+#
+# Existing text logs (RL_rmse_value_list.txt, RL_state_list.txt, and terminal transcripts
+# such as Test_RLSimOutput/RL_TestRun_History_20170808_INIT2.txt) can be migrated into the store.
+#
+# To migrate text logs into the store (one run per call), call:
+#   python RL_RunHistoryStore.py migrate <text-log-file> [<text-log-file> ...]
+# To print the summary of the stored runs (or of one run), call:
+#   python RL_RunHistoryStore.py summary [<run-id>]
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-12}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-12"
+
+import sys
+import os
+import re
+import time
+import sqlite3
+import threading
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+
+HISTORY_DB_FILENAME = 'RL_run_history.sqlite'
+
+# Manipulation (epsilon) values of the actions, used for reconstructing the candidate parameters on migration:
+MIGRATION_EPSILON_LAM = 5000.0
+MIGRATION_EPSILON_MU = 3000.0
+
+# Fidelity of the candidates of the coarse level 0 of a coarse-to-fine schedule (level N: COARSE_LEVEL_FIDELITY - N):
+COARSE_LEVEL_FIDELITY = -2
+
+HISTORY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    label TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS candidates (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    step INTEGER NOT NULL,
+    action INTEGER NOT NULL,
+    lambda REAL,
+    mu REAL,
+    rmse REAL,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    penalized INTEGER NOT NULL DEFAULT 0,
+    exit_status INTEGER,
+    sim_wall_time REAL,
+    sim_cpu_time REAL,
+    sim_max_rss INTEGER,
+    fidelity INTEGER NOT NULL DEFAULT 0,
+    gravity REAL,
+    realdata_sha1 TEXT,
+    config TEXT,
+    recorded REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    step INTEGER NOT NULL,
+    chosen_action INTEGER NOT NULL,
+    lambda REAL,
+    mu REAL,
+    step_time REAL,
+    gravity REAL,
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS candidates_run_step_action ON candidates (run_id, step, action);
+CREATE INDEX IF NOT EXISTS candidates_rmse ON candidates (rmse);
+CREATE INDEX IF NOT EXISTS candidates_params ON candidates (lambda, mu);
+CREATE INDEX IF NOT EXISTS steps_run_step ON steps (run_id, step);
+'''
+
+CANDIDATE_COLUMNS = ['run_id', 'step', 'action', 'lambda', 'mu', 'rmse', 'cache_hit', 'penalized', 'exit_status', 'sim_wall_time', 'sim_cpu_time', 'sim_max_rss', 'fidelity', 'gravity', 'realdata_sha1', 'config', 'recorded']
+CANDIDATE_DTYPE = [('run_id', 'i8'), ('step', 'i8'), ('action', 'i8'), ('lambda', 'f8'), ('mu', 'f8'), ('rmse', 'f8'), ('cache_hit', 'i1'), ('penalized', 'i1'),
+                   ('exit_status', 'i8'), ('sim_wall_time', 'f8'), ('sim_cpu_time', 'f8'), ('sim_max_rss', 'i8'), ('fidelity', 'i8'), ('gravity', 'f8'),
+                   ('realdata_sha1', 'U40'), ('config', 'U40'), ('recorded', 'f8')]
+
+# Columns added to the tables after their creation (table, column, type), which are added to the tables of former stores
+# (with NULL, or the given default, for all former rows; e.g. all former candidates have full fidelity):
+HISTORY_ADDED_COLUMNS = [('candidates', 'fidelity', 'INTEGER NOT NULL DEFAULT 0'), ('candidates', 'gravity', 'REAL'),
+                         ('candidates', 'realdata_sha1', 'TEXT'), ('candidates', 'config', 'TEXT'), ('steps', 'gravity', 'REAL')]
+HISTORY_ADDED_INDICES = '''
+CREATE INDEX IF NOT EXISTS candidates_keys ON candidates (realdata_sha1, config);
+'''
+
+STEP_COLUMNS = ['run_id', 'step', 'chosen_action', 'lambda', 'mu', 'step_time', 'gravity', 'recorded']
+STEP_DTYPE = [('run_id', 'i8'), ('step', 'i8'), ('chosen_action', 'i8'), ('lambda', 'f8'), ('mu', 'f8'), ('step_time', 'f8'), ('gravity', 'f8'), ('recorded', 'f8')]
+
+# Open connections of the current thread ({(pid, dbfile): connection}; dropped, i.e. closed, when the thread ends),
+# and the current run of this process ({dbfile: run_id}):
+class _history_connections_of_thread(threading.local):
+    def __init__(self):
+        self.connections = {}
+
+_history_connections = _history_connections_of_thread()
+_current_run_ids = {}
+
+
+def history_connection(dbfile=HISTORY_DB_FILENAME):
+
+    # Get the connection to the store (opened once per process and thread; the tables are created on first use).
+    # WAL journaling allows for concurrent readers and appending processes (e.g. parallel workers).
+    key = (os.getpid(), os.path.abspath(dbfile))
+    if key not in _history_connections.connections:
+        connection = sqlite3.connect(dbfile, timeout=60.0)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(HISTORY_SCHEMA)
+        for table, column, columntype in HISTORY_ADDED_COLUMNS:
+            if column not in [existing[1] for existing in connection.execute('PRAGMA table_info(%s)' % table)]:
+                with connection:
+                    connection.execute('ALTER TABLE %s ADD COLUMN %s %s' % (table, column, columntype))
+        connection.executescript(HISTORY_ADDED_INDICES)
+        _history_connections.connections[key] = connection
+    return _history_connections.connections[key]
+
+
+def history_run_starter(label='', source='', dbfile=HISTORY_DB_FILENAME):
+
+    # Start a new run in the store, make it the current run of this process, and return its run_id:
+    connection = history_connection(dbfile)
+    with connection:
+        run_id = connection.execute('INSERT INTO runs (started, label, source) VALUES (?, ?, ?)', (time.time(), label, source)).lastrowid
+    _current_run_ids[os.path.abspath(dbfile)] = run_id
+    return run_id
+
+
+def history_run_resumer(run_id, dbfile=HISTORY_DB_FILENAME):
+
+    # Make an existing run (e.g. of an interrupted calibration) the current run of this process again:
+    _current_run_ids[os.path.abspath(dbfile)] = int(run_id)
+    return int(run_id)
+
+
+def history_current_run(dbfile=HISTORY_DB_FILENAME):
+
+    # Get the current run of this process (a new run is started, if there is none yet):
+    if os.path.abspath(dbfile) not in _current_run_ids:
+        return history_run_starter('qvalue_computer', os.getcwd(), dbfile)
+    return _current_run_ids[os.path.abspath(dbfile)]
+
+
+def history_candidates_recorder(candidates, dbfile=HISTORY_DB_FILENAME):
+
+    # Append the candidates (list of dicts with keys from CANDIDATE_COLUMNS) to the store in one transaction:
+    now = time.time()
+    rows = []
+    for candidate in candidates:
+        candidate = dict(candidate)
+        candidate.setdefault('fidelity', 0)
+        candidate.setdefault('recorded', now)
+        rows.append(tuple(candidate.get(column) if column not in ('cache_hit', 'penalized') else int(bool(candidate.get(column))) for column in CANDIDATE_COLUMNS))
+    connection = history_connection(dbfile)
+    with connection:
+        connection.executemany('INSERT INTO candidates (%s) VALUES (%s)' % (', '.join(CANDIDATE_COLUMNS), ', '.join(['?'] * len(CANDIDATE_COLUMNS))), rows)
+
+
+def history_step_recorder(run_id, step, chosen_action, param_lambda, param_mu, step_time=None, dbfile=HISTORY_DB_FILENAME, gravity=None):
+
+    # Append one Q-value step (the chosen action and the produced parameter set, incl. the gravity, if varied) to the store:
+    connection = history_connection(dbfile)
+    with connection:
+        connection.execute('INSERT INTO steps (%s) VALUES (?, ?, ?, ?, ?, ?, ?, ?)' % ', '.join(STEP_COLUMNS), (run_id, int(step), int(chosen_action), param_lambda, param_mu, step_time, gravity, time.time()))
+
+
+def coarse_level_fidelity(level_number):
+
+    # Get the fidelity of the candidates of the given coarse level of a coarse-to-fine schedule:
+    return COARSE_LEVEL_FIDELITY - int(level_number)
+
+
+def usage_columns(usage):
+
+    # Get the candidate columns of the resource usage of a simulation (see RL_ManagedLauncher.py):
+    if usage is None:
+        return {}
+    return {'exit_status': usage['exit_status'], 'sim_wall_time': usage['wall_time'], 'sim_cpu_time': usage['user_time'] + usage['sys_time'], 'sim_max_rss': usage['max_rss']}
+
+
+def history_loader(table, where='', params=(), dbfile=HISTORY_DB_FILENAME):
+
+    # Load the rows of the table ('candidates' or 'steps') matching the (optional) SQL where-clause
+    # as numpy structured array (i.e., column-wise, e.g. history['rmse']); NULL values become NaN (or -1, or ''):
+    columns, dtype = (CANDIDATE_COLUMNS, CANDIDATE_DTYPE) if table == 'candidates' else (STEP_COLUMNS, STEP_DTYPE)
+    missing = tuple(np.nan if kind[0] == 'f' else ('' if kind[0] == 'U' else -1) for name, kind in dtype)
+    sql = 'SELECT %s FROM %s' % (', '.join(columns), table)
+    if where != '':
+        sql += ' WHERE ' + where
+    sql += ' ORDER BY run_id, step' + (', action' if table == 'candidates' else '')
+    rows = history_connection(dbfile).execute(sql, params).fetchall()
+    rows = [tuple(missing[k] if value is None else value for k, value in enumerate(row)) for row in rows]
+    return np.array(rows, dtype=dtype)
+
+
+def history_candidates_loader(run_id=None, step=None, action=None, dbfile=HISTORY_DB_FILENAME):
+
+    # Load the candidates (of the given run, step and action, if given) as numpy structured array:
+    conditions, params = [], []
+    for column, value in [('run_id', run_id), ('step', step), ('action', action)]:
+        if value is not None:
+            conditions.append('%s = ?' % column)
+            params.append(int(value))
+    return history_loader('candidates', ' AND '.join(conditions), tuple(params), dbfile)
+
+
+def history_steps_loader(run_id=None, dbfile=HISTORY_DB_FILENAME):
+
+    # Load the steps (of the given run, if given) as numpy structured array:
+    if run_id is None:
+        return history_loader('steps', dbfile=dbfile)
+    return history_loader('steps', 'run_id = ?', (int(run_id),), dbfile)
+
+
+def history_best_candidate(run_id=None, dbfile=HISTORY_DB_FILENAME):
+
+    # Get the (not penalized, full-fidelity) candidate with the smallest RMSE-value (of the given run, if given), or None:
+    sql = 'SELECT %s FROM candidates WHERE penalized = 0 AND fidelity = 0 AND rmse IS NOT NULL' % ', '.join(CANDIDATE_COLUMNS)
+    params = ()
+    if run_id is not None:
+        sql += ' AND run_id = ?'
+        params = (int(run_id),)
+    row = history_connection(dbfile).execute(sql + ' ORDER BY rmse LIMIT 1', params).fetchone()
+    if row is None:
+        return None
+    return dict(zip(CANDIDATE_COLUMNS, row))
+
+
+def history_summary(run_id=None, dbfile=HISTORY_DB_FILENAME):
+
+    # Print a summary of the stored runs (or of the given run):
+    connection = history_connection(dbfile)
+    sql = 'SELECT run_id, started, label, source FROM runs'
+    params = ()
+    if run_id is not None:
+        sql += ' WHERE run_id = ?'
+        params = (int(run_id),)
+    for run in connection.execute(sql + ' ORDER BY run_id', params).fetchall():
+        candidates = history_candidates_loader(run[0], dbfile=dbfile)
+        steps = history_steps_loader(run[0], dbfile=dbfile)
+        print colored('Run %s (%s, %s, started %s):' % (run[0], run[2], run[3], time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run[1]))), 'green')
+        print('  steps: %s, candidates: %s (cache hits: %s, penalized: %s, screened out: %s, coarse levels: %s).' % (len(steps), len(candidates), int(candidates['cache_hit'].sum()) if len(candidates) else 0, int(candidates['penalized'].sum()) if len(candidates) else 0,
+                                                                                                                    int(((candidates['fidelity'] > 0) | (candidates['fidelity'] == -1)).sum()) if len(candidates) else 0, int((candidates['fidelity'] <= COARSE_LEVEL_FIDELITY).sum()) if len(candidates) else 0))
+        best = history_best_candidate(run[0], dbfile)
+        if best is not None:
+            print('  best candidate: RMSE %s in step %s (action %s), lambda = %s, mu = %s%s.' % (best['rmse'], best['step'], best['action'], best['lambda'], best['mu'], ', gravity = %s' % best['gravity'] if best['gravity'] is not None else ''))
+        if len(steps):
+            print('  last parameter set (step %s): lambda = %s, mu = %s.' % (steps['step'][-1], steps['lambda'][-1], steps['mu'][-1]))
+
+
+def history_migrator(filenames, label='migrated', dbfile=HISTORY_DB_FILENAME):
+
+    # Migrate the given text logs (RL_rmse_value_list.txt, RL_state_list.txt, and/or terminal transcripts of a run)
+    # into the store, as one new run. Returns the run_id.
+    rmse_values = {}    # {(step, action): (rmse, cache_hit)}
+    chosen_actions = {} # {step: action}
+    parameter_sets = {} # {step: (lambda, mu)}
+
+    for filename in filenames:
+        laststep = None
+        with open(filename, 'r') as f:
+            for line in f:
+                match = re.match(r'RMSE-Value in Step (\d+) Action Number (\d+): (\S+)', line)
+                if match:
+                    rmse_values[(int(match.group(1)), int(match.group(2)))] = (float(match.group(3)), False)
+                    continue
+                match = re.match(r'The RMSE value in Step (\d+) for ActionNumber (\d+) is: ([-+.\deE]+?)( \(taken from SimResultsCache\))?\.\s*$', line)
+                if match:
+                    laststep = int(match.group(1))
+                    rmse_values[(laststep, int(match.group(2)))] = (float(match.group(3)), match.group(4) is not None)
+                    continue
+                match = re.match(r'Chosen ActionNumber in Step (\d+)\s*:\s*(\d+)', line)
+                if match:
+                    chosen_actions[int(match.group(1))] = int(match.group(2))
+                    continue
+                match = re.match(r'Produced ParameterSet in Step (\d+)\s*:\s*\[([^,\]]+),\s*([^,\]]+)', line)
+                if match:
+                    parameter_sets[int(match.group(1))] = (float(match.group(2)), float(match.group(3)))
+                    continue
+                match = re.search(r'the best Action was found to be: action_number = (\d+)', line)
+                if match and laststep is not None:
+                    chosen_actions.setdefault(laststep, int(match.group(1)))
+
+    # Reconstruct the parameter sets before every step from the produced parameter sets and the chosen actions
+    # (note: for action 0, the produced parameter set has been logged as [0.0, 0.0], i.e., it equals the previous one):
+    deltas = {0: (0.0, 0.0), 1: (MIGRATION_EPSILON_LAM, 0.0), 2: (-MIGRATION_EPSILON_LAM, 0.0), 3: (0.0, MIGRATION_EPSILON_MU), 4: (0.0, -MIGRATION_EPSILON_MU)}
+    states = {} # {step: (lambda, mu) before the step}
+    for step in sorted(parameter_sets):
+        if chosen_actions.get(step, 0) != 0 and step in chosen_actions:
+            dlam, dmu = deltas[chosen_actions[step]]
+            states[step] = (parameter_sets[step][0] - dlam, parameter_sets[step][1] - dmu)
+            states[step + 1] = parameter_sets[step]
+    for step in sorted(chosen_actions) + sorted(chosen_actions, reverse=True):
+        if chosen_actions[step] == 0:
+            if step not in states and step + 1 in states:
+                states[step] = states[step + 1]
+            if step in states:
+                states[step + 1] = states[step]
+                parameter_sets[step] = states[step]
+            else:
+                parameter_sets.pop(step, None)
+
+    run_id = history_run_starter(label, ', '.join(filenames), dbfile)
+
+    candidates = []
+    for (step, action), (rmse, cache_hit) in sorted(rmse_values.items()):
+        candidate = {'run_id': run_id, 'step': step, 'action': action, 'rmse': rmse, 'cache_hit': cache_hit}
+        if step in states:
+            dlam, dmu = deltas[action]
+            candidate['lambda'], candidate['mu'] = states[step][0] + dlam, states[step][1] + dmu
+        candidates.append(candidate)
+    history_candidates_recorder(candidates, dbfile)
+
+    for step in sorted(chosen_actions):
+        param_lambda, param_mu = parameter_sets.get(step, (None, None))
+        history_step_recorder(run_id, step, chosen_actions[step], param_lambda, param_mu, None, dbfile)
+
+    print('Migrated %s candidates and %s steps from %s into run %s of %s.' % (len(candidates), len(chosen_actions), ', '.join(filenames), run_id, dbfile))
+    return run_id
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('RunHistoryStore STARTED. \n', 'yellow')
+    if sys.argv[1] == 'migrate':
+        history_migrator(sys.argv[2:])
+    elif sys.argv[1] == 'summary':
+        history_summary(sys.argv[2] if len(sys.argv) > 2 else None)
+    print('\n')
+    print colored('RunHistoryStore FINISHED. \n', 'yellow')
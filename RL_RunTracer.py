@@ -0,0 +1,220 @@
+#######################################################################
+# Python script providing structured tracing of calibration runs,
+# i.e., timed spans per step, action and stage (xml setup, simulation,
+# extraction, conversion, RMSE computation, logging, ...), and an
+# aggregated metrics summary of the trace:
+#
+# Every span is written as one JSON line to the trace file (RL_trace.jsonl), once when
+# it begins (event 'begin') and once when it ends (event 'end'), with the fields:
+#   .. pid, step, action, stage, start (unix time), duration (s),
+#   .. bytes_read, bytes_written, exit_status, error (if any).
+# Spans which have begun but never ended indicate stuck (or crashed) candidates.
+# The trace file is opened once per process and every line is flushed immediately,
+# such that concurrent worker processes can append to the same trace file.
+#
+# The metrics summary contains per stage: count, total/mean/median/p95/max duration,
+# bytes read/written, failures; plus the slowest spans, the outliers (duration larger
+# than OUTLIER_FACTOR times the median of the stage) and the open spans (begun, but not ended).
+#
+# To aggregate a trace file into the metrics summary (RL_trace_metrics.json), call:
+#   python RL_RunTracer.py [<trace-file>]
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-11}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-11"
+
+import sys
+import os
+import time
+import json
+import glob
+import threading
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+
+# Trace file (None: tracing disabled) and metrics summary file:
+TRACE_FILENAME = 'RL_trace.jsonl'
+METRICS_FILENAME = 'RL_trace_metrics.json'
+
+# Spans longer than OUTLIER_FACTOR times the median duration of their stage (and longer than
+# OUTLIER_MIN_SECONDS) are reported as outliers:
+OUTLIER_FACTOR = 3.0
+OUTLIER_MIN_SECONDS = 1.0
+NUM_SLOWEST_SPANS = 10
+
+# Open trace file of this process (pid, filename, file), and the stack of the current (step, action) contexts
+# (per thread, e.g. for the concurrent trajectories of RL_MultiStartCalibrator.py):
+_trace_file = [None, None, None]
+_trace_file_lock = threading.Lock()
+
+
+class _trace_context_stack_of_thread(threading.local):
+    def __init__(self):
+        self.stack = [{}]
+
+_trace_context = _trace_context_stack_of_thread()
+
+
+def trace_writer(record, tracefile=None):
+
+    # Append one record (dict) as JSON line to the trace file (opened once per process):
+    if tracefile is None:
+        tracefile = TRACE_FILENAME
+    if tracefile is None:
+        return
+    with _trace_file_lock:
+        if _trace_file[0] != os.getpid() or _trace_file[1] != tracefile:
+            # first record of this process (e.g. a forked worker process), or another trace file:
+            _trace_file[0], _trace_file[1], _trace_file[2] = os.getpid(), tracefile, open(tracefile, 'a')
+        _trace_file[2].write(json.dumps(record) + '\n')
+        _trace_file[2].flush()
+
+
+class trace_context(object):
+
+    # Context (e.g. step and action) of all spans within the with-block:
+    #   with RL_RunTracer.trace_context(step=3, action=1): ...
+    def __init__(self, **context):
+        self.context = context
+
+    def __enter__(self):
+        context = dict(_trace_context.stack[-1])
+        context.update(self.context)
+        _trace_context.stack.append(context)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _trace_context.stack.pop()
+        return False
+
+
+class trace_span(object):
+
+    # Timed span of the given stage within the with-block; bytes_read, bytes_written and
+    # exit_status (and further fields in 'extra') may be set within the with-block:
+    #   with RL_RunTracer.trace_span('simulation') as span: ... span.exit_status = exit_status
+    def __init__(self, stage, **fields):
+        self.stage = stage
+        self.fields = fields
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.exit_status = None
+        self.extra = {}
+
+    def __enter__(self):
+        self.record = {'pid': os.getpid(), 'stage': self.stage, 'step': None, 'action': None}
+        self.record.update(_trace_context.stack[-1])
+        self.record.update(self.fields)
+        self.start = time.time()
+        self.record['start'] = self.start
+        begin_record = dict(self.record)
+        begin_record['event'] = 'begin'
+        trace_writer(begin_record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record = dict(self.record)
+        record.update(self.extra)
+        record.update({'event': 'end', 'duration': time.time() - self.start, 'bytes_read': self.bytes_read, 'bytes_written': self.bytes_written, 'exit_status': self.exit_status})
+        if exc_type is not None:
+            record['error'] = '%s: %s' % (exc_type.__name__, exc_value)
+        trace_writer(record)
+        return False
+
+
+def files_size(filenames):
+
+    # Get the total size (bytes) of the given (existing) files:
+    size = 0
+    for filename in filenames:
+        try:
+            size += os.path.getsize(filename)
+        except OSError:
+            pass
+    return size
+
+
+def pvtu_files(path_and_pvtu):
+
+    # Get the pvtu file and its vtu pieces (named '<pvtu-basename>_N.vtu' by HiFlow3):
+    return [path_and_pvtu] + glob.glob(path_and_pvtu[:-5] + '_[0-9]*.vtu')
+
+
+def trace_reader(tracefile=TRACE_FILENAME):
+
+    # Read all records of the trace file (skipping incomplete lines, e.g. of a killed process):
+    records = []
+    with open(tracefile, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return records
+
+
+def trace_metrics_aggregator(tracefile=TRACE_FILENAME, metricsfile=METRICS_FILENAME):
+
+    # Aggregate the spans of the trace file into the metrics summary (dict), and write it to the metrics file:
+    records = trace_reader(tracefile)
+    ended = [record for record in records if record.get('event') == 'end']
+    ended_keys = set((record['pid'], record['stage'], record['start']) for record in ended)
+    open_spans = [record for record in records if record.get('event') == 'begin' and (record['pid'], record['stage'], record['start']) not in ended_keys]
+
+    stages = {}
+    outliers = []
+    for stage in sorted(set(record['stage'] for record in ended)):
+        spans = [record for record in ended if record['stage'] == stage]
+        durations = np.array([record['duration'] for record in spans])
+        median = float(np.median(durations))
+        stages[stage] = {'count': len(spans), 'total': float(durations.sum()), 'mean': float(durations.mean()),
+                         'median': median, 'p95': float(np.percentile(durations, 95)), 'max': float(durations.max()),
+                         'bytes_read': sum(record.get('bytes_read') or 0 for record in spans),
+                         'bytes_written': sum(record.get('bytes_written') or 0 for record in spans),
+                         'failures': sum(1 for record in spans if record.get('error') or record.get('exit_status') not in (None, 0))}
+        outliers += [record for record in spans if len(spans) > 2 and record['duration'] > max(OUTLIER_FACTOR * median, OUTLIER_MIN_SECONDS)]
+
+    now = time.time()
+    for record in open_spans:
+        record['running_for'] = now - record['start']
+
+    metrics = {'tracefile': tracefile, 'num_spans': len(ended), 'stages': stages,
+               'slowest_spans': sorted(ended, key=lambda record: -record['duration'])[:NUM_SLOWEST_SPANS],
+               'outliers': outliers, 'open_spans': open_spans}
+
+    if metricsfile is not None:
+        with open(metricsfile, 'w') as f:
+            json.dump(metrics, f, indent=1, sort_keys=True)
+
+    return metrics
+
+
+def trace_metrics_reporter(metrics):
+
+    # Print the metrics summary:
+    print colored('Trace metrics of %s (%s spans):' % (metrics['tracefile'], metrics['num_spans']), 'green')
+    print('%-16s%8s%12s%10s%10s%10s%10s%14s%14s%9s' % ('stage', 'count', 'total', 'mean', 'median', 'p95', 'max', 'bytes_read', 'bytes_written', 'failures'))
+    for stage, m in sorted(metrics['stages'].items(), key=lambda item: -item[1]['total']):
+        print('%-16s%8d%12.3f%10.3f%10.3f%10.3f%10.3f%14d%14d%9d' % (stage, m['count'], m['total'], m['mean'], m['median'], m['p95'], m['max'], m['bytes_read'], m['bytes_written'], m['failures']))
+    for record in metrics['outliers']:
+        print colored('SLOW: step %s, action %s, stage %s: %.3f s (median of stage: %.3f s).' % (record['step'], record['action'], record['stage'], record['duration'], metrics['stages'][record['stage']]['median']), 'red')
+    for record in metrics['open_spans']:
+        print colored('OPEN (stuck or crashed): step %s, action %s, stage %s (pid %s), started %.1f s ago.' % (record['step'], record['action'], record['stage'], record['pid'], record['running_for']), 'red')
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('RunTracer STARTED. \n', 'yellow')
+    tracefile = sys.argv[1] if len(sys.argv) > 1 else TRACE_FILENAME
+    metrics = trace_metrics_aggregator(tracefile)
+    trace_metrics_reporter(metrics)
+    print('\nMetrics summary written to %s.' % METRICS_FILENAME)
+    print('\n')
+    print colored('RunTracer FINISHED. \n', 'yellow')
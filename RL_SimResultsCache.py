@@ -0,0 +1,235 @@
+#######################################################################
+# Python script providing a persistent, content-addressed cache of
+# simulation outcomes (deformed coordinates and RMSE-values),
+# keyed by the parameter set of the HiFlow3-based elasticity simulation:
+#
+# The cache key is a canonical hash of the effective simulation xml-inputfile
+# (i.e., lambda, mu, gravity, mesh, BC file, solver settings, ...),
+# where the output location (OutputPathAndPrefix) is ignored, and where the
+# contents of the referenced mesh and BC data files are hashed as well.
+#
+# Every cache entry is stored as '<key>.npz' in the cache directory and contains:
+#   .. defcoords: the deformed coordinates (num_points x dim) of the simulation results,
+#   .. rmse_value: the RMSE-value w.r.t. the real data 'realdata',
+#   .. realdata_sha1: the sha1-checksum of the real data file, when the RMSE-value was computed
+#      (a cached RMSE-value is only valid for real data with the same checksum, not just the same path).
+#
+# The total size of the cache directory is bounded; if the bound is exceeded,
+# the least recently used entries are evicted.
+#
+# Concurrent threads of one process (e.g. the trajectories of RL_MultiStartCalibrator.py) may claim
+# the keys, which they are going to simulate, such that every parameter set is simulated only once.
+#
+# To look up the cache entry of an xml-inputfile, call:
+#   python RL_SimResultsCache.py <xml-inputfile> [<tag>]
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-09}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-09"
+
+import sys
+import os
+import hashlib
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+
+CACHE_DIR = 'RL_SimResultsCache/'
+CACHE_MAX_BYTES = 512 * 1024 * 1024 # approx. 1000 entries for the 21868-nodes beam.
+
+# xml-tags which do not influence the simulation outcome:
+CACHE_IGNORED_TAGS = ['OutputPathAndPrefix']
+
+# xml-tags of the calibrated parameters, which are ignored by the configuration key (see simresults_config_key):
+CONFIG_PARAMETER_TAGS = ['lambda', 'mu']
+
+# xml-tags referencing input files, whose contents are hashed as well:
+CACHE_HASHED_FILE_TAGS = ['Filename', 'BCdataFilename']
+
+# Keys, which are claimed by a thread of this process ({key: (thread, event)}), see simresults_cache_claimer:
+_claimed_keys = {}
+_claimed_keys_lock = threading.Lock()
+
+
+def simresults_cache_key(xmlinputfile, tag='', ignored_tags=CACHE_IGNORED_TAGS):
+
+    # Compute the canonical hash of the effective simulation xml-inputfile (without the ignored xml-tags).
+    # Numerical values are normalized (e.g. '130666' == '130666.0'), such that
+    # equal parameter sets always yield equal keys; 'tag' distinguishes different
+    # kinds of cached outcomes (e.g. the timestep of the deformed coordinates).
+    tree = ET.parse(xmlinputfile)
+    root = tree.getroot()
+
+    canonical_lines = ['tag=' + str(tag)]
+
+    def canonicalize(elem, path):
+        for child in elem:
+            if child.tag in ignored_tags:
+                continue
+            childpath = path + '/' + child.tag
+            text = (child.text or '').strip()
+            if text != '':
+                try:
+                    text = repr(float(text))
+                except ValueError:
+                    pass
+                canonical_lines.append(childpath + '=' + text)
+                if child.tag in CACHE_HASHED_FILE_TAGS and os.path.isfile(child.text.strip()):
+                    canonical_lines.append(childpath + '#sha1=' + file_checksum(child.text.strip()))
+            canonicalize(child, childpath)
+
+    canonicalize(root, root.tag)
+
+    return hashlib.sha1('\n'.join(canonical_lines).encode('utf-8')).hexdigest()
+
+
+def simresults_config_key(xmlinputfile, tag=''):
+
+    # Compute the canonical hash of the simulation configuration of the xml-inputfile, i.e., of everything but its output location
+    # and its calibrated parameters lambda and mu (e.g. mesh, refinement level, time stepping, solver settings, gravity):
+    # the outcomes of simulations with equal configuration keys are comparable as function of (lambda, mu).
+    return simresults_cache_key(xmlinputfile, tag, CACHE_IGNORED_TAGS + CONFIG_PARAMETER_TAGS)
+
+
+def file_checksum(filename):
+
+    # Compute the sha1-checksum of the contents of a file:
+    checksum = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def simresults_cache_lookup(key, cachedir=CACHE_DIR):
+
+    # Look up the cache entry for the given key.
+    # Returns (defcoords, rmse_value, realdata, realdata_sha1), or None if there is no such entry
+    # (realdata_sha1 is '' for entries stored without the checksum of the real data).
+    entryfilename = os.path.join(cachedir, key + '.npz')
+    if not os.path.exists(entryfilename):
+        return None
+
+    try:
+        entry = np.load(entryfilename)
+        defcoords = entry['defcoords']
+        rmse_value = float(entry['rmse_value'])
+        realdata = str(entry['realdata'])
+        realdata_sha1 = str(entry['realdata_sha1']) if 'realdata_sha1' in entry.files else ''
+        entry.close()
+    except Exception:
+        # incomplete or corrupted entry: treat as cache miss.
+        return None
+
+    # Mark the entry as recently used (for the LRU eviction):
+    try:
+        os.utime(entryfilename, None)
+    except OSError:
+        pass
+
+    return defcoords, rmse_value, realdata, realdata_sha1
+
+
+def simresults_cache_store(key, defcoords, rmse_value, realdata, cachedir=CACHE_DIR, maxbytes=CACHE_MAX_BYTES, realdata_sha1=''):
+
+    # Store the simulation outcome for the given key (with the RMSE-value w.r.t. the real data file realdata,
+    # whose sha1-checksum is realdata_sha1, see RL_ReferenceDataStore.reference_checksum).
+    # The entry is written to a temporary file first and then renamed,
+    # such that concurrent readers never see incomplete entries.
+    try:
+        os.makedirs(cachedir)
+    except:
+        pass
+
+    entryfilename = os.path.join(cachedir, key + '.npz')
+    tmpfd, tmpfilename = tempfile.mkstemp(suffix='.tmp', dir=cachedir)
+    with os.fdopen(tmpfd, 'wb') as f:
+        np.savez(f, defcoords=np.asarray(defcoords), rmse_value=np.float64(rmse_value), realdata=np.array(str(realdata)), realdata_sha1=np.array(str(realdata_sha1)))
+    os.rename(tmpfilename, entryfilename)
+
+    simresults_cache_evictor(cachedir, maxbytes)
+
+    return entryfilename
+
+
+def simresults_cache_claimer(key):
+
+    # Claim the key (i.e., its simulation) for the current thread. Returns True if claimed (the thread simulates it,
+    # stores the outcome and then releases its claims), or False after the claim of another thread has been released
+    # (i.e., the key is to be looked up again). Threads claim their keys in ascending order, such that they never
+    # wait for each other in a cycle.
+    thread = threading.current_thread().ident
+    with _claimed_keys_lock:
+        if key not in _claimed_keys:
+            _claimed_keys[key] = (thread, threading.Event())
+            return True
+        claiming_thread, event = _claimed_keys[key]
+    if claiming_thread == thread:
+        return True
+    event.wait()
+    return False
+
+
+def simresults_cache_releaser():
+
+    # Release all claims of the current thread:
+    thread = threading.current_thread().ident
+    with _claimed_keys_lock:
+        for key in [key for key in _claimed_keys if _claimed_keys[key][0] == thread]:
+            _claimed_keys.pop(key)[1].set()
+
+
+def simresults_cache_evictor(cachedir=CACHE_DIR, maxbytes=CACHE_MAX_BYTES):
+
+    # Evict the least recently used entries until the cache fits into maxbytes.
+    # Returns the number of evicted entries.
+    entries = []
+    total_bytes = 0
+    for entryname in os.listdir(cachedir):
+        if not entryname.endswith('.npz'):
+            continue
+        entryfilename = os.path.join(cachedir, entryname)
+        try:
+            stat = os.stat(entryfilename)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entryfilename))
+        total_bytes += stat.st_size
+
+    num_evicted = 0
+    entries.sort()
+    for mtime, size, entryfilename in entries:
+        if total_bytes <= maxbytes:
+            break
+        try:
+            os.remove(entryfilename)
+        except OSError:
+            pass
+        total_bytes -= size
+        num_evicted += 1
+
+    return num_evicted
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('SimResultsCache STARTED. \n', 'yellow')
+    tag = sys.argv[2] if len(sys.argv) > 2 else ''
+    key = simresults_cache_key(sys.argv[1], tag)
+    print('Cache key of %s: %s.' % (sys.argv[1], key))
+    cached = simresults_cache_lookup(key)
+    if cached is not None:
+        print('Cache entry found: num_points = %s, RMSE = %s (realdata: %s, sha1: %s).' % (cached[0].shape[0], cached[1], cached[2], cached[3]))
+    else:
+        print('No cache entry found.')
+    print('\n')
+    print colored('SimResultsCache FINISHED. \n', 'yellow')
@@ -14,6 +14,14 @@
 # To run the script, call:
 #   python SimulationRunner.py <num-para-proc> <path-to-xml-input-filename>
 # 
+# or, from within python (without starting a new interpreter):
+#   RL_SimulationRunnerScript.simulation_runner(<num-para-proc>, <path-to-xml-input-filename>)
+# 
+# The simulation is started by the managed launcher (see RL_ManagedLauncher.py), i.e., it is 
+# terminated after SIMULATION_TIMEOUT s (e.g. a hung solve), its memory is limited to 
+# SIMULATION_MAX_MEMORY bytes per process, and its resource usage (CPU times, max RSS) 
+# is reported (and returned on request, return_usage=True).
+# 
 # Example:
 #    python SimulationRunner.py 2 elastScen_BeamQuader_DirAndNeumBC.xml 
 # 
@@ -27,33 +35,100 @@ __date__ = "2017-07-31"
 
 import os
 import sys
+import glob
+
+import xml.etree.ElementTree as ET
+
+import RL_RunTracer
+import RL_ManagedLauncher
+
+
+# HiFlow3 elasticity executables for sequential and parallel (mpirun) execution:
+HIFLOW_EXECUTABLE_SEQUENTIAL = './elasticity'
+HIFLOW_EXECUTABLE_PARALLEL = 'elasticity' # possibly add PATH; t.b. imported
+
+# Wall-clock limit (s) and memory limit (bytes per process) of a simulation (None: no limit):
+SIMULATION_TIMEOUT = 3600
+SIMULATION_MAX_MEMORY = None
+
 
-print('=========================')
-print('SimulationRunner started. \n')
+def simulation_runner(numproc, xmlinputfile, timeout=SIMULATION_TIMEOUT, max_memory=SIMULATION_MAX_MEMORY, return_usage=False):
+    
+    # Run the HiFlow3 elasticity simulation with numproc processes and the given xml-inputfile.
+    # Returns the exit status of the simulation (non-zero if it failed or exceeded its limits),
+    # or (exit_status, usage) with the resource usage (dict, see RL_ManagedLauncher.py) if return_usage.
+    print('=========================')
+    print('SimulationRunner started. \n')
+    
+    # Create the output directory of the simulation (i.e., the directory of its OutputPathAndPrefix):
+    outputdir = os.path.dirname(simulation_output_prefix(xmlinputfile))
+    if outputdir != '':
+        try:
+            os.makedirs(outputdir)
+        except:
+            pass
+    
+    #print('NumProc: %s.' % int(numproc))
+    
+    exit_status = 0
+    usage = None
+    
+    with RL_RunTracer.trace_span('simulation', xmlinputfile=xmlinputfile, numproc=int(numproc)) as span:
+        
+        if int(numproc) == 1: # Run sequentially:
+            cmd = "%s %s" % (HIFLOW_EXECUTABLE_SEQUENTIAL, xmlinputfile)
+            print("Starting Execution of HiFlow3 Elasticity App in sequential mode: %s" % cmd)
+            usage = RL_ManagedLauncher.managed_launcher(cmd, timeout, max_memory)
+        
+        if int(numproc) > 1: # Run HiFlow3-Elasticity-Simulation in parallel with np X:
+            cmd = "%s %s %s %s" % ('mpirun -np', numproc, HIFLOW_EXECUTABLE_PARALLEL, xmlinputfile)
+            print("Starting Execution of HiFlow3 Elasticity App in parallel mode: %s" % cmd)
+            usage = RL_ManagedLauncher.managed_launcher(cmd, timeout, max_memory)
+        
+        if usage is not None:
+            RL_ManagedLauncher.usage_reporter(usage)
+            exit_status = usage['exit_status']
+            span.extra = dict((key, usage[key]) for key in ['timed_out', 'user_time', 'sys_time', 'max_rss'])
+        span.exit_status = exit_status
+        span.bytes_read = RL_RunTracer.files_size([xmlinputfile])
+        span.bytes_written = RL_RunTracer.files_size([f for f in simulation_output_files(xmlinputfile) if os.path.getmtime(f) >= span.start])
+    
+    if exit_status == 0:
+        print('SimulationRunner successfully finished.')
+    else:
+        print('SimulationRunner FAILED with exit status %s.' % exit_status)
+    
+    if return_usage:
+        return exit_status, usage
+    return exit_status
 
-try:
-    os.makedirs("TestSimResults")
-except:
-    pass
 
-numproc = sys.argv[1]
-#print('NumProc: %s.' % int(numproc))
+def simulation_output_prefix(xmlinputfile):
+    
+    # Get the OutputPathAndPrefix of the simulation with the given xml-inputfile ('' if there is none):
+    try:
+        for param_out in ET.parse(xmlinputfile).getroot().iter('OutputPathAndPrefix'):
+            return param_out.text.strip()
+    except Exception:
+        pass
+    return ''
 
-xmlinputfile = sys.argv[2]
 
-if int(numproc) == 1: # Run sequentially:
-    HIFLOW_EXECUTABLE = './elasticity'
-    cmd = "%s %s" % (HIFLOW_EXECUTABLE, xmlinputfile)
-    print("Starting Execution of HiFlow3 Elasticity App in sequential mode: %s" % cmd)
-    os.system(cmd)
+def simulation_output_files(xmlinputfile):
+    
+    # Get the (existing) output files of the simulation with the given xml-inputfile, i.e. '<OutputPathAndPrefix>*':
+    outputprefix = simulation_output_prefix(xmlinputfile)
+    if outputprefix == '':
+        return []
+    return glob.glob(outputprefix + '*')
 
-if int(numproc) > 1: # Run HiFlow3-Elasticity-Simulation in parallel with np X:
-    HIFLOW_EXECUTABLE = 'elasticity' # possibly add PATH; t.b. imported
-    cmd = "%s %s %s %s" % ('mpirun -np', numproc, HIFLOW_EXECUTABLE, xmlinputfile)
-    print("Starting Execution of HiFlow3 Elasticity App in parallel mode: %s" % cmd)
-    os.system(cmd)
 
-print('SimulationRunner successfully finished.')
+if __name__ == '__main__':
+    numproc = sys.argv[1]
+    xmlinputfile = sys.argv[2]
+    exit_status = simulation_runner(numproc, xmlinputfile)
+    # (a simulation terminated by a signal has the negative signal number as exit status, see RL_ManagedLauncher.py)
+    sys.exit(exit_status if exit_status >= 0 else 128 - exit_status)
 
 #    def execute(self):
 #        """Execute `run HiFlow3 Elasticity`
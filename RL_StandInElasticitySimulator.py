@@ -0,0 +1,232 @@
+#######################################################################
+# Python script providing a deterministic, local stand-in for the HiFlow3-based
+# elasticity simulation application ('elasticity'), e.g. for benchmarking the
+# calibration pipeline without a HiFlow3 build (see RL_PipelineBenchmark.py):
+#
+# The script needs the following input:
+#   .. the resolution of the beam mesh (number of cells per unit length; default: 4),
+#   .. path to xml input filename (lambda, mu, gravity, density, Neumann pressure,
+#      InitialRefLevel, DeltaT, MaxTimeStepIts, VisPerXTs and OutputPathAndPrefix are used, everything else is ignored).
+#
+# Using the data specified above, the script discretizes the beam [-5,5]x[-0.5,0.5]x[-0.5,0.5]
+# (clamped at x = -5) by tetrahedra (with the resolution doubled per refinement level, i.e., the nodes
+# of a coarser level are nodes of all finer levels), and evaluates a closed-form (Euler-Bernoulli-like)
+# displacement field for gravity and Neumann pressure load, which depends smoothly on
+# the material parameters (E and nu from lambda and mu), and grows linearly in time (up to the full
+# load at STANDIN_LOAD_TIME, such that truncated runs, e.g. with fewer time steps, match the full run at the same time).
+#
+# The output is the following:
+#   .. simulation results shaped like the HiFlow3 results in Test_RLSimInput, i.e., for every
+#      visualized timestep a pvtu file and one vtu piece with the PointData arrays {'u0', 'u1', 'u2'}
+#      and the CellData arrays {'Material Id', '_remote_index_', '_sub_domain_'} (4 points per cell):
+#      <OutputPathAndPrefix>_solution_np1_RefLvlN_Tstep.XXXX.pvtu (and _0.vtu), N = InitialRefLevel.
+#
+# To run the script, call:
+#   python RL_StandInElasticitySimulator.py [<mesh-resolution>] <path-to-xml-input-filename>
+#
+# Example (as replacement of './elasticity' in RL_SimulationRunnerScript.py):
+#   RL_SimulationRunnerScript.HIFLOW_EXECUTABLE_SEQUENTIAL = 'python RL_StandInElasticitySimulator.py 4'
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-11}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-11"
+
+import sys
+import os
+
+import xml.etree.ElementTree as ET
+
+import vtk
+import numpy as np
+from vtk.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+
+from termcolor import colored # for colored terminal output for better overview.
+
+
+# Default resolution of the beam mesh (cells per unit length), i.e. 10*4*4 hexahedra = 3840 tetrahedra
+# (which is comparable to the 5467 cells of the Test_RLSimInput beam):
+STANDIN_MESH_RESOLUTION = 4
+
+# Time at which the full load is reached (i.e., MaxTimeStepIts*DeltaT of the Test_RLSimInput scenario):
+STANDIN_LOAD_TIME = 1.0
+
+# Geometry of the beam:
+BEAM_LENGTH = 10.0
+BEAM_WIDTH = 1.0
+
+# Splitting of a hexahedron (local vertex numbering as in vtkHexahedron) into 6 tetrahedra:
+HEX_TO_TETS = [[0, 1, 2, 6], [0, 2, 3, 6], [0, 3, 7, 6], [0, 7, 4, 6], [0, 4, 5, 6], [0, 5, 1, 6]]
+
+PVTU_TEMPLATE = '''<?xml version="1.0" ?>
+<VTKFile type="PUnstructuredGrid" version="0.1" byte_order="LittleEndian" compressor="vtkZLibDataCompressor">
+    <PUnstructuredGrid GhostLevel="0">
+        <PPointData>
+            <PDataArray Name="u0" type="Float64" format="ascii" />
+            <PDataArray Name="u1" type="Float64" format="ascii" />
+            <PDataArray Name="u2" type="Float64" format="ascii" />
+        </PPointData>
+        <PCellData Scalars="_sub_domain_">
+            <PDataArray Name="Material Id" type="Float64" format="ascii" />
+            <PDataArray Name="_remote_index_" type="Float64" format="ascii" />
+            <PDataArray Name="_sub_domain_" type="Float64" format="ascii" />
+        </PCellData>
+        <PPoints>
+            <PDataArray type="Float64" NumberOfComponents="3" />
+        </PPoints>
+        <Piece Source="%s" />
+    </PUnstructuredGrid>
+</VTKFile>
+'''
+
+
+def standin_mesh_generator(resolution=STANDIN_MESH_RESOLUTION):
+
+    # Generate the tetrahedral beam mesh with the given resolution.
+    # Returns the points (4 per cell, num_cells*4 x 3) and the number of cells.
+    resolution = int(resolution)
+    nx, ny, nz = int(BEAM_LENGTH) * resolution, resolution, resolution
+    xs = np.linspace(-0.5 * BEAM_LENGTH, 0.5 * BEAM_LENGTH, nx + 1)
+    ys = np.linspace(-0.5 * BEAM_WIDTH, 0.5 * BEAM_WIDTH, ny + 1)
+    zs = np.linspace(-0.5 * BEAM_WIDTH, 0.5 * BEAM_WIDTH, nz + 1)
+
+    # Lower-left-front corner indices of all hexahedra, and their 8 vertices:
+    i, j, k = np.meshgrid(np.arange(nx), np.arange(ny), np.arange(nz), indexing='ij')
+    i, j, k = i.ravel(), j.ravel(), k.ravel()
+    hex_offsets = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]
+    hex_vertices = np.stack([np.column_stack([xs[i + di], ys[j + dj], zs[k + dk]]) for di, dj, dk in hex_offsets], axis=1)
+
+    # Split every hexahedron into 6 tetrahedra (with separate points per cell, as in the HiFlow3 output):
+    tet_vertices = hex_vertices[:, HEX_TO_TETS, :] # num_hex x 6 x 4 x 3
+    points = tet_vertices.reshape(-1, 3)
+
+    return points, points.shape[0] // 4
+
+
+def standin_displacement_computer(points, param_lambda, param_mu, density, gravity, pressure, timefraction):
+
+    # Evaluate the closed-form displacement field (u0,u1,u2) at the given points:
+    # E and nu from the Lame parameters, bending of the beam clamped at x = -5 under
+    # gravity (uniform load) and Neumann pressure (tip load), plus lateral contraction.
+    param_lambda, param_mu = float(param_lambda), float(param_mu)
+    youngs_modulus = param_mu * (3.0 * param_lambda + 2.0 * param_mu) / (param_lambda + param_mu)
+    poisson_ratio = param_lambda / (2.0 * (param_lambda + param_mu))
+
+    s = (points[:, 0] + 0.5 * BEAM_LENGTH) / BEAM_LENGTH # in [0,1], s = 0 at the clamped end.
+    y, z = points[:, 1], points[:, 2]
+    load_gravity = float(density) * float(gravity) / youngs_modulus
+    load_pressure = float(pressure) / param_mu
+
+    # Deflection w(s) and its derivative dw/ds:
+    w = BEAM_LENGTH * (load_gravity * s**2 * (6.0 - 4.0 * s + s**2) / 8.0 + load_pressure * s**2 * (3.0 - s) / 6.0)
+    dw = BEAM_LENGTH * (load_gravity * s * (3.0 - 3.0 * s + s**2) / 2.0 + load_pressure * s * (2.0 - s) / 2.0)
+
+    u2 = w
+    u0 = -z * dw / BEAM_LENGTH
+    u1 = -poisson_ratio * y * np.abs(load_gravity + load_pressure) * (1.0 - s)
+
+    return timefraction * np.column_stack([u0, u1, u2])
+
+
+def vtk_idtype():
+
+    # Get the numpy type corresponding to vtkIdType (32 or 64 bit, depending on the VTK build):
+    if vtk.vtkIdTypeArray().GetDataTypeSize() == 4:
+        return np.int32
+    return np.int64
+
+
+def standin_vtu_writer(outputfilename, points, num_cells, displacement):
+
+    # Write one vtu piece (ascii, Float64, as HiFlow3 does):
+    grid = vtk.vtkUnstructuredGrid()
+    vtkpoints = vtk.vtkPoints()
+    vtkpoints.SetData(numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float64), deep=1))
+    grid.SetPoints(vtkpoints)
+
+    cells = np.column_stack([np.full(num_cells, 4), np.arange(4 * num_cells).reshape(-1, 4)]).ravel()
+    cellarray = vtk.vtkCellArray()
+    cellarray.SetCells(num_cells, numpy_to_vtkIdTypeArray(cells.astype(vtk_idtype()), deep=1))
+    grid.SetCells(vtk.VTK_TETRA, cellarray)
+
+    for c, name in enumerate(['u0', 'u1', 'u2']):
+        array = numpy_to_vtk(np.ascontiguousarray(displacement[:, c], dtype=np.float64), deep=1)
+        array.SetName(name)
+        grid.GetPointData().AddArray(array)
+    for name, value in [('Material Id', 10.0), ('_remote_index_', -1.0), ('_sub_domain_', 0.0)]:
+        array = numpy_to_vtk(np.full(num_cells, value, dtype=np.float64), deep=1)
+        array.SetName(name)
+        grid.GetCellData().AddArray(array)
+    grid.GetCellData().SetActiveScalars('_sub_domain_')
+
+    writer = vtk.vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(outputfilename)
+    writer.SetDataModeToAscii()
+    if vtk.vtkVersion().GetVTKMajorVersion() >= 6:
+        writer.SetInputData(grid)
+    else:
+        writer.SetInput(grid)
+    writer.Write()
+
+
+def standin_simulator(xmlinputfile, resolution=STANDIN_MESH_RESOLUTION):
+
+    # Run the stand-in simulation for the given xml-inputfile.
+    # Returns the list of the names of the written pvtu files.
+    print('=====================================')
+    print('StandInElasticitySimulator started. \n')
+
+    root = ET.parse(xmlinputfile).getroot()
+    def param(tag, default):
+        for elem in root.iter(tag):
+            return elem.text.strip()
+        return default
+
+    param_lambda = float(param('lambda', 0.0))
+    param_mu = float(param('mu', 0.0))
+    density = float(param('density', 1070.0))
+    gravity = float(param('gravity', -9.81))
+    pressure = float(param('NeumannMaterial1Pressure', 40.0))
+    refinement_level = int(param('InitialRefLevel', 0))
+    deltat = float(param('DeltaT', 0.1))
+    maxtimesteps = int(param('MaxTimeStepIts', 10))
+    vispersteps = max(int(param('VisPerXTs', 1)), 1)
+    outputprefix = param('OutputPathAndPrefix', 'SimResults/Beam')
+
+    outputdir = os.path.dirname(outputprefix)
+    if outputdir != '':
+        try:
+            os.makedirs(outputdir)
+        except:
+            pass
+
+    points, num_cells = standin_mesh_generator(int(resolution) * 2 ** refinement_level)
+    print('Stand-in beam mesh: num_cells = %s, num_points = %s.' % (num_cells, points.shape[0]))
+
+    pvtufilenames = []
+    for timestep in range(0, maxtimesteps + 1, vispersteps):
+        displacement = standin_displacement_computer(points, param_lambda, param_mu, density, gravity, pressure, min(timestep * deltat / STANDIN_LOAD_TIME, 1.0))
+
+        basename = outputprefix + '_solution_np1_RefLvl%d_Tstep.%04d' % (refinement_level, timestep)
+        standin_vtu_writer(basename + '_0.vtu', points, num_cells, displacement)
+        with open(basename + '.pvtu', 'w') as f:
+            f.write(PVTU_TEMPLATE % os.path.basename(basename + '_0.vtu'))
+        pvtufilenames.append(basename + '.pvtu')
+
+    print('StandInElasticitySimulator successfully finished.')
+
+    return pvtufilenames
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('StandInElasticitySimulator STARTED. \n', 'yellow')
+    if len(sys.argv) > 2:
+        standin_simulator(sys.argv[2], int(sys.argv[1]))
+    else:
+        standin_simulator(sys.argv[1])
+    print('\n')
+    print colored('StandInElasticitySimulator FINISHED. \n', 'yellow')
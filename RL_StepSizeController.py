@@ -0,0 +1,245 @@
+#######################################################################
+# Python script for running the calibration (Q-value steps, see RL_QvalueComputeScriptNEW.py)
+# with adaptive manipulation (epsilon) values and an optional line search, instead of
+# the fixed epsilon values (epsilon_lam = 5000, epsilon_mu = 3000):
+#
+# The script needs the following input:
+#   .. the current state's xml inputfile (i.e., the first guess of the parameter values),
+#   .. optionally, the number of parallel processes for the TestActions,
+#   .. optionally, whether to run a line search after every improving Q-value step (1, default) or not (0).
+#
+# The step-size controller
+#   .. grows the epsilon value of a parameter (by GROW_FACTOR, up to MAX_EPSILON_*) after GROW_AFTER
+#      consecutive moves in the same direction (i.e., the same action),
+#   .. shrinks both epsilon values (by SHRINK_FACTOR) when action 0 (keep the current parameter set) wins,
+#      and the calibration is converged, when both epsilon values are below MIN_EPSILON_*.
+# The line search follows the winning direction of a Q-value step with single simulations: the step
+# along the direction is expanded (by LINE_SEARCH_EXPANSION) until the RMSE-value increases, and the
+# minimum of the parabola through the bracketing points is evaluated once; the current parameter set
+# is then moved to the best evaluated point.
+#
+# The state of the controller (epsilon values, last action, number of consecutive moves, step, and the
+# xml inputfile, its first guess, its current parameter set and the run_id of the calibration) is stored
+# in RL_stepsize_state.json after every step, such that an interrupted calibration is resumed (in the same run).
+# A state file of another calibration (other xml inputfile, or a parameter set other than the one the
+# calibration stopped at) is ignored, and the state file is removed when the calibration is converged.
+#
+# The output is the following:
+#   .. the calibrated xml inputfile,
+#   .. all steps and line-search points as one run in the run history store (see RL_RunHistoryStore.py).
+#
+# To run the script, call:
+#   python RL_StepSizeController.py <xml-inputfile> [<num-parallel-processes>] [<line-search (0|1)>]
+#
+# Example:
+#   python RL_StepSizeController.py elastScen_Beam_RLalgo_TestInput_SIMDATA.xml 4 1
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-16}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-16"
+
+import sys
+import os
+import json
+
+import xml.etree.ElementTree as ET
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_QvalueComputeScriptNEW
+import RL_SimResultsCache
+import RL_RunTracer
+import RL_RunHistoryStore
+
+
+STEPSIZE_STATE_FILENAME = 'RL_stepsize_state.json'
+
+# Step-size control:
+GROW_AFTER = 2
+GROW_FACTOR = 2.0
+SHRINK_FACTOR = 0.5
+MIN_EPSILON_LAM = 500.0
+MIN_EPSILON_MU = 300.0
+MAX_EPSILON_LAM = 80000.0
+MAX_EPSILON_MU = 48000.0
+
+# Line search (steps along the winning direction in multiples of its epsilon value: 1, 3, 7, 15, ...):
+LINE_SEARCH_EXPANSION = 2.0
+LINE_SEARCH_MAX_EXPANSIONS = 6
+
+# Parameter (xml tag) and direction (sign) of the actions 1, 2, 3, 4:
+ACTION_DIRECTIONS = {1: ('lambda', 1.0), 2: ('lambda', -1.0), 3: ('mu', 1.0), 4: ('mu', -1.0)}
+
+
+def stepsize_state_loader(xmlinputfile, filename=STEPSIZE_STATE_FILENAME):
+
+    # Load the state of the controller for the calibration of the xml-inputfile (the initial state with the
+    # parameter set of the xml-inputfile as first guess, if there is no state file of this calibration):
+    param_lambda, param_mu = parameters_reader(xmlinputfile)
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            state = json.load(f)
+        if state.get('xml') == os.path.abspath(xmlinputfile) and state.get('parameters') == [param_lambda, param_mu]:
+            return state
+        print colored('Ignoring the state file %s (of another calibration: %s, parameter set %s).\n' % (filename, state.get('xml'), state.get('parameters')), 'red')
+    return {'epsilon_lam': RL_QvalueComputeScriptNEW.EPSILON_LAM, 'epsilon_mu': RL_QvalueComputeScriptNEW.EPSILON_MU,
+            'last_action': -1, 'streak': 0, 'step': 0, 'xml': os.path.abspath(xmlinputfile),
+            'first_guess': [param_lambda, param_mu], 'parameters': [param_lambda, param_mu], 'run_id': None}
+
+
+def stepsize_state_writer(state, filename=STEPSIZE_STATE_FILENAME):
+
+    # Store the state of the controller (via a temporary file, such that the state file is never incomplete):
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.rename(filename + '.tmp', filename)
+
+
+def stepsize_updater(state, action_number):
+
+    # Update the epsilon values of the state according to the chosen action (see above):
+    if action_number == 0:
+        state['epsilon_lam'] *= SHRINK_FACTOR
+        state['epsilon_mu'] *= SHRINK_FACTOR
+        state['streak'] = 0
+    else:
+        state['streak'] = state['streak'] + 1 if action_number == state['last_action'] else 1
+        if state['streak'] >= GROW_AFTER:
+            if ACTION_DIRECTIONS[action_number][0] == 'lambda':
+                state['epsilon_lam'] = min(state['epsilon_lam'] * GROW_FACTOR, MAX_EPSILON_LAM)
+            else:
+                state['epsilon_mu'] = min(state['epsilon_mu'] * GROW_FACTOR, MAX_EPSILON_MU)
+            state['streak'] = 0
+    state['last_action'] = action_number
+    return state
+
+
+def stepsize_converged(state):
+
+    # The calibration is converged, when both epsilon values are below their minimum:
+    return state['epsilon_lam'] < MIN_EPSILON_LAM and state['epsilon_mu'] < MIN_EPSILON_MU
+
+
+def parameters_reader(xmlinputfile):
+
+    # Get the parameter set (lambda, mu) of the xml-inputfile:
+    root = ET.parse(xmlinputfile).getroot()
+    return [float(param.text) for param in root.iter('lambda')][0], [float(param.text) for param in root.iter('mu')][0]
+
+
+def parameters_writer(xmlinputfile, param_lambda, param_mu):
+
+    # Set the parameter set (lambda, mu) of the xml-inputfile:
+    tree = ET.parse(xmlinputfile)
+    for para_lam in tree.getroot().iter('lambda'):
+        para_lam.text = str(param_lambda)
+    for para_mu in tree.getroot().iter('mu'):
+        para_mu.text = str(param_mu)
+    tree.write(xmlinputfile)
+
+
+def line_search_runner(xmlinputfile, action_number, epsilon, rmse_before, rmse_after, stepnum, cachedir=RL_SimResultsCache.CACHE_DIR, run_id=None):
+
+    # Line search along the direction of the winning action of the Q-value step, which moved the parameter set
+    # of the xml-inputfile by epsilon (from RMSE-value rmse_before to rmse_after). The points are given by their
+    # step t along the direction (in multiples of epsilon, t = 0: the parameter set before the Q-value step).
+    # Moves the parameter set of the xml-inputfile to the best evaluated point, and returns its step t.
+    tag, sign = ACTION_DIRECTIONS[action_number]
+    param_lambda, param_mu = parameters_reader(xmlinputfile)
+    if tag == 'lambda':
+        origin = (param_lambda - sign * epsilon, param_mu)
+    else:
+        origin = (param_lambda, param_mu - sign * epsilon)
+
+    def point(t):
+        if tag == 'lambda':
+            return origin[0] + sign * t * epsilon, origin[1]
+        return origin[0], origin[1] + sign * t * epsilon
+
+    def evaluate(t):
+        rmse_value = RL_QvalueComputeScriptNEW.candidate_evaluator(xmlinputfile, point(t)[0], point(t)[1], stepnum, cachedir, run_id)
+        return float('inf') if rmse_value is None else rmse_value
+
+    # 1.) Expand the step until the RMSE-value increases, i.e., until the minimum is bracketed by (ts[-3], ts[-1]):
+    ts, fs = [0.0, 1.0], [rmse_before, rmse_after]
+    bracketed = False
+    with RL_RunTracer.trace_span('line_search', step=stepnum, action=action_number):
+        for expansion in range(LINE_SEARCH_MAX_EXPANSIONS):
+            ts.append(ts[-1] + LINE_SEARCH_EXPANSION * (ts[-1] - ts[-2]))
+            fs.append(evaluate(ts[-1]))
+            if fs[-1] >= fs[-2]:
+                bracketed = True
+                break
+
+        # 2.) Evaluate the minimum of the parabola through the three bracketing points (once):
+        if bracketed and fs[-1] != float('inf'):
+            (t0, t1, t2), (f0, f1, f2) = ts[-3:], fs[-3:]
+            denominator = (t1 - t0) * (f1 - f2) - (t1 - t2) * (f1 - f0)
+            if denominator != 0.0:
+                t = t1 - 0.5 * ((t1 - t0) ** 2 * (f1 - f2) - (t1 - t2) ** 2 * (f1 - f0)) / denominator
+                if t0 < t < t2 and min(abs(t - t0), abs(t - t1), abs(t - t2)) > 0.25:
+                    ts.append(t)
+                    fs.append(evaluate(t))
+
+    best = min(range(len(ts)), key=lambda k: fs[k])
+    print colored('Line search in Step %s along ActionNumber %s: %s simulations, best step %s * epsilon (RMSE value: %s).\n' % (stepnum, action_number, len(ts) - 2, ts[best], fs[best]), 'green')
+    parameters_writer(xmlinputfile, point(ts[best])[0], point(ts[best])[1])
+    return ts[best]
+
+
+def controller_runner(xmlinputfile, numworkers=1, line_search=True, run_id=None, screening=None, cachedir=RL_SimResultsCache.CACHE_DIR, statefile=STEPSIZE_STATE_FILENAME):
+
+    # Run Q-value steps with the epsilon values of the controller (and the line search, if enabled), until converged.
+    # An interrupted calibration is resumed in its run (unless run_id is given). Returns the final state of the controller.
+    state = stepsize_state_loader(xmlinputfile, statefile)
+    if run_id is None and state['run_id'] is not None:
+        run_id = RL_RunHistoryStore.history_run_resumer(state['run_id'])
+        print colored('Resuming the calibration of %s (run %s) after step %s.\n' % (xmlinputfile, run_id, state['step']), 'yellow')
+    elif run_id is None:
+        run_id = RL_RunHistoryStore.history_run_starter('RL_StepSizeController', xmlinputfile)
+    state['run_id'] = run_id
+
+    while not stepsize_converged(state):
+        state['step'] += 1
+        step = state['step']
+        with RL_RunTracer.trace_context(step=str(step)), RL_RunTracer.trace_span('qvalue_step'):
+            action_number_out = RL_QvalueComputeScriptNEW.qvalue_computer(xmlinputfile, str(step), numworkers, cachedir, run_id=run_id, screening=screening,
+                                                                          epsilon_lam=state['epsilon_lam'], epsilon_mu=state['epsilon_mu'])
+
+            if line_search and action_number_out != 0:
+                candidates = RL_RunHistoryStore.history_candidates_loader(run_id, step)
+                rmse_values = dict((int(c['action']), float(c['rmse'])) for c in candidates if c['fidelity'] == 0 and c['rmse'] == c['rmse'])
+                if 0 in rmse_values and action_number_out in rmse_values:
+                    epsilon = state['epsilon_lam'] if ACTION_DIRECTIONS[action_number_out][0] == 'lambda' else state['epsilon_mu']
+                    t = line_search_runner(xmlinputfile, action_number_out, epsilon, rmse_values[0], rmse_values[action_number_out], step, cachedir, run_id)
+                    if t != 1.0:
+                        param_lambda, param_mu = parameters_reader(xmlinputfile)
+                        RL_RunHistoryStore.history_step_recorder(run_id, step, RL_QvalueComputeScriptNEW.LINE_SEARCH_ACTION, param_lambda, param_mu)
+
+        stepsize_updater(state, action_number_out)
+        state['parameters'] = list(parameters_reader(xmlinputfile))
+        stepsize_state_writer(state, statefile)
+        print colored('Step %s: ActionNumber %s, next epsilon_lam = %s, epsilon_mu = %s.\n' % (step, action_number_out, state['epsilon_lam'], state['epsilon_mu']), 'green')
+
+    if os.path.exists(statefile):
+        os.remove(statefile)
+    return state
+
+
+def main(xmlinputfile, numworkers=1, line_search=1):
+
+    state = controller_runner(xmlinputfile, int(numworkers), bool(int(line_search)))
+    print('Converged after %s steps: epsilon_lam = %s, epsilon_mu = %s.' % (state['step'], state['epsilon_lam'], state['epsilon_mu']))
+    RL_RunHistoryStore.history_summary(state['run_id'])
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('StepSizeController STARTED. \n', 'yellow')
+    main(*sys.argv[1:])
+    print('\n')
+    print colored('StepSizeController FINISHED. \n', 'yellow')
@@ -0,0 +1,206 @@
+#######################################################################
+# Python script providing an online surrogate model (Gaussian process) of the RMSE-value
+# as function of the parameters (lambda, mu), fitted on all simulated candidates of all runs
+# in the run history store (see RL_RunHistoryStore.py), for pre-screening the TestActions
+# of a Q-value step (see RL_QvalueComputeScriptNEW.py):
+#
+# There is one surrogate model per RMSE-value surface, i.e., per sha1-checksum of the real data and per
+# simulation configuration (see RL_SimResultsCache.simresults_config_key: the xml-inputfile without lambda and mu,
+# incl. refinement level, overrides and simulated timestep of the coarse-to-fine schedule levels); it is fitted
+# only on the full-fidelity candidates with the same keys (candidates of former stores, without keys, are not used;
+# the candidates of the coarse schedule levels have their own fidelity, see RL_RunHistoryStore.coarse_level_fidelity).
+# The models are shared by the concurrent calibrations in threads of one process (see RL_MultiStartCalibrator.py).
+#
+# The Gaussian process models the squared RMSE-value (i.e., the mean squared error of the deformed coords,
+# which, unlike the RMSE-value or its logarithm, is smooth at the minimum) with a constant mean and a
+# squared-exponential kernel (length scales in units of the default epsilon values); its hyperparameters are fitted by maximizing
+# the marginal likelihood over a grid of length scales. New candidates of the store are added
+# incrementally (update of the inverse kernel matrix via its Schur complement, O(n^2) per candidate),
+# and the hyperparameters are refitted, when the number of candidates has grown by SURROGATE_REFIT_GROWTH
+# (on the most recent SURROGATE_MAX_POINTS candidates).
+#
+# A TestAction is skipped (i.e., not simulated), if it confidently loses, i.e., if the lower confidence
+# bound (mean - SURROGATE_CONFIDENCE * std) of its predicted squared RMSE-value is above the best known
+# squared RMSE-value (of the cached TestActions) and above the upper confidence bound of all other TestActions.
+# Only the predictions of TestActions close to the simulated candidates are trusted, i.e., whose std is below
+# SURROGATE_TRUST_RATIO times the prior std (far from the data, the prediction falls back to the mean of all
+# candidates); the other TestActions are never skipped, and their upper confidence bounds are not used.
+# The surrogate is used only, if it has been fitted on at least SURROGATE_MIN_POINTS candidates.
+#
+# To print the surrogate's prediction (and its std) for a parameter set, call:
+#   python RL_SurrogateModel.py <lambda> <mu> [<path-to-history-store>]
+# (the surrogate model of the real data and configuration of the most recently recorded candidate)
+#
+# Example:
+#   python RL_SurrogateModel.py 140000 50000
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-17}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-17"
+
+import sys
+import os
+import itertools
+import threading
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import RL_RunHistoryStore
+
+
+SURROGATE_MIN_POINTS = 10
+SURROGATE_MAX_POINTS = 1000
+SURROGATE_REFIT_GROWTH = 2.0
+SURROGATE_CONFIDENCE = 3.0
+SURROGATE_TRUST_RATIO = 0.5
+
+# Scales of the parameters (i.e., the default epsilon values), the candidate length scales (in units of these scales),
+# and the noise variance (relative to the signal variance):
+SURROGATE_PARAMETER_SCALES = np.array([5000.0, 3000.0])
+SURROGATE_LENGTH_SCALES = [1.0, 2.0, 4.0, 8.0, 16.0, 32.0]
+SURROGATE_NOISE = 1e-4
+
+# Surrogate models, which have already been fitted in this process (per history store, real data and configuration),
+# and the lock guarding them (against the concurrent calibrations in other threads):
+_surrogate_models = {}
+_surrogate_models_lock = threading.Lock()
+
+
+def surrogate_training_data(realdata_sha1, config, after_rowid=0, dbfile=RL_RunHistoryStore.HISTORY_DB_FILENAME):
+
+    # Get the simulated (full-fidelity, not penalized, not gravity-varied) candidates of the store with the given 
+    # real data checksum and configuration key, which were recorded after the given rowid.
+    # Returns the rowids, the scaled parameters (n x 2) and the squared RMSE-values (n).
+    rows = RL_RunHistoryStore.history_connection(dbfile).execute(
+        'SELECT rowid, lambda, mu, rmse FROM candidates WHERE realdata_sha1 = ? AND config = ? AND rowid > ? AND penalized = 0 AND fidelity = 0 '
+        'AND gravity IS NULL AND rmse IS NOT NULL ORDER BY rowid', (realdata_sha1, config, int(after_rowid))).fetchall()
+    data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    return data[:, 0].astype(np.int64), data[:, 1:3] / SURROGATE_PARAMETER_SCALES, data[:, 3] ** 2
+
+
+def kernel_matrix(X1, X2, lengthscales, variance):
+
+    # Squared-exponential kernel matrix (len(X1) x len(X2)):
+    d = (X1[:, None, :] - X2[None, :, :]) / lengthscales
+    return variance * np.exp(-0.5 * (d ** 2).sum(axis=2))
+
+
+def surrogate_fitter(X, y, lengthscale_grid=SURROGATE_LENGTH_SCALES):
+
+    # Fit the Gaussian process on the scaled parameters X (n x dim) and the values y (n, here: the squared RMSE-values),
+    # choosing the length scales (per dimension, out of lengthscale_grid) with the largest marginal likelihood.
+    # Returns the model (dict).
+    mean = y.mean()
+    variance = max(y.var(), 1e-30)
+    noise = SURROGATE_NOISE * variance
+    best = None
+    for lengthscales in itertools.product(lengthscale_grid, repeat=X.shape[1]):
+        lengthscales = np.array(lengthscales)
+        K = kernel_matrix(X, X, lengthscales, variance) + noise * np.eye(len(X))
+        try:
+            L = np.linalg.cholesky(K)
+        except np.linalg.LinAlgError:
+            continue
+        z = np.linalg.solve(L, y - mean)
+        loglikelihood = -0.5 * np.dot(z, z) - np.log(np.diag(L)).sum()
+        if best is None or loglikelihood > best[0]:
+            best = (loglikelihood, lengthscales, K)
+    loglikelihood, lengthscales, K = best
+    return {'X': X, 'y': y, 'mean': mean, 'variance': variance, 'noise': noise, 'lengthscales': lengthscales,
+            'Kinv': np.linalg.inv(K), 'fitted_size': len(X), 'last_rowid': 0}
+
+
+def surrogate_point_adder(model, x, y):
+
+    # Add one candidate (scaled parameters x, squared RMSE-value y) to the model without refitting its hyperparameters,
+    # i.e., extend the inverse kernel matrix by the Schur complement of the new row/column:
+    k = kernel_matrix(model['X'], x[None, :], model['lengthscales'], model['variance'])[:, 0]
+    Kinv_k = np.dot(model['Kinv'], k)
+    schur = model['variance'] + model['noise'] - np.dot(k, Kinv_k)
+    n = len(model['X'])
+    Kinv = np.empty((n + 1, n + 1))
+    Kinv[:n, :n] = model['Kinv'] + np.outer(Kinv_k, Kinv_k) / schur
+    Kinv[:n, n] = Kinv[n, :n] = -Kinv_k / schur
+    Kinv[n, n] = 1.0 / schur
+    model['Kinv'] = Kinv
+    model['X'] = np.vstack([model['X'], x])
+    model['y'] = np.append(model['y'], y)
+    return model
+
+
+def surrogate_model_loader(realdata_sha1, config, dbfile=RL_RunHistoryStore.HISTORY_DB_FILENAME):
+
+    # Get the surrogate model of the real data checksum and configuration key, updated with the candidates recorded since the last call
+    # (None, if the store holds less than SURROGATE_MIN_POINTS simulated candidates with these keys).
+    # (the returned model is not modified afterwards, updates replace it by an updated copy)
+    key = (os.getpid(), os.path.abspath(dbfile), realdata_sha1, config)
+    with _surrogate_models_lock:
+        model = _surrogate_models.get(key)
+        rowids, X, y = surrogate_training_data(realdata_sha1, config, model['last_rowid'] if model is not None else 0, dbfile)
+        if model is not None and len(rowids) == 0:
+            return model
+
+        if model is None or len(model['X']) + len(X) >= SURROGATE_REFIT_GROWTH * model['fitted_size']:
+            # (re)fit on the most recent candidates:
+            if model is not None:
+                X, y = np.vstack([model['X'], X]), np.append(model['y'], y)
+            if len(X) < SURROGATE_MIN_POINTS:
+                return None
+            model = surrogate_fitter(X[-SURROGATE_MAX_POINTS:], y[-SURROGATE_MAX_POINTS:])
+        else:
+            model = dict(model)
+            for x_new, y_new in zip(X, y):
+                if not (model['X'] == x_new).all(axis=1).any(): # (candidates evaluated before, e.g. cache hits of other runs, add no information)
+                    surrogate_point_adder(model, x_new, y_new)
+
+        if len(rowids) > 0:
+            model['last_rowid'] = int(rowids[-1])
+        _surrogate_models[key] = model
+    return model
+
+
+def surrogate_predictor(model, params, scales=SURROGATE_PARAMETER_SCALES):
+
+    # Predict the modelled values (here: squared RMSE-values) of the parameter sets params (list of (lambda, mu),
+    # scaled by scales). Returns their means and stds:
+    Xstar = np.array(params, dtype=np.float64).reshape(len(params), -1) / scales
+    kstar = kernel_matrix(Xstar, model['X'], model['lengthscales'], model['variance'])
+    mean = model['mean'] + np.dot(kstar, np.dot(model['Kinv'], model['y'] - model['mean']))
+    variance = model['variance'] - (np.dot(kstar, model['Kinv']) * kstar).sum(axis=1)
+    return mean, np.sqrt(np.maximum(variance, 0.0))
+
+
+def surrogate_screener(model, candidate_params, known_rmse_values, confidence=SURROGATE_CONFIDENCE):
+
+    # Decide which candidates (dict action_number: (lambda, mu)) confidently lose against the best known RMSE-value
+    # (e.g. of the cached candidates) and the upper confidence bounds of the other (trusted) candidates.
+    # Returns the list of the skipped action_numbers, and the predicted RMSE-values (dict action_number: rmse).
+    action_numbers = sorted(candidate_params)
+    mean, std = surrogate_predictor(model, [candidate_params[action_number] for action_number in action_numbers])
+    trusted = std <= SURROGATE_TRUST_RATIO * np.sqrt(model['variance'])
+    upper, lower = mean + confidence * std, mean - confidence * std
+    threshold = min(list(upper[trusted]) + [rmse_value ** 2 for rmse_value in known_rmse_values] + [float('inf')])
+    skipped = [action_number for k, action_number in enumerate(action_numbers) if trusted[k] and lower[k] > threshold]
+    return skipped, dict((action_number, float(np.sqrt(max(mean[k], 0.0)))) for k, action_number in enumerate(action_numbers))
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('SurrogateModel STARTED. \n', 'yellow')
+    dbfile = sys.argv[3] if len(sys.argv) > 3 else RL_RunHistoryStore.HISTORY_DB_FILENAME
+    keys = RL_RunHistoryStore.history_connection(dbfile).execute(
+        'SELECT realdata_sha1, config FROM candidates WHERE realdata_sha1 IS NOT NULL AND config IS NOT NULL ORDER BY rowid DESC LIMIT 1').fetchone()
+    model = surrogate_model_loader(keys[0], keys[1], dbfile) if keys is not None else None
+    if model is None:
+        print('Less than %s simulated candidates of the same real data and configuration in the run history store.' % SURROGATE_MIN_POINTS)
+    else:
+        mean, std = surrogate_predictor(model, [(float(sys.argv[1]), float(sys.argv[2]))])
+        print('Surrogate model (%s candidates, length scales %s): predicted RMSE value %s (std of its square %s).' % (len(model['X']), model['lengthscales'] * SURROGATE_PARAMETER_SCALES, np.sqrt(max(mean[0], 0.0)), std[0]))
+    print('\n')
+    print colored('SurrogateModel FINISHED. \n', 'yellow')
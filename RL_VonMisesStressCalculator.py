@@ -0,0 +1,61 @@
+#######################################################################
+# Python script for computing the von Mises stress distribution
+# from a given strain tensor field with numpy (vectorized over all cells),
+# for one or for many material parameter sets (lambda, mu) at once:
+#
+# The script needs the following input:
+#  - the strain tensor per cell as numpy-array (num_cells x 9), i.e., the 'Strain'
+#    CellData array as computed by vtkCellDerivatives (SetTensorModeToComputeStrain),
+#  - the material parameters lambda and mu (scalars, or arrays of num_paramsets values).
+#
+# For a linear elastic (St. Venant-Kirchhoff) material, the stress tensor reads
+#   sigma = 2*mu*eps + lambda*tr(eps)*Id,
+# and the von Mises stress (as in RL_Pvtu2vtuConverterAndVMStressCalculator.py) reads
+#   sqrt( s_00^2 + s_11^2 + s_22^2 - s_00*s_11 - s_00*s_22 - s_11*s_22 + 3*(s_10^2 + s_20^2 + s_21^2) ).
+# Since the lambda*tr(eps) term cancels out in the differences of the diagonal entries, this equals
+#   2*mu * sqrt( 1/2*((e_00-e_11)^2 + (e_11-e_22)^2 + (e_22-e_00)^2) + 3*(e_10^2 + e_20^2 + e_21^2) ),
+# i.e., the strain-dependent part is computed once and then scaled for every parameter set.
+#
+# The output is the following:
+#  - the von Mises stress per cell (num_cells), or per cell and parameter set (num_cells x num_paramsets).
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-10}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-10"
+
+import numpy as np
+
+
+def strain_invariant_computer(strain):
+
+    # Compute the strain-dependent part of the von Mises stress for all cells:
+    # (the components of the strain tensor are stored row-wise, i.e. Strain_0 = e_00, Strain_4 = e_11, Strain_8 = e_22,
+    # and Strain_3 = e_10, Strain_6 = e_20, Strain_7 = e_21)
+    strain = np.asarray(strain, dtype=np.float64)
+    e_00, e_11, e_22 = strain[:, 0], strain[:, 4], strain[:, 8]
+    e_10, e_20, e_21 = strain[:, 3], strain[:, 6], strain[:, 7]
+
+    return np.sqrt( 0.5 * ((e_00 - e_11)**2 + (e_11 - e_22)**2 + (e_22 - e_00)**2) + 3.0 * (e_10**2 + e_20**2 + e_21**2) )
+
+
+def vonmises_stress_computer(strain, param_lambda, param_mu):
+
+    # Compute the von Mises stress for all cells (num_cells) for one material parameter set (lambda, mu):
+    # (lambda does not enter the von Mises stress, see above, but is kept for the interface)
+    return 2.0 * float(param_mu) * strain_invariant_computer(strain)
+
+
+def vonmises_stress_batched(strain, params_lambda, params_mu):
+
+    # Compute the von Mises stress for all cells and for many material parameter sets (lambda_k, mu_k)
+    # in one pass over the strain field. Returns a numpy-array (num_cells x num_paramsets).
+    params_lambda = np.atleast_1d(np.asarray(params_lambda, dtype=np.float64))
+    params_mu = np.atleast_1d(np.asarray(params_mu, dtype=np.float64))
+    if params_lambda.shape != params_mu.shape:
+        raise ValueError('params_lambda and params_mu must have the same number of values.')
+
+    return np.outer(strain_invariant_computer(strain), 2.0 * params_mu)
@@ -11,7 +11,10 @@
 #   .. the following scenario's xml-file with the newly specified/manipulated parameters: ...
 # 
 # To run the script, call:
-#   python ActionSelectorAndSimSetupper.py <previous-xml-inputfile>
+#   python ActionSelectorAndSimSetupper.py <previous-xml-inputfile> <step-number> [<seed>]
+# 
+# If a <seed> is given (e.g. one per walker of an ensemble, see TrainingDataSetCreatorScript.py), 
+# the random action of every step is reproducible and independent of the other seeds' actions.
 # 
 # Example:
 #   python ActionSelectorAndSimSetupper.py elastScen_Beam_ActionSelector_TestInput.xml
@@ -27,7 +30,7 @@ __date__ = "2017-07-31"
 import sys
 import os
 import xml.etree.ElementTree as ET
-from random import randint
+from random import randint, seed
 
 
 print('=====================================')
@@ -35,6 +38,9 @@ print('ActionSelectorAndSimSetupper started. \n')
 
 infilenamestring = sys.argv[1] # 'elastScen_BeamQuader_DirAndNeumBC.xml'
 stepnum = sys.argv[2]
+if len(sys.argv) > 3:
+    # (the script runs once per step, hence seed with both the given seed and the step number)
+    seed(int(sys.argv[3]) * 1000003 + int(stepnum))
 #param_lambda = sys.argv[1]
 #param_mu = sys.argv[2]
 #step = sys.argv[3]
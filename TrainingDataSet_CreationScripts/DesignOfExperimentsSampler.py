@@ -0,0 +1,251 @@
+#######################################################################
+# Python script for creating a training data set by means of a space-filling design of
+# experiments (Latin hypercube or Sobol sequence) over the parameter space (lambda, mu, gravity),
+# instead of the random walk of ActionSelectorAndSimSetupper.py:
+#
+# The script needs the following input:
+#   .. the design type: 'lhs' (Latin hypercube) or 'sobol' (Sobol sequence),
+#   .. the number of design points (i.e., of simulations),
+#   .. optionally, the number of simulations run concurrently (default: 1),
+#   .. optionally, a JSON file with the parameter bounds, e.g. {"lambda": [50000, 300000], ...}
+#      (default: PARAMETER_BOUNDS; '' for the default), and the seed of the Latin hypercube (default: 0).
+#
+# Using the data specified above, the script generates the design (scaled to the bounds), writes one
+# xml-inputfile per design point (from the template xml-inputfile, with its own output directory
+# 'DoE_SimResults/NNNN/') in bulk, schedules the simulations of all design points on a bounded process
+# pool, and appends the results to the shared-topology training data set (see SharedTopologyDataSet.py),
+# with the design point number as step (and DESIGN_WALKER as walker). Design points which are already
+# contained in the data set are skipped, i.e., an interrupted design is resumed by calling the script again
+# (with the same design type, number of design points, bounds and seed; the script refuses to resume
+# a design with other design parameters than the ones stored in DoE_design.json).
+#
+# The output is the following:
+#   .. DoE_design.json: the design parameters (type, number of design points, bounds, seed),
+#   .. DoE_design.csv: the design points (number, lambda, mu, gravity),
+#   .. DoE_Input/elastScen_Beam_DoE_NNNN.xml: the xml-inputfiles of the design points,
+#   .. the training data set 'TrainingDataSet_<mesh>/' (see SharedTopologyDataSet.py).
+#
+# To run the script, call:
+#   python DesignOfExperimentsSampler.py <lhs|sobol> <num-design-points> [<num-parallel-processes>] [<bounds-json-file>] [<seed>]
+#
+# Example:
+#   python DesignOfExperimentsSampler.py sobol 256 8
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-15}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-15"
+
+import sys
+import os
+import json
+import subprocess
+import multiprocessing
+
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import SampleStore
+import SharedTopologyDataSet
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_XML_FILENAME = 'elastScen_Beam_ActionSelector_Input.xml'
+DESIGN_FILENAME = 'DoE_design.csv'
+DESIGN_PARAMETERS_FILENAME = 'DoE_design.json'
+DESIGN_XML_DIR = 'DoE_Input/'
+DESIGN_XML_FILENAME = 'elastScen_Beam_DoE_%04d.xml'
+DESIGN_SIMRESULTS_DIR = 'DoE_SimResults/%04d/'
+DESIGN_PVTU_FILENAME = 'Beam_solution_np1_RefLvl0_Tstep.0010.pvtu'
+
+# Walker (index field of the training data set) of the design points, which distinguishes them from the samples
+# of the random walks (walkers 0, 1, ..., see TrainingDataSetCreatorScript.py):
+DESIGN_WALKER = -1
+
+# Parameters (xml tags) and their default bounds:
+PARAMETER_NAMES = ['lambda', 'mu', 'gravity']
+PARAMETER_BOUNDS = {'lambda': [50000.0, 300000.0], 'mu': [20000.0, 150000.0], 'gravity': [-9.81, -1.0]}
+
+# Sobol direction numbers (Joe and Kuo, new-joe-kuo-6.21201) of the dimensions 2, 3, ...: (s, a, [m_1, ..., m_s]).
+SOBOL_DIRECTIONS = [(1, 0, [1]), (2, 1, [1, 3]), (3, 1, [1, 3, 1]), (3, 2, [1, 1, 1]), (4, 1, [1, 1, 3, 3]), (4, 4, [1, 3, 5, 13])]
+SOBOL_BITS = 30
+
+
+def latin_hypercube_design(numpoints, dim, seed=0):
+
+    # Latin hypercube design in [0,1)^dim: every dimension is divided into numpoints strata,
+    # and every stratum contains exactly one (randomly placed) design point.
+    # (seed: the seed of the random numbers, or the numpy RandomState to draw them from, e.g. of RL_BayesianOptimizationCalibrator.py)
+    rng = seed if isinstance(seed, np.random.RandomState) else np.random.RandomState(seed)
+    design = np.empty((numpoints, dim))
+    for d in range(dim):
+        design[:, d] = (rng.permutation(numpoints) + rng.uniform(size=numpoints)) / numpoints
+    return design
+
+
+def sobol_design(numpoints, dim):
+
+    # First numpoints points of the Sobol sequence in [0,1)^dim (gray code construction):
+    if dim > len(SOBOL_DIRECTIONS) + 1:
+        raise ValueError('The Sobol design supports at most %s dimensions.' % (len(SOBOL_DIRECTIONS) + 1))
+    directions = np.zeros((dim, SOBOL_BITS), dtype=np.int64)
+    directions[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    for d in range(1, dim):
+        s, a, m = SOBOL_DIRECTIONS[d - 1]
+        v = [m[k] << (SOBOL_BITS - 1 - k) for k in range(s)]
+        for k in range(s, SOBOL_BITS):
+            value = v[k - s] ^ (v[k - s] >> s)
+            for j in range(1, s):
+                value ^= ((a >> (s - 1 - j)) & 1) * v[k - j]
+            v.append(value)
+        directions[d] = v
+
+    design = np.zeros((numpoints, dim))
+    x = np.zeros(dim, dtype=np.int64)
+    for i in range(1, numpoints):
+        # the index of the lowest zero bit of i-1 selects the direction number:
+        c, n = 0, i - 1
+        while n & 1:
+            n >>= 1
+            c += 1
+        x ^= directions[:, c]
+        design[i] = x / float(1 << SOBOL_BITS)
+    return design
+
+
+def design_scaler(design, bounds):
+
+    # Scale the design from [0,1)^dim to the parameter bounds (in the order of PARAMETER_NAMES):
+    lower = np.array([bounds[name][0] for name in PARAMETER_NAMES])
+    upper = np.array([bounds[name][1] for name in PARAMETER_NAMES])
+    return lower + design * (upper - lower)
+
+
+def design_xml_writer(templatefilename, parameters):
+
+    # Write the xml-inputfiles of all design points (rows of parameters), each with its own output directory.
+    # Returns the list of the xml-inputfile names.
+    try:
+        os.makedirs(DESIGN_XML_DIR)
+    except:
+        pass
+    tree = ET.parse(templatefilename)
+    root = tree.getroot()
+    xmlfilenames = []
+    for point, values in enumerate(parameters):
+        for name, value in zip(PARAMETER_NAMES, values):
+            for elem in root.iter(name):
+                elem.text = str(value)
+        for elem in root.iter('OutputPathAndPrefix'):
+            elem.text = DESIGN_SIMRESULTS_DIR % point + os.path.basename(elem.text)
+        xmlfilename = DESIGN_XML_DIR + DESIGN_XML_FILENAME % point
+        tree.write(xmlfilename)
+        xmlfilenames.append(xmlfilename)
+    return xmlfilenames
+
+
+def design_point_simulator(design_job):
+
+    # Run the simulation of one design point (in a worker process of the process pool). Returns (point, exit status).
+    point, xmlfilename = design_job
+    try:
+        os.makedirs(DESIGN_SIMRESULTS_DIR % point)
+    except:
+        pass
+    cmdForSimulationRunner = 'python %s 1 %s' % (os.path.join(SCRIPT_DIR, 'SimulationRunner.py'), xmlfilename)
+    return point, subprocess.call(cmdForSimulationRunner, shell=True)
+
+
+def design_points_done(datasetdir):
+
+    # Get the (set of the) design points, which are already contained in the training data set:
+    samplesdir = os.path.join(datasetdir, SharedTopologyDataSet.SAMPLES_DIR)
+    if not os.path.exists(os.path.join(samplesdir, SampleStore.META_FILENAME)):
+        return set()
+    index = SampleStore.sample_store_index(samplesdir)
+    return set(int(step) for step in index['step'][index['walker'] == DESIGN_WALKER])
+
+
+def design_parameters_checker(design_parameters, datasetdir, filename=DESIGN_PARAMETERS_FILENAME):
+
+    # Check that the design points, which are already contained in the training data set, belong to a design with
+    # the same design parameters (dict with type, numpoints, bounds, seed), i.e., that the design is resumed, and store
+    # the design parameters. Raises ValueError, if the data set contains the design points of another design.
+    if len(design_points_done(datasetdir)) > 0:
+        stored_parameters = None
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                stored_parameters = json.load(f)
+        if stored_parameters != design_parameters:
+            raise ValueError('The data set %s contains the design points of another design (%s, requested: %s); '
+                             'resume that design, or use another data set (working directory).' % (datasetdir, stored_parameters, design_parameters))
+    with open(filename, 'w') as f:
+        json.dump(design_parameters, f, indent=1, sort_keys=True)
+
+
+def design_scheduler(xmlfilenames, numworkers=1):
+
+    # Simulate all design points, which are not yet contained in the training data set, on a bounded process pool,
+    # and append every finished simulation to the data set (in this process, i.e., one writer only).
+    datasetdir = SharedTopologyDataSet.dataset_dir_of_scenario(xmlfilenames[0])
+    done = design_points_done(datasetdir)
+    design_jobs = [(point, xmlfilename) for point, xmlfilename in enumerate(xmlfilenames) if point not in done]
+    print colored('Simulating %s design points (%s already in %s) on %s parallel processes.\n' % (len(design_jobs), len(xmlfilenames) - len(design_jobs), datasetdir, numworkers), 'yellow')
+
+    failed = []
+    pool = multiprocessing.Pool(processes=max(1, int(numworkers)))
+    try:
+        for point, exit_status in pool.imap_unordered(design_point_simulator, design_jobs):
+            if exit_status != 0:
+                print colored('The simulation of design point %s FAILED (exit status %s).' % (point, exit_status), 'red')
+                failed.append(point)
+                continue
+            SharedTopologyDataSet.dataset_sample_appender(DESIGN_SIMRESULTS_DIR % point + DESIGN_PVTU_FILENAME, xmlfilenames[point], point, datasetdir, DESIGN_WALKER)
+            print colored('Design point %s simulated and stored in %s.' % (point, datasetdir), 'green')
+    finally:
+        pool.close()
+        pool.join()
+    return failed
+
+
+def main(designtype, numpoints, numworkers=1, boundsfilename=None, seed=0):
+
+    bounds = dict(PARAMETER_BOUNDS)
+    if boundsfilename:
+        with open(boundsfilename, 'r') as f:
+            bounds.update(json.load(f))
+
+    if designtype == 'lhs':
+        design = latin_hypercube_design(int(numpoints), len(PARAMETER_NAMES), int(seed))
+    elif designtype == 'sobol':
+        design = sobol_design(int(numpoints), len(PARAMETER_NAMES))
+    else:
+        raise ValueError("Unknown design type '%s' (use 'lhs' or 'sobol')." % designtype)
+    parameters = design_scaler(design, bounds)
+
+    # (the Sobol design does not depend on the seed)
+    design_parameters = {'type': designtype, 'numpoints': int(numpoints), 'seed': int(seed) if designtype == 'lhs' else None,
+                         'bounds': dict((name, [float(bound) for bound in bounds[name]]) for name in PARAMETER_NAMES)}
+    design_parameters_checker(design_parameters, SharedTopologyDataSet.dataset_dir_of_scenario(TEMPLATE_XML_FILENAME))
+
+    np.savetxt(DESIGN_FILENAME, np.column_stack([np.arange(len(parameters)), parameters]), delimiter=',', fmt=['%d', '%.6f', '%.6f', '%.6f'], header='point,' + ','.join(PARAMETER_NAMES))
+    xmlfilenames = design_xml_writer(TEMPLATE_XML_FILENAME, parameters)
+    print('%s design (%s points) written to %s and %s.\n' % (designtype, len(parameters), DESIGN_FILENAME, DESIGN_XML_DIR))
+
+    failed = design_scheduler(xmlfilenames, numworkers)
+    if len(failed) > 0:
+        print colored('%s simulations failed (design points %s); call the script again to retry them.' % (len(failed), sorted(failed)), 'red')
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('DesignOfExperimentsSampler STARTED. \n', 'yellow')
+    main(*sys.argv[1:])
+    print('\n')
+    print colored('DesignOfExperimentsSampler FINISHED. \n', 'yellow')
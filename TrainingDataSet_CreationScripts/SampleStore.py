@@ -0,0 +1,224 @@
+#######################################################################
+# Python script providing an appendable, chunked binary store of training samples
+# (e.g. the deformed coords of the simulation results, one num_points x 3 array per step),
+# replacing the comma-separated text files 'simresults_defcoords_list_partK.csv':
+#
+# The store is a directory containing:
+#   .. meta.json: the shape and dtype of the samples, the fields of the index, and the
+#      number of samples per shard,
+#   .. shard_NNNNNN.npy: NPY files (samples_per_shard x sample_shape) holding the samples
+#      sample_id = NNNNNN*samples_per_shard ... (NNNNNN+1)*samples_per_shard-1,
+#   .. index.bin: one fixed-size binary record (the index fields, e.g. the step number) per sample,
+#      i.e., the number of samples in the store is the number of records.
+#
+# Samples are written to their shard before their index record is appended, such that an
+# interrupted append never produces a partial sample. The number of samples is unbounded
+# (new shards are added on demand), any sample is accessed in O(1) by its sample_id
+# (shard = sample_id // samples_per_shard), and the shards are read memory-mapped.
+#
+# To migrate 'simresults_defcoords_list_partK.csv' files into a store, call:
+#   python SampleStore.py migrate <path-to-store> <csv-file> [<csv-file> ...]
+# To merge stores (e.g. of the walkers of an ensemble, see TrainingDataSetCreatorScript.py) into one store, call:
+#   python SampleStore.py merge <path-to-store> <path-to-store-to-be-merged> [<path-to-store-to-be-merged> ...]
+# To print the contents of a store, call:
+#   python SampleStore.py info <path-to-store>
+#
+# Example:
+#   python SampleStore.py migrate simresults_defcoords_store/ simresults_defcoords_list_part*.csv
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-13}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-13"
+
+import sys
+import os
+import re
+import json
+import fcntl
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from termcolor import colored # for colored terminal output for better overview.
+
+
+SAMPLES_PER_SHARD = 256
+DEFAULT_INDEX_FIELDS = [('step', 'i8'), ('walker', 'i8')]
+
+META_FILENAME = 'meta.json'
+INDEX_FILENAME = 'index.bin'
+SHARD_FILENAME = 'shard_%06d.npy'
+
+
+def sample_store_creator(storedir, sample_shape, dtype='float64', index_fields=DEFAULT_INDEX_FIELDS, samples_per_shard=SAMPLES_PER_SHARD):
+
+    # Create an (empty) store for samples of the given shape and dtype, with the given index fields (list of (name, dtype)):
+    try:
+        os.makedirs(storedir)
+    except:
+        pass
+    meta = {'sample_shape': [int(n) for n in sample_shape], 'dtype': np.dtype(dtype).str,
+            'index_fields': [[name, np.dtype(fieldtype).str] for name, fieldtype in index_fields],
+            'samples_per_shard': int(samples_per_shard)}
+    with open(os.path.join(storedir, META_FILENAME), 'w') as f:
+        json.dump(meta, f, indent=1)
+    open(os.path.join(storedir, INDEX_FILENAME), 'ab').close()
+    return meta
+
+
+def sample_store_meta(storedir):
+
+    # Read the meta data of the store (with the index dtype as numpy dtype):
+    with open(os.path.join(storedir, META_FILENAME), 'r') as f:
+        meta = json.load(f)
+    meta['dtype'] = str(meta['dtype'])
+    meta['index_dtype'] = np.dtype([(str(name), str(fieldtype)) for name, fieldtype in meta['index_fields']])
+    return meta
+
+
+def sample_store_size(storedir):
+
+    # Get the number of samples in the store:
+    meta = sample_store_meta(storedir)
+    return os.path.getsize(os.path.join(storedir, INDEX_FILENAME)) // meta['index_dtype'].itemsize
+
+
+def sample_shard(storedir, meta, shard_number, mode='r'):
+
+    # Open (memory-mapped) the shard with the given number; a missing shard is created in mode 'r+':
+    shardfilename = os.path.join(storedir, SHARD_FILENAME % shard_number)
+    if mode == 'r+' and not os.path.exists(shardfilename):
+        return open_memmap(shardfilename, mode='w+', dtype=np.dtype(meta['dtype']), shape=tuple([meta['samples_per_shard']] + meta['sample_shape']))
+    return np.load(shardfilename, mmap_mode=mode)
+
+
+def sample_store_appender(storedir, sample, **index_values):
+
+    # Append the sample (array of the sample shape of the store) with its index values (e.g. step=3) to the store,
+    # which is created (with the default index fields and the sample's shape and dtype) if it does not exist yet.
+    # Returns the sample_id.
+    sample = np.asarray(sample)
+    if not os.path.exists(os.path.join(storedir, META_FILENAME)):
+        sample_store_creator(storedir, sample.shape, sample.dtype)
+    meta = sample_store_meta(storedir)
+    if list(sample.shape) != meta['sample_shape']:
+        raise ValueError('Sample shape %s does not match the shape %s of the store %s.' % (sample.shape, tuple(meta['sample_shape']), storedir))
+
+    record = np.zeros(1, dtype=meta['index_dtype'])
+    for name, value in index_values.items():
+        record[name] = value
+
+    with open(os.path.join(storedir, INDEX_FILENAME), 'ab') as indexfile:
+        # (exclusive lock: appends of several processes to the same store are serialized)
+        fcntl.flock(indexfile, fcntl.LOCK_EX)
+        try:
+            sample_id = os.path.getsize(os.path.join(storedir, INDEX_FILENAME)) // meta['index_dtype'].itemsize
+            shard = sample_shard(storedir, meta, sample_id // meta['samples_per_shard'], 'r+')
+            shard[sample_id % meta['samples_per_shard']] = sample
+            shard.flush()
+            del shard
+            indexfile.write(record.tobytes())
+            indexfile.flush()
+        finally:
+            fcntl.flock(indexfile, fcntl.LOCK_UN)
+
+    return sample_id
+
+
+def sample_store_index(storedir):
+
+    # Read the index of the store (structured array with one record per sample, e.g. index['step']):
+    meta = sample_store_meta(storedir)
+    return np.fromfile(os.path.join(storedir, INDEX_FILENAME), dtype=meta['index_dtype'])
+
+
+def sample_store_reader(storedir, sample_id, meta=None):
+
+    # Read the sample with the given sample_id (memory-mapped, i.e., only the sample itself is read from disk):
+    if meta is None:
+        meta = sample_store_meta(storedir)
+    sample_id = int(sample_id)
+    if sample_id < 0 or sample_id >= sample_store_size(storedir):
+        raise IndexError('Sample %s is not in the store %s.' % (sample_id, storedir))
+    return sample_shard(storedir, meta, sample_id // meta['samples_per_shard'])[sample_id % meta['samples_per_shard']]
+
+
+def sample_store_shards(storedir):
+
+    # Get all samples of the store as list of memory-mapped arrays (one per shard, num_samples_in_shard x sample_shape),
+    # e.g. for iterating over the samples shard-wise without loading the whole store into memory:
+    meta = sample_store_meta(storedir)
+    num_samples = sample_store_size(storedir)
+    shards = []
+    for shard_number in range((num_samples + meta['samples_per_shard'] - 1) // meta['samples_per_shard']):
+        shard = sample_shard(storedir, meta, shard_number)
+        shards.append(shard[:min(num_samples - shard_number * meta['samples_per_shard'], meta['samples_per_shard'])])
+    return shards
+
+
+def sample_store_merger(storedir, sourcedirs):
+
+    # Append all samples (with their index records) of the source stores to the store, which is created
+    # (like the first source store) if it does not exist yet. Returns the number of merged samples.
+    num_samples = 0
+    for sourcedir in sourcedirs:
+        source_meta = sample_store_meta(sourcedir)
+        if not os.path.exists(os.path.join(storedir, META_FILENAME)):
+            sample_store_creator(storedir, source_meta['sample_shape'], source_meta['dtype'], source_meta['index_fields'], source_meta['samples_per_shard'])
+        meta = sample_store_meta(storedir)
+        if meta['sample_shape'] != source_meta['sample_shape'] or meta['dtype'] != source_meta['dtype'] or meta['index_dtype'] != source_meta['index_dtype']:
+            raise ValueError('The samples of the store %s do not match the samples of the store %s.' % (sourcedir, storedir))
+        index = sample_store_index(sourcedir)
+        sample_id = 0
+        for shard in sample_store_shards(sourcedir):
+            for sample in shard:
+                sample_store_appender(storedir, sample, **dict((name, index[sample_id][name]) for name in index.dtype.names))
+                sample_id += 1
+        num_samples += sample_id
+        print('Merged %s: %s samples.' % (sourcedir, sample_id))
+    return num_samples
+
+
+def sample_store_migrator(storedir, csvfilenames):
+
+    # Migrate the samples of the given 'simresults_defcoords_list_partK.csv' files (written by former versions of
+    # SimResultsComparisonOperator.py as "\nSimResultsDefCoords in Step N:\n" followed by the comma-separated coords)
+    # into the store. Returns the number of migrated samples.
+    num_samples = 0
+    for csvfilename in csvfilenames:
+        with open(csvfilename, 'r') as f:
+            content = f.read()
+        blocks = re.split(r'SimResultsDefCoords in Step (\d+):\n', content)
+        for k in range(1, len(blocks), 2):
+            coords = np.array(blocks[k + 1].strip().split(','), dtype=np.float64).reshape(-1, 3)
+            sample_store_appender(storedir, coords, step=int(blocks[k]))
+            num_samples += 1
+        print('Migrated %s: %s samples.' % (csvfilename, (len(blocks) - 1) // 2))
+    return num_samples
+
+
+def sample_store_reporter(storedir):
+
+    # Print the contents of the store:
+    meta = sample_store_meta(storedir)
+    index = sample_store_index(storedir)
+    print colored('SampleStore %s: %s samples of shape %s (%s), %s per shard.' % (storedir, len(index), tuple(meta['sample_shape']), meta['dtype'], meta['samples_per_shard']), 'green')
+    for name in index.dtype.names:
+        if len(index) > 0:
+            print('  %s: %s ... %s' % (name, index[name].min(), index[name].max()))
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('SampleStore STARTED. \n', 'yellow')
+    if sys.argv[1] == 'migrate':
+        sample_store_migrator(sys.argv[2], sys.argv[3:])
+    elif sys.argv[1] == 'merge':
+        sample_store_merger(sys.argv[2], sys.argv[3:])
+    sample_store_reporter(sys.argv[2])
+    print('\n')
+    print colored('SampleStore FINISHED. \n', 'yellow')
@@ -0,0 +1,261 @@
+#######################################################################
+# Python script providing a compact training data set layout, which stores the
+# mesh of a scenario (points and cells, shared by all samples) only once, and per
+# sample only its parameter vector and its displacement field:
+#
+# The data set of a scenario (e.g. 'TrainingDataSet_QuaderMSML_Scenario_quaderVMesh/', named after
+# the mesh file of the xml inputfile) is a directory containing:
+#   .. reference_mesh.npz: the undeformed points (num_points x 3), and the cells
+#      (connectivity, offsets, cell types) of the mesh, written with the first sample,
+#   .. samples/: a SampleStore (see SampleStore.py) of the displacement fields (u0,u1,u2)
+#      (num_points x 3, float32 by default), indexed by step, walker (of an ensemble), lambda, mu and gravity.
+#
+# Displacements are stored as float32 only if the rounding error is bounded by
+# FLOAT32_MAX_RELATIVE_ERROR (relative to the largest displacement component of the sample);
+# otherwise the sample is rejected (ValueError), and the data set should be created with float64.
+#
+# The deformed coords of a sample are the undeformed points plus its displacement field.
+# If the real data (vtu) is given on append, the RMSE-value of the deformed coords w.r.t. the real data is
+# appended to the list of RMSE-values 'rmse_value_list.txt' as well (as by SimResultsComparisonOperator.py).
+# The lists of the walkers of an ensemble are merged into one list, whose lines carry the walker as well
+# ('RMSE-Value in Step <step> of Walker <walker>: <rmse>', i.e., the index fields step and walker of the sample).
+#
+# To append the simulation results (pvtu) of a step to the data set of its scenario, call:
+#   python SharedTopologyDataSet.py append <pvtu-file> <xml-inputfile> <step-number> [<walker> [<realdata-vtu-file>]]
+# To merge data sets of the same scenario (e.g. of the walkers of an ensemble) into one data set, call:
+#   python SharedTopologyDataSet.py merge <path-to-data-set> <path-to-data-set-to-be-merged> [...]
+# To print the contents of a data set, call:
+#   python SharedTopologyDataSet.py info <path-to-data-set>
+#
+# Example:
+#   python SharedTopologyDataSet.py append TestSimResults/Beam_solution_np1_RefLvl0_Tstep.0010.pvtu elastScen_Beam_ActionSelector_Input.xml 3
+#
+# author = {Nicolai Schoch}
+# date = {2017-08-14}
+#######################################################################
+
+
+__author__ = 'schoch'
+__date__ = "2017-08-14"
+
+import sys
+import os
+
+import xml.etree.ElementTree as ET
+
+import vtk
+import numpy as np
+from vtk.util.numpy_support import vtk_to_numpy
+
+from termcolor import colored # for colored terminal output for better overview.
+
+import SampleStore
+
+
+DATASET_PREFIX = 'TrainingDataSet_'
+REFERENCE_MESH_FILENAME = 'reference_mesh.npz'
+SAMPLES_DIR = 'samples/'
+
+# Storage type of the displacement fields, and the bound of the float32 rounding error
+# (relative to the largest displacement component of a sample):
+DISPLACEMENT_DTYPE = 'float32'
+FLOAT32_MAX_RELATIVE_ERROR = 1e-6
+
+SAMPLE_INDEX_FIELDS = [('step', 'i8'), ('walker', 'i8'), ('lambda', 'f8'), ('mu', 'f8'), ('gravity', 'f8')]
+
+RMSE_VALUE_LIST_FILENAME = 'rmse_value_list.txt'
+
+
+def dataset_dir_of_scenario(xmlinputfile):
+
+    # Get the data set directory of the scenario of the xml-inputfile (named after its mesh file):
+    root = ET.parse(xmlinputfile).getroot()
+    meshfilename = [elem.text.strip() for elem in root.iter('Filename')][0]
+    return DATASET_PREFIX + os.path.basename(meshfilename).split('.')[0] + '/'
+
+
+def scenario_parameters(xmlinputfile):
+
+    # Get the parameter vector (lambda, mu, gravity) of the xml-inputfile:
+    root = ET.parse(xmlinputfile).getroot()
+    return dict((tag, [float(elem.text) for elem in root.iter(tag)][0]) for tag in ['lambda', 'mu', 'gravity'])
+
+
+def simresults_reader(pvtufilename):
+
+    # Read the simulation results (pvtu), and return the vtkUnstructuredGrid and the displacement field (num_points x 3):
+    reader = vtk.vtkXMLPUnstructuredGridReader()
+    reader.SetFileName(pvtufilename)
+    reader.Update()
+    grid = reader.GetOutput()
+    if grid.GetNumberOfPoints() == 0:
+        raise ValueError('No simulation results in %s.' % pvtufilename)
+    displacement = np.column_stack([vtk_to_numpy(grid.GetPointData().GetArray(name)) for name in ['u0', 'u1', 'u2']])
+    return grid, displacement
+
+
+def reference_mesh_writer(datasetdir, grid):
+
+    # Store the undeformed points and the cells of the grid as reference mesh of the data set:
+    try:
+        os.makedirs(datasetdir)
+    except:
+        pass
+    cells = grid.GetCells()
+    if vtk.vtkVersion().GetVTKMajorVersion() >= 9:
+        connectivity = vtk_to_numpy(cells.GetConnectivityArray())
+        offsets = vtk_to_numpy(cells.GetOffsetsArray())
+    else:
+        # legacy cell array layout: [n0, id, id, ..., n1, id, ...]
+        legacy = vtk_to_numpy(cells.GetData())
+        sizes, offsets, k = [], [0], 0
+        while k < len(legacy):
+            sizes.append(legacy[k])
+            offsets.append(offsets[-1] + legacy[k])
+            k += legacy[k] + 1
+        connectivity = np.delete(legacy, np.cumsum([0] + [n + 1 for n in sizes[:-1]]))
+        offsets = np.array(offsets)
+    celltypes = np.array([grid.GetCellType(c) for c in range(grid.GetNumberOfCells())], dtype=np.uint8)
+    np.savez(os.path.join(datasetdir, REFERENCE_MESH_FILENAME), points=vtk_to_numpy(grid.GetPoints().GetData()).astype(np.float64),
+             connectivity=connectivity.astype(np.int64), offsets=offsets.astype(np.int64), celltypes=celltypes)
+
+
+def reference_mesh_loader(datasetdir):
+
+    # Load the reference mesh of the data set (dict with points, connectivity, offsets, celltypes):
+    with np.load(os.path.join(datasetdir, REFERENCE_MESH_FILENAME)) as mesh:
+        return dict((name, mesh[name]) for name in mesh.files)
+
+
+def displacement_packer(displacement, dtype=DISPLACEMENT_DTYPE):
+
+    # Convert the displacement field to the storage type, and check the bound of the rounding error:
+    packed = np.asarray(displacement).astype(dtype)
+    scale = np.abs(displacement).max()
+    if scale > 0.0:
+        error = np.abs(packed.astype(np.float64) - displacement).max() / scale
+        if not error <= FLOAT32_MAX_RELATIVE_ERROR:
+            raise ValueError('Rounding error %s of the displacement field (as %s) exceeds %s.' % (error, dtype, FLOAT32_MAX_RELATIVE_ERROR))
+    return packed
+
+
+def rmsevalue_appender(grid, displacement, realdatafilename, stepnum, rmsefilename=RMSE_VALUE_LIST_FILENAME):
+
+    # Compute the RMSE-value of the deformed coords (undeformed points plus displacement field) of the simulation results
+    # w.r.t. the coords of the real data (vtu), and append it to the list of RMSE-values. Returns the RMSE-value.
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(realdatafilename)
+    reader.Update()
+    realcoords = vtk_to_numpy(reader.GetOutput().GetPoints().GetData()).astype(np.float64)
+    coords_diff = realcoords - (vtk_to_numpy(grid.GetPoints().GetData()) + displacement)
+    rmse_value = np.sqrt(np.einsum('ij,ij->', coords_diff, coords_diff) / realcoords.shape[0])
+
+    rmse_value_list_file = open(rmsefilename, 'a')
+    rmse_value_list_file.write("RMSE-Value in Step " + str(stepnum) + ": " + str(rmse_value) + '\n')
+    rmse_value_list_file.close()
+    return rmse_value
+
+
+def rmsevalue_list_merger(rmsefilename, walker_rmsefilenames):
+
+    # Append the RMSE-values of the lists of the walkers of an ensemble (dict walker: list of RMSE-values) to the list
+    # of RMSE-values, with the walker of every RMSE-value. Returns the number of merged RMSE-values.
+    num_merged = 0
+    with open(rmsefilename, 'a') as rmse_value_list_file:
+        for walker in sorted(walker_rmsefilenames):
+            with open(walker_rmsefilenames[walker], 'r') as walker_rmse_value_list_file:
+                for line in walker_rmse_value_list_file:
+                    # RMSE-Value in Step <step>: <rmse>
+                    if not line.startswith('RMSE-Value in Step ') or ': ' not in line:
+                        continue
+                    stepnum, rmse_value = line[len('RMSE-Value in Step '):].split(': ', 1)
+                    rmse_value_list_file.write("RMSE-Value in Step " + stepnum + " of Walker " + str(walker) + ": " + rmse_value.strip() + '\n')
+                    num_merged += 1
+    return num_merged
+
+
+def dataset_sample_appender(pvtufilename, xmlinputfile, stepnum, datasetdir=None, walker=0, realdatafilename=None):
+
+    # Append the displacement field of the simulation results (pvtu) with the parameters of the xml-inputfile
+    # to the data set of its scenario (the reference mesh is stored with the first sample), and, if the real data
+    # is given, its RMSE-value to the list of RMSE-values. Returns the sample_id.
+    if datasetdir is None:
+        datasetdir = dataset_dir_of_scenario(xmlinputfile)
+    grid, displacement = simresults_reader(pvtufilename)
+    if realdatafilename is not None:
+        rmse_value = rmsevalue_appender(grid, displacement, realdatafilename, stepnum)
+        print('The RMSE in Step %s is: %s.' % (stepnum, rmse_value))
+
+    samplesdir = os.path.join(datasetdir, SAMPLES_DIR)
+    if not os.path.exists(os.path.join(datasetdir, REFERENCE_MESH_FILENAME)):
+        reference_mesh_writer(datasetdir, grid)
+        SampleStore.sample_store_creator(samplesdir, displacement.shape, DISPLACEMENT_DTYPE, SAMPLE_INDEX_FIELDS)
+    meta = SampleStore.sample_store_meta(samplesdir)
+    if list(displacement.shape) != meta['sample_shape']:
+        raise ValueError('The simulation results %s (%s points) do not match the mesh of the data set %s (%s points).' % (pvtufilename, displacement.shape[0], datasetdir, meta['sample_shape'][0]))
+
+    parameters = scenario_parameters(xmlinputfile)
+    return SampleStore.sample_store_appender(samplesdir, displacement_packer(displacement, meta['dtype']), step=int(stepnum), walker=int(walker), **parameters)
+
+
+def dataset_merger(datasetdir, sourcedirs):
+
+    # Merge the samples of the source data sets into the data set (which gets the reference mesh of the 
+    # first source data set, if it does not exist yet); all data sets must have the same reference mesh.
+    for sourcedir in sourcedirs:
+        if not os.path.exists(os.path.join(sourcedir, REFERENCE_MESH_FILENAME)):
+            continue # (no samples)
+        source_mesh = reference_mesh_loader(sourcedir)
+        if not os.path.exists(os.path.join(datasetdir, REFERENCE_MESH_FILENAME)):
+            try:
+                os.makedirs(datasetdir)
+            except:
+                pass
+            np.savez(os.path.join(datasetdir, REFERENCE_MESH_FILENAME), **source_mesh)
+        mesh = reference_mesh_loader(datasetdir)
+        if any(not np.array_equal(mesh[name], source_mesh[name]) for name in mesh):
+            raise ValueError('The reference mesh of the data set %s differs from the one of %s.' % (sourcedir, datasetdir))
+        SampleStore.sample_store_merger(os.path.join(datasetdir, SAMPLES_DIR), [os.path.join(sourcedir, SAMPLES_DIR)])
+
+
+def dataset_sample_loader(datasetdir, sample_id):
+
+    # Load the parameters (index record) and the displacement field (float64) of the sample:
+    samplesdir = os.path.join(datasetdir, SAMPLES_DIR)
+    index = SampleStore.sample_store_index(samplesdir)
+    return index[int(sample_id)], np.asarray(SampleStore.sample_store_reader(samplesdir, sample_id), dtype=np.float64)
+
+
+def dataset_deformed_coords(datasetdir, sample_id, mesh=None):
+
+    # Get the deformed coords (undeformed points plus displacement) of the sample:
+    if mesh is None:
+        mesh = reference_mesh_loader(datasetdir)
+    return mesh['points'] + dataset_sample_loader(datasetdir, sample_id)[1]
+
+
+def dataset_reporter(datasetdir):
+
+    # Print the contents of the data set:
+    mesh = reference_mesh_loader(datasetdir)
+    samplesdir = os.path.join(datasetdir, SAMPLES_DIR)
+    num_samples = SampleStore.sample_store_size(samplesdir)
+    # (disk usage: the not yet filled part of the last shard does not occupy any disk space)
+    size = sum(512 * os.stat(os.path.join(directory, filename)).st_blocks for directory, dirnames, filenames in os.walk(datasetdir) for filename in filenames)
+    print colored('Data set %s: reference mesh with %s points and %s cells, %s samples (%.1f MB on disk).' % (datasetdir, mesh['points'].shape[0], len(mesh['celltypes']), num_samples, size / 1048576.0), 'green')
+    SampleStore.sample_store_reporter(samplesdir)
+
+
+if __name__ == '__main__':
+    print('\n')
+    print colored('SharedTopologyDataSet STARTED. \n', 'yellow')
+    if sys.argv[1] == 'append':
+        sample_id = dataset_sample_appender(sys.argv[2], sys.argv[3], sys.argv[4], None, sys.argv[5] if len(sys.argv) > 5 else 0, sys.argv[6] if len(sys.argv) > 6 else None)
+        print('The simulation results %s are stored as sample %s in %s.' % (sys.argv[2], sample_id, dataset_dir_of_scenario(sys.argv[3])))
+    elif sys.argv[1] == 'merge':
+        dataset_merger(sys.argv[2], sys.argv[3:])
+        dataset_reporter(sys.argv[2])
+    elif sys.argv[1] == 'info':
+        dataset_reporter(sys.argv[2])
+    print('\n')
+    print colored('SharedTopologyDataSet FINISHED. \n', 'yellow')
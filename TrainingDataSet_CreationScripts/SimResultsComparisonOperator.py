@@ -11,9 +11,11 @@
 # 
 # The output is the following:
 #   .. RMSE-value: a scalar value as a comparison measure for the two input meshes.
+#   .. the simulated deformed coords, appended as one sample (with its step number) to the 
+#      sample store 'simresults_defcoords_store/' (see SampleStore.py).
 # 
 # To run the script, call:
-#   python SimResultsComparisonOperator.py <path-to-files> <realdata-name> <simdata-name>
+#   python SimResultsComparisonOperator.py <path-to-files> <realdata-name> <simdata-name> <step-number> [<walker>]
 # 
 # Example:
 #   python SimResultsComparisonOperator.py <PATH> realdata_filename_tsX.vtu simdata_filename_tsX.vtu
@@ -35,6 +37,11 @@ from vtk.util.numpy_support import vtk_to_numpy
 #from vtk.util import numpy_support
 #import glob
 
+import SampleStore
+
+# Sample store of the simulated deformed coords (see SampleStore.py):
+SAMPLESTORE_DIR = 'simresults_defcoords_store/'
+
 print('=====================================')
 print('SimResultsComparisonOperator started. \n')
 
@@ -44,6 +51,7 @@ path = sys.argv[1]
 realdata = sys.argv[2]
 simdata = sys.argv[3]
 stepnum = sys.argv[4]
+walker = int(sys.argv[5]) if len(sys.argv) > 5 else 0 # walker of an ensemble (see TrainingDataSetCreatorScript.py).
 
 path_and_realdata = path + realdata
 path_and_simdata = path + simdata
@@ -72,35 +80,20 @@ nodes_vtk_array_simdata = readerTwo.GetOutput().GetPoints().GetData()
 # ------------------------------------------------
 #Get the coordinates of the nodes of the real-data-mesh as a numpy-array:
 nodes_numpy_array_realdata = vtk_to_numpy(nodes_vtk_array_realdata)
-x_rd,y_rd,z_rd = nodes_numpy_array_realdata[:,0] , nodes_numpy_array_realdata[:,1] , nodes_numpy_array_realdata[:,2]
 #Get the coordinates of the nodes of the simulated-data-mesh as a numpy-array:
 nodes_numpy_array_simdata = vtk_to_numpy(nodes_vtk_array_simdata)
-x_sd,y_sd,z_sd = nodes_numpy_array_simdata[:,0] , nodes_numpy_array_simdata[:,1] , nodes_numpy_array_simdata[:,2]
 
 print('Control Output: nodes_numpy_array_simdata.shape = ', nodes_numpy_array_simdata.shape) # num_points x dim
-
-# Compute real_coords{0,1,2} - sim_coords{0,1,2}
-x_diff = x_rd - x_sd
-y_diff = y_rd - y_sd
-z_diff = z_rd - z_sd
-
-#print(x_diff.shape) # num_points x 1
 print('Control Output: num_points = nodes_numpy_array_realdata.size/3 = ', nodes_numpy_array_realdata.size/3)
 
 # Compute the RMSE (which represents the sample standard deviation of the differences 
 # between the simulated/predicted values and real/observed values:
 
-error_scaler = 0.0
-num_points = nodes_numpy_array_realdata.size/3
-#total_error = 0.0
-
-for i in range(0,num_points):
-	
-	# compute the length of the diff vector for every node in the mesh:
-	#error_scaler += np.sqrt( (x_diff[i])**2 + (y_diff[i])**2 + (z_diff[i])**2 )
-	# square the length in order to stronger account for large errors:
-	error_scaler += (x_diff[i])**2 + (y_diff[i])**2 + (z_diff[i])**2
-	# ...
+# Compute the sum over all nodes of the squared length of the diff vector real_coords{0,1,2} - sim_coords{0,1,2}
+# (squared in order to stronger account for large errors):
+coords_diff = nodes_numpy_array_realdata - nodes_numpy_array_simdata
+error_scaler = np.einsum('ij,ij->', coords_diff, coords_diff)
+num_points = nodes_numpy_array_realdata.shape[0]
 
 print('The error_scaler in Step %s is: %s.' % (stepnum, error_scaler))
 
@@ -131,42 +124,10 @@ rmse_value_list_file.write("RMSE-Value in Step " + str(stepnum) + ": " + str(rms
 rmse_value_list_file.close()
 
 
-# Store/Append the obtained simulation-results deformed coords 'nodes_numpy_array_simdata' in/to a list:
-simfilename_base = 'simresults_defcoords_list' #.csv'
-simfilename = ''
-stepnum = int(stepnum)
-
-if stepnum < 101:
-    simfilename = simfilename_base + '_part1.csv'
-elif stepnum < 201:
-    simfilename = simfilename_base + '_part2.csv'
-elif stepnum < 301:
-    simfilename = simfilename_base + '_part3.csv'
-elif stepnum < 401:
-    simfilename = simfilename_base + '_part4.csv'
-elif stepnum < 501:
-    simfilename = simfilename_base + '_part5.csv'
-elif stepnum < 601:
-    simfilename = simfilename_base + '_part6.csv'
-elif stepnum < 701:
-    simfilename = simfilename_base + '_part7.csv'
-elif stepnum < 801:
-    simfilename = simfilename_base + '_part8.csv'
-elif stepnum < 901:
-    simfilename = simfilename_base + '_part9.csv'
-elif stepnum < 1001:
-    simfilename = simfilename_base + '_part10.csv'
-
-if os.path.exists(simfilename):
-    append_write = 'a' # append if already exists
-else:
-    append_write = 'w' # make a new file if not
-
-simresults_list_file = open(simfilename,append_write)
-#simresults_list_file.write("\nSimResultsDefCoords:\n" + str(nodes_numpy_array_simdata) + '\n')
-simresults_list_file.write("\nSimResultsDefCoords in Step " + str(stepnum) + ":\n")
-nodes_numpy_array_simdata.tofile(simresults_list_file, sep=',', format="%s")
-simresults_list_file.close()
+# Store/Append the obtained simulation-results deformed coords 'nodes_numpy_array_simdata' in/to the sample store 
+# (chunked binary NPY shards with an index, see SampleStore.py):
+sample_id = SampleStore.sample_store_appender(SAMPLESTORE_DIR, nodes_numpy_array_simdata, step=int(stepnum), walker=walker)
+print('The deformed coords in Step %s are stored as sample %s in %s.' % (stepnum, sample_id, SAMPLESTORE_DIR))
 
 
 print('SimResultsComparisonOperator successfully finished.')
@@ -11,8 +11,13 @@
 # The output is the following:
 #   .. simulation results in respective simulation output folder: ...
 # 
+# The simulation is started by the managed launcher (see ../RL_ManagedLauncher.py), i.e., it is 
+# terminated after <wall-clock-limit-in-s> (default: SIMULATION_TIMEOUT; 0 for no limit), its 
+# memory is limited to <memory-limit-in-bytes> per process (default: no limit), its resource 
+# usage (CPU times, max RSS) is reported, and its exit status is returned as exit status of the script.
+# 
 # To run the script, call:
-#   python SimulationRunner.py <num-para-proc> <path-to-xml-input-filename>
+#   python SimulationRunner.py <num-para-proc> <path-to-xml-input-filename> [<wall-clock-limit-in-s>] [<memory-limit-in-bytes>]
 # 
 # Example:
 #    python SimulationRunner.py 2 elastScen_BeamQuader_DirAndNeumBC.xml 
@@ -28,6 +33,15 @@ __date__ = "2017-07-31"
 import os
 import sys
 
+# The managed launcher is shared with the RL algorithm scripts in the parent directory:
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+import RL_ManagedLauncher
+
+# Wall-clock limit (s) and memory limit (bytes per process) of a simulation (None: no limit):
+SIMULATION_TIMEOUT = 3600
+SIMULATION_MAX_MEMORY = None
+
 print('=========================')
 print('SimulationRunner started. \n')
 
@@ -41,17 +55,32 @@ print('NumProc: %s.' % int(numproc))
 
 xmlinputfile = sys.argv[2]
 
+timeout = SIMULATION_TIMEOUT
+if len(sys.argv) > 3:
+    timeout = float(sys.argv[3]) or None
+max_memory = SIMULATION_MAX_MEMORY
+if len(sys.argv) > 4:
+    max_memory = int(sys.argv[4]) or None
+
+usage = None
+
 if int(numproc) == 1: # Run sequentially:
     HIFLOW_EXECUTABLE = './elasticity'
     cmd = "%s %s" % (HIFLOW_EXECUTABLE, xmlinputfile)
     print("Starting Execution of HiFlow3 Elasticity App in sequential mode: %s" % cmd)
-    os.system(cmd)
+    usage = RL_ManagedLauncher.managed_launcher(cmd, timeout, max_memory)
 
 if int(numproc) > 1: # Run HiFlow3-Elasticity-Simulation in parallel with np X:
     HIFLOW_EXECUTABLE = 'elasticity' # possibly add PATH; t.b. imported
     cmd = "%s %s %s %s" % ('mpirun -np', numproc, HIFLOW_EXECUTABLE, xmlinputfile)
     print("Starting Execution of HiFlow3 Elasticity App in parallel mode: %s" % cmd)
-    os.system(cmd)
+    usage = RL_ManagedLauncher.managed_launcher(cmd, timeout, max_memory)
+
+if usage is not None:
+    RL_ManagedLauncher.usage_reporter(usage)
+    if usage['exit_status'] != 0:
+        print('SimulationRunner FAILED with exit status %s.' % usage['exit_status'])
+        sys.exit(usage['exit_status'] if usage['exit_status'] > 0 else 128 - usage['exit_status'])
 
 print('SimulationRunner successfully finished.')
 
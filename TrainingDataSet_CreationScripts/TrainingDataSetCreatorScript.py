@@ -11,9 +11,22 @@
 # 
 # The output is the following:
 #   .. a training data set of (S_t, A_t; S_tp1; R_tp1) quadrupels.
+#   .. the shared-topology training data set 'TrainingDataSet_<mesh>/', i.e., the mesh of the scenario 
+#      (once) and the parameter set and displacement field of every sample (see SharedTopologyDataSet.py),
+#      and the RMSE-value of every sample in 'rmse_value_list.txt'.
+#   .. only with <legacy-outputs> = 1: additionally the pvtu2vtu-converted simulation results (_outVis.vtu) 
+#      and the float64 deformed coords of every sample in the sample store 'simresults_defcoords_store/' 
+#      (as written by former versions, see SimResultsComparisonOperator.py).
 # 
 # To run the script, call:
-#   python TrainingDataSetCreatorScript.py <xxx> <xxx>
+#   python TrainingDataSetCreatorScript.py [<num-walkers> [<num-steps> [<seed> [<legacy-outputs (0|1)>]]]]
+# 
+# With <num-walkers> larger than 1, an ensemble of independent random walks is run concurrently: 
+# every walker gets its own seed (<seed>+N) for the random action selection, and its own copy of the 
+# xml-inputfile and output directory in 'WalkerNN/'. At the end, the samples of all walkers are merged 
+# into the sample store and the training data set of the current directory (see SampleStore.py), and their 
+# RMSE-values into the 'rmse_value_list.txt' of the current directory, with the walker of every RMSE-value 
+# (see SharedTopologyDataSet.rmsevalue_list_merger).
 # 
 # author = {Nicolai Schoch}
 # date = {2017-07-31}
@@ -23,22 +36,68 @@
 __author__ = 'schoch'
 __date__ = "2017-07-31"
 
-#import os
-#import sys
+import os
+import sys
+import glob
+import shutil
+import multiprocessing
+from random import randint
 
 import subprocess
 from subprocess import PIPE
 
 from termcolor import colored # for colored terminal output for better overview.
 
+import SampleStore
+import SharedTopologyDataSet
+
+# Directory of the scripts, the xml-inputfile (mutated in place by every step), the simulation output directory, 
+# and the sample store of the deformed coords (as in SimResultsComparisonOperator.py):
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_XML_FILENAME = 'elastScen_Beam_ActionSelector_Input.xml'
+SIMRESULTS_DIR = 'TestSimResults/'
+SAMPLESTORE_DIR = 'simresults_defcoords_store/'
+
+# Simulation results (pvtu) and real data (vtu) of the target timestep, i.e., of every training sample:
+SIMDATA_PVTU_FILENAME = 'Beam_solution_np1_RefLvl0_Tstep.0010.pvtu'
+REALDATA_FILENAME = 'Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu'
+
+# Working directory of every walker of an ensemble, and the files and directories of the current directory, 
+# which are shared by (linked into the working directories of) all walkers:
+WALKER_DIR = 'Walker%02d/'
+WALKER_SHARED_FILES = ['elasticity', 'SimInput']
+
 # NOTE: RUN SIMULATION WITH NP=1 (in order for unique order of coords)!!!
 
-def main():
-    process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True)
-    username = process.communicate()[0]
-    print colored(username, 'red') #prints the username of the account you're logged in as
+def walker_setupper(walker):
+    
+    # Set up the working directory of the walker: link the shared files (simulation application, mesh data) 
+    # into it, and copy the xml-inputfile and the real data (which the simulation results are compared to):
+    walkerdir = WALKER_DIR % walker
+    try:
+        os.makedirs(walkerdir + SIMRESULTS_DIR)
+    except:
+        pass
+    for filename in WALKER_SHARED_FILES:
+        if os.path.exists(filename) and not os.path.lexists(walkerdir + filename):
+            os.symlink(os.path.abspath(filename), walkerdir + filename)
+    shutil.copy(INPUT_XML_FILENAME, walkerdir + INPUT_XML_FILENAME)
+    for filename in glob.glob(SIMRESULTS_DIR + '*_REALDATA_*'):
+        shutil.copy(filename, walkerdir + SIMRESULTS_DIR)
+    return walkerdir
+
+
+def walker_runner(walker_job):
+    
+    # Run one random walk of numsteps steps in the working directory walkerdir (None: the current directory), 
+    # with the given seed for the random action selection (None: not seeded), and with or without the legacy outputs:
+    walker, numsteps, walkerseed, walkerdir, legacy_outputs = walker_job
+    if walkerseed is None:
+        seedarg = ''
+    else:
+        seedarg = ' %s' % walkerseed
     
-    for i in range(0,1000):
+    for i in range(0,numsteps):
         
         step = i+1
         
@@ -46,23 +105,44 @@ def main():
         # set up the subsequent Simulation Scenario (through re-defining the XML InputFile) 
         # by means of updating the previous scenario's parameter set with a new parameter set:
         # In subprocess: store/append the new parameter set to existing param-sets-list:
-        cmdForActionSelectorAndSimSetupper = 'python ActionSelectorAndSimSetupper.py elastScen_Beam_ActionSelector_Input.xml %s' % str(step)
-        process = subprocess.call(cmdForActionSelectorAndSimSetupper, shell=True)
+        cmdForActionSelectorAndSimSetupper = 'python %s %s %s%s' % (os.path.join(SCRIPT_DIR, 'ActionSelectorAndSimSetupper.py'), INPUT_XML_FILENAME, str(step), seedarg)
+        process = subprocess.call(cmdForActionSelectorAndSimSetupper, shell=True, cwd=walkerdir)
         print('\n')
         print colored('ActionSelectorAndSimSetupper successfully finished.', 'green')
         print colored('=================================================== \n', 'green')
         
         # Run Simulation App with np=1 and with newly-defined XML Inputfile:
-        cmdForSimulationRunner = 'python SimulationRunner.py 1 elastScen_Beam_ActionSelector_Input.xml'
-        process = subprocess.call(cmdForSimulationRunner, shell=True)
+        cmdForSimulationRunner = 'python %s 1 %s' % (os.path.join(SCRIPT_DIR, 'SimulationRunner.py'), INPUT_XML_FILENAME)
+        process = subprocess.call(cmdForSimulationRunner, shell=True, cwd=walkerdir)
         print('\n')
+        if process != 0:
+            # the simulation failed or exceeded its wall-clock or memory limit (e.g. a pathological parameter set): 
+            # do not convert/compare the (missing or outdated) simulation results, but go on with the next step.
+            print colored('SimulationRunner FAILED (exit status %s), hence no training sample in Step %s of Walker %s.' % (process, step, walker), 'red')
+            print colored('======================================= \n', 'red')
+            continue
         print colored('SimulationRunner successfully finished.', 'green')
         print colored('======================================= \n', 'green')
         
+        # Store the training sample, i.e., the parameter set and the displacement field (the mesh is stored 
+        # only once per scenario), in the shared-topology training data set (see SharedTopologyDataSet.py),
+        # and store/append its RMSE-value to the RMSE-values-list (unless computed by the legacy outputs below):
+        cmdForSharedTopologyDataSet = 'python %s append %s%s %s %s %s' % (os.path.join(SCRIPT_DIR, 'SharedTopologyDataSet.py'), SIMRESULTS_DIR, SIMDATA_PVTU_FILENAME, INPUT_XML_FILENAME, str(step), walker)
+        if not legacy_outputs:
+            cmdForSharedTopologyDataSet += ' %s%s' % (SIMRESULTS_DIR, REALDATA_FILENAME)
+        process = subprocess.call(cmdForSharedTopologyDataSet, shell=True, cwd=walkerdir)
+        print('\n')
+        print colored('SharedTopologyDataSet successfully finished.', 'green')
+        print colored('============================================ \n', 'green')
+        
+        if not legacy_outputs:
+            continue
+        
+        # Legacy outputs (only on request, the training sample is already stored above):
         # Convert Pvtu sim output to vtu sim output, 
         # and store/append deformed-coords (x1,x2,x3) to existing coords-lists:
-        cmdForPvtu2vtuConverter = 'python Pvtu2vtuConverterAndVMStressCalculator.py TestSimResults/ 140000 50000'  # note the lambda and mu parameters are not effective here.
-        process = subprocess.call(cmdForPvtu2vtuConverter, shell=True)
+        cmdForPvtu2vtuConverter = 'python %s %s 140000 50000' % (os.path.join(SCRIPT_DIR, 'Pvtu2vtuConverterAndVMStressCalculator.py'), SIMRESULTS_DIR)  # note the lambda and mu parameters are not effective here.
+        process = subprocess.call(cmdForPvtu2vtuConverter, shell=True, cwd=walkerdir)
         print('\n')
         print colored('Pvtu2vtuConverter successfully finished.', 'green')
         print colored('======================================== \n', 'green')
@@ -71,8 +151,8 @@ def main():
         # Then compare the 'simulation results' with the 'real data' and compute the RMSE value, 
         # and append/store the RMSE-value to a stored RMSE-values-list:
         #cmdForSimResultsComparisonOperator = 'python SimResultsComparisonOperator.py TestSimResults/ Test_Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu Test_Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu'
-        cmdForSimResultsComparisonOperator = 'python SimResultsComparisonOperator.py TestSimResults/ Beam_REALDATA_solution_np1_RefLvl0_Tstep.0010_outVis.vtu Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu %s' % str(step)
-        process = subprocess.call(cmdForSimResultsComparisonOperator, shell=True)
+        cmdForSimResultsComparisonOperator = 'python %s %s %s Beam_solution_np1_RefLvl0_Tstep.0010_outVis.vtu %s %s' % (os.path.join(SCRIPT_DIR, 'SimResultsComparisonOperator.py'), SIMRESULTS_DIR, REALDATA_FILENAME, str(step), walker)
+        process = subprocess.call(cmdForSimResultsComparisonOperator, shell=True, cwd=walkerdir)
         print('\n')
         # In subprocess: store/append "deformed-coords (x1,x2,x3)", i.e. the "nodes_numpy_array_simdata", to existing coords-lists.
         # In subprocess: store/append "RMSE-value" to stored RMSE-values-list.
@@ -82,6 +162,50 @@ def main():
         # Etc. Repeat!
         # QUESTION: get output/return value from one python program here or into another python program.
     
+
+
+def main(numwalkers=1, numsteps=1000, baseseed=None, legacy_outputs=0):
+    process = subprocess.Popen('echo %USER:NICOLAI.SCHOCH%', stdout=PIPE, shell=True)
+    username = process.communicate()[0]
+    print colored(username, 'red') #prints the username of the account you're logged in as
+    
+    numwalkers = int(numwalkers)
+    legacy_outputs = bool(int(legacy_outputs))
+    if numwalkers == 1:
+        # Single walker in the current directory:
+        walker_runner((0, int(numsteps), baseseed, None, legacy_outputs))
+        return
+    
+    # Ensemble of independent walkers, each with its own seed, xml-inputfile and output directory, 
+    # run concurrently (one process per walker):
+    if baseseed is None:
+        baseseed = randint(0, 1000000)
+    walker_jobs = [(walker, int(numsteps), int(baseseed) + walker, walker_setupper(walker), legacy_outputs) for walker in range(0,numwalkers)]
+    print colored('Running %s walkers with the seeds %s ... %s (%s steps each).\n' % (numwalkers, int(baseseed), int(baseseed) + numwalkers - 1, numsteps), 'yellow')
+    pool = multiprocessing.Pool(processes=numwalkers)
+    try:
+        pool.map(walker_runner, walker_jobs)
+    finally:
+        pool.close()
+        pool.join()
+    
+    # Merge the samples of all walkers into the sample store and the training data set of the current directory, 
+    # and their RMSE-values into its list of RMSE-values
+    # (the merged stores and lists of the walkers are removed, such that they are not merged twice):
+    samplestores = [walkerdir + SAMPLESTORE_DIR for walker, n, walkerseed, walkerdir, legacy in walker_jobs if os.path.exists(walkerdir + SAMPLESTORE_DIR)]
+    SampleStore.sample_store_merger(SAMPLESTORE_DIR, samplestores)
+    datasetdir = SharedTopologyDataSet.dataset_dir_of_scenario(INPUT_XML_FILENAME)
+    datasets = [walkerdir + datasetdir for walker, n, walkerseed, walkerdir, legacy in walker_jobs if os.path.exists(walkerdir + datasetdir)]
+    SharedTopologyDataSet.dataset_merger(datasetdir, datasets)
+    rmsefilenames = dict((walker, walkerdir + SharedTopologyDataSet.RMSE_VALUE_LIST_FILENAME) for walker, n, walkerseed, walkerdir, legacy in walker_jobs if os.path.exists(walkerdir + SharedTopologyDataSet.RMSE_VALUE_LIST_FILENAME))
+    SharedTopologyDataSet.rmsevalue_list_merger(SharedTopologyDataSet.RMSE_VALUE_LIST_FILENAME, rmsefilenames)
+    for merged in samplestores + datasets:
+        shutil.rmtree(merged)
+    for merged in rmsefilenames.values():
+        os.remove(merged)
+    print colored('Samples of %s walkers merged into %s, %s and %s.\n' % (numwalkers, SAMPLESTORE_DIR, datasetdir, SharedTopologyDataSet.RMSE_VALUE_LIST_FILENAME), 'green')
+
+
 #    # Dummy python progs:
 #    # Source: https://stackoverflow.com/questions/32318909/run-a-python-script-from-another-python-script-and-pass-variables-to-it
 #    process = subprocess.call('python py1.py --help', shell=True)
@@ -92,7 +216,7 @@ def main():
 if __name__ == '__main__':
     print('\n')
     print colored('TrainingDataSetCreatorScript STARTED. \n', 'yellow')
-    main()
+    main(*sys.argv[1:])
     print('\n')
     print colored('TrainingDataSetCreatorScript FINISHED. \n', 'yellow')
 